@@ -0,0 +1 @@
+"""Benchmarks of the proof pipeline on synthetic Google Timeline exports"""
@@ -0,0 +1,295 @@
+"""Benchmark the proof stages on synthetic exports and compare against a stored baseline"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.synthetic import export_path
+from my_proof.utils.metrics import peak_rss_mb
+from my_proof.utils.timeline import ANDROID_SCHEMA, IOS_SCHEMA
+
+SCHEMA_TYPES = {'ios': IOS_SCHEMA, 'android': ANDROID_SCHEMA}
+DEFAULT_POINTS = [1000, 100000, 1000000]
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'knowhere-benchmarks')
+DEFAULT_TOLERANCE = 0.2  # Allowed throughput drop or memory growth against the baseline
+
+# Stages that need a database at POSTGRES_URL
+DATABASE_STAGES = {'batch_insert_coordinates', 'copy_insert_coordinates', 'proof'}
+
+
+class OfflineBlockchainClient:
+    """Blockchain client that reports no earlier contributions, keeping RPC latency out of the numbers"""
+
+    def get_contributor_file_count(self, owner_address: Optional[str] = None) -> int:
+        return 0
+
+
+def _load(path: str) -> Any:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _setup_validate_schema(path: str, schema_type: str) -> Callable[[], int]:
+    from my_proof.utils.schema import get_validator, validate_schema
+
+    data = _load(path)
+    get_validator(schema_type)
+    return lambda: validate_schema(data)[1]
+
+
+def _setup_extract_coordinates(path: str, schema_type: str) -> Callable[[], int]:
+    from my_proof.utils.google import extract_coordinates
+
+    data = _load(path)
+    return lambda: len(extract_coordinates(data, schema_type))
+
+
+def _setup_process_file(path: str, schema_type: str) -> Callable[[], int]:
+    from my_proof.config import settings
+    from my_proof.proof import Proof
+
+    proof = Proof(settings, OfflineBlockchainClient())
+
+    def run() -> int:
+        with open(path, 'r', encoding='utf-8') as f:
+            return len(proof.process_file(f)[2])
+    return run
+
+
+def _setup_scan_coordinates(path: str, schema_type: str) -> Callable[[], int]:
+    from my_proof.utils.scanner import scan_coordinates
+
+    def run() -> int:
+        coordinates = scan_coordinates(path, schema_type)
+        if coordinates is None:
+            raise ValueError(f"{path} needs the full parser")
+        return len(coordinates)
+    return run
+
+
+def _setup_insert(path: str, schema_type: str, method: str) -> Callable[[], int]:
+    from my_proof.models.db import Contributors
+    from my_proof.utils.db import db
+    from my_proof.utils.google import extract_coordinates
+
+    coordinates = extract_coordinates(_load(path), schema_type)
+    db.init()
+
+    def run() -> int:
+        # Rolled back so every run starts from the same table contents
+        session = db.get_session()
+        try:
+            contributor = Contributors(wallet_address='0x' + '0' * 40, storage_source='benchmark')
+            session.add(contributor)
+            session.flush()
+            inserted, _ = getattr(db, method)(session, coordinates, contributor.id)
+            return inserted
+        finally:
+            session.rollback()
+            session.close()
+    return run
+
+
+def _setup_proof(path: str, schema_type: str) -> Callable[[], int]:
+    from my_proof.config import Settings, settings
+    from my_proof.proof import Proof
+    from my_proof.utils.db import db
+
+    input_dir = tempfile.mkdtemp(prefix='knowhere-benchmark-input-')
+    output_dir = tempfile.mkdtemp(prefix='knowhere-benchmark-output-')
+    os.symlink(os.path.abspath(path), os.path.join(input_dir, os.path.basename(path)))
+    job_settings = Settings(**{
+        **settings.model_dump(),
+        'INPUT_DIR': input_dir,
+        'OUTPUT_DIR': output_dir,
+        'OWNER_ADDRESS': '0x' + '0' * 40,
+        'GOOGLE_TOKEN': None,
+    })
+    db.init()
+
+    def run() -> int:
+        try:
+            return Proof(job_settings, OfflineBlockchainClient()).generate().attributes.get('coordinates', 0)
+        finally:
+            shutil.rmtree(input_dir, ignore_errors=True)
+            shutil.rmtree(output_dir, ignore_errors=True)
+    return run
+
+
+STAGES: Dict[str, Callable[[str, str], Callable[[], int]]] = {
+    'validate_schema': _setup_validate_schema,
+    'extract_coordinates': _setup_extract_coordinates,
+    'process_file': _setup_process_file,
+    'scan_coordinates': _setup_scan_coordinates,
+    'batch_insert_coordinates': lambda path, schema_type: _setup_insert(path, schema_type, 'batch_insert_coordinates'),
+    'copy_insert_coordinates': lambda path, schema_type: _setup_insert(path, schema_type, 'copy_insert_coordinates'),
+    'proof': _setup_proof,
+}
+
+
+def run_stage(stage: str, path: str, schema_type: str) -> Dict[str, Any]:
+    """
+    Run one stage once. Meant to run in a fresh process, so the peak RSS belongs to this stage.
+
+    Args:
+        stage: Name of the stage in STAGES
+        path: Path of the synthetic export
+        schema_type: Schema type of the export
+
+    Returns:
+        Dict[str, Any]: Wall and CPU seconds, peak RSS after setup and after the stage, and
+        the stage's result count (coordinates or rows)
+    """
+    logging.basicConfig(level=logging.WARNING)
+    run = STAGES[stage](path, schema_type)
+    setup_rss_mb = peak_rss_mb()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    result = run()
+    return {
+        'seconds': time.perf_counter() - wall_start,
+        'cpu_seconds': time.process_time() - cpu_start,
+        'setup_rss_mb': setup_rss_mb,
+        'peak_rss_mb': peak_rss_mb(),
+        'result': int(result),
+    }
+
+
+def benchmark(stage: str, path: str, schema_type: str, points: int, repeat: int) -> Dict[str, Any]:
+    """
+    Benchmark a stage, each repetition in a new process, and keep the fastest run.
+
+    Returns:
+        Dict[str, Any]: Timings, throughput in points and MB per second, and peak memory
+    """
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            runs.append(executor.submit(run_stage, stage, path, schema_type).result())
+    best = min(runs, key=lambda run: run['seconds'])
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    return {
+        'seconds': round(best['seconds'], 4),
+        'cpu_seconds': round(best['cpu_seconds'], 4),
+        'points_per_second': round(points / best['seconds']),
+        'mb_per_second': round(size_mb / best['seconds'], 2),
+        'peak_rss_mb': round(max(run['peak_rss_mb'] for run in runs), 1),
+        'added_rss_mb': round(max(run['peak_rss_mb'] - run['setup_rss_mb'] for run in runs), 1),
+        'result': best['result'],
+    }
+
+
+def run_benchmarks(stages: List[str], platforms: List[str], sizes: List[int], duplicate_ratio: float,
+                   repeat: int = 1, data_dir: str = DEFAULT_DATA_DIR) -> Dict[str, Dict[str, Any]]:
+    """
+    Benchmark every combination of stage, platform and size.
+
+    Args:
+        stages: Stage names from STAGES
+        platforms: 'ios' and/or 'android'
+        sizes: Numbers of points of the synthetic exports
+        duplicate_ratio: Share of duplicate points in the exports
+        repeat: Runs per benchmark, the fastest is kept
+        data_dir: Directory the synthetic exports are cached in
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Results keyed by "stage/platform/points"
+    """
+    results = {}
+    for platform in platforms:
+        schema_type = SCHEMA_TYPES[platform]
+        for points in sizes:
+            path = export_path(data_dir, schema_type, points, duplicate_ratio)
+            for stage in stages:
+                name = f"{stage}/{platform}/{points}"
+                try:
+                    results[name] = benchmark(stage, path, schema_type, points, repeat)
+                except Exception as e:
+                    logging.error(f"Benchmark {name} failed: {e}")
+                    results[name] = {'error': str(e)}
+                print_result(name, results[name])
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Find the benchmarks that regressed against a baseline.
+
+    Args:
+        results: Results of this run
+        baseline: Results of a stored earlier run
+        tolerance: Allowed relative throughput drop and peak memory growth
+
+    Returns:
+        List[str]: One message per regression
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous or 'error' in previous:
+            continue
+        if 'error' in result:
+            regressions.append(f"{name}: failed ({result['error']})")
+            continue
+        if result['points_per_second'] < previous['points_per_second'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {result['points_per_second']:,} points/s, baseline {previous['points_per_second']:,}"
+            )
+        if result['peak_rss_mb'] > previous['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{name}: peak RSS {result['peak_rss_mb']} MB, baseline {previous['peak_rss_mb']} MB")
+    return regressions
+
+
+def print_result(name: str, result: Dict[str, Any]) -> None:
+    if 'error' in result:
+        print(f"{name:<42} | failed: {result['error'].splitlines()[0][:60]}")
+        return
+    print(f"{name:<42} | {result['seconds']:>9.3f} | {result['points_per_second']:>12,d} | "
+          f"{result['mb_per_second']:>7.1f} | {result['peak_rss_mb']:>8.1f} | {result['added_rss_mb']:>8.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=[s for s in STAGES if s not in DATABASE_STAGES],
+                        help="Stages to benchmark (database stages need POSTGRES_URL to point at a scratch database)")
+    parser.add_argument('--platforms', nargs='+', choices=list(SCHEMA_TYPES), default=list(SCHEMA_TYPES))
+    parser.add_argument('--points', nargs='+', type=int, default=DEFAULT_POINTS, help="Export sizes in points")
+    parser.add_argument('--duplicate-ratio', type=float, default=0.2, help="Share of duplicate points in the exports")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per benchmark, the fastest is kept")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="Cache directory of the synthetic exports")
+    parser.add_argument('--output', help="Write the results to this JSON file, e.g. to store a baseline")
+    parser.add_argument('--baseline', help="Compare against the results stored in this JSON file")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative throughput drop and memory growth against the baseline")
+    args = parser.parse_args(argv)
+
+    print(f"{'Benchmark':<42} | {'Seconds':>9} | {'Points/s':>12} | {'MB/s':>7} | {'Peak MB':>8} | {'Added MB':>8}")
+    print("-" * 104)
+    results = run_benchmarks(args.stages, args.platforms, args.points, args.duplicate_ratio, args.repeat, args.data_dir)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("No regressions against the baseline")
+    return 0
+
+
+# python -m benchmarks.run --points 1000 100000 --output baseline.json
+# python -m benchmarks.run --points 1000 100000 --baseline baseline.json
+if __name__ == "__main__":
+    sys.exit(main())
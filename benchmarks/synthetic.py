@@ -0,0 +1,196 @@
+"""Synthetic Google Timeline exports matching my_proof/schemas"""
+import datetime
+import json
+import os
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+from my_proof.utils.timeline import ANDROID_SCHEMA, IOS_SCHEMA
+
+PATH_LENGTH = 10  # Points per timelinePath segment
+POINT_BATCH_SIZE = 100000  # Coordinates generated per batch
+SEGMENT_MINUTES = 30  # Time covered by each segment
+WALK_STEP_DEGREES = 0.0005  # Standard deviation of one random walk step, about 50m
+START_TIME = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone(datetime.timedelta(hours=-8)))
+
+# Segment kinds in the order they repeat. Each entry is the number of extracted points.
+IOS_SEGMENT_CYCLE = [('timelinePath', PATH_LENGTH), ('visit', 1), ('activity', 0)]
+ANDROID_SEGMENT_CYCLE = [('timelinePath', PATH_LENGTH), ('visit', 1), ('activity', 2)]
+
+
+class TimelineGenerator:
+    """
+    Generates a synthetic timeline export with a given number of extracted points.
+
+    Points follow a random walk around a home location, so they look like real movement and
+    rarely fall into the same grid cell by chance. A `duplicate_ratio` share of the points
+    are exact copies of earlier points from the same batch, which controls how many unique
+    coordinates the export holds. The output is deterministic for a given seed.
+    """
+
+    def __init__(self, schema_type: str, points: int, duplicate_ratio: float = 0.0, seed: int = 0):
+        """
+        Args:
+            schema_type: IOS_SCHEMA or ANDROID_SCHEMA
+            points: Number of coordinates the proof will extract from the export
+            duplicate_ratio: Share of the points that repeat an earlier point, between 0 and 1
+            seed: Random seed
+        """
+        if schema_type not in (IOS_SCHEMA, ANDROID_SCHEMA):
+            raise ValueError(f"Unsupported schema type: {schema_type}")
+        if not 0 <= duplicate_ratio < 1:
+            raise ValueError("duplicate_ratio must be in [0, 1)")
+        self.schema_type = schema_type
+        self.points = points
+        self.duplicate_ratio = duplicate_ratio
+        self._rng = np.random.default_rng(seed)
+        self._position = np.array([self._rng.uniform(-60, 60), self._rng.uniform(-170, 170)])
+
+    def segments(self) -> Iterator[Dict[str, Any]]:
+        """Yield the segments of the export, one at a time"""
+        cycle = IOS_SEGMENT_CYCLE if self.schema_type == IOS_SCHEMA else ANDROID_SEGMENT_CYCLE
+        formatted = self._formatted_points()
+        emitted = 0
+        index = 0
+        while emitted < self.points:
+            kind, count = cycle[index % len(cycle)]
+            if count > self.points - emitted:
+                # Finish with a path holding exactly the remaining points
+                kind, count = 'timelinePath', self.points - emitted
+            start = START_TIME + datetime.timedelta(minutes=SEGMENT_MINUTES * index)
+            if kind == 'activity' and self.schema_type == IOS_SCHEMA:
+                # iOS activities aren't extracted, but their start and end must still be valid points
+                yield self._segment(kind, start, [next(formatted), next(formatted)], index)
+            else:
+                yield self._segment(kind, start, [next(formatted) for _ in range(count)], index)
+            emitted += count
+            index += 1
+
+    def document(self) -> Any:
+        """Build the whole export in memory"""
+        segments = list(self.segments())
+        if self.schema_type == IOS_SCHEMA:
+            return segments
+        return {'semanticSegments': segments, 'rawSignals': [], 'userLocationProfile': {'frequentPlaces': []}}
+
+    def write(self, path: str) -> None:
+        """Write the export to a file, streaming the segments so large exports fit in memory"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('[' if self.schema_type == IOS_SCHEMA else '{"semanticSegments": [')
+            for i, segment in enumerate(self.segments()):
+                if i:
+                    f.write(',\n')
+                f.write(json.dumps(segment, ensure_ascii=False))
+            f.write(']' if self.schema_type == IOS_SCHEMA else '], "rawSignals": [], "userLocationProfile": {"frequentPlaces": []}}')
+
+    def _formatted_points(self) -> Iterator[str]:
+        template = 'geo:%.6f,%.6f' if self.schema_type == IOS_SCHEMA else '%.7f°, %.7f°'
+        while True:
+            for lat, lng in self._coordinate_batch(POINT_BATCH_SIZE).tolist():
+                yield template % (lat, lng)
+
+    def _coordinate_batch(self, size: int) -> np.ndarray:
+        steps = self._rng.normal(0, WALK_STEP_DEGREES, (size, 2))
+        walk = self._position + np.cumsum(steps, axis=0)
+        self._position = walk[-1]
+        walk[:, 0] = np.clip(walk[:, 0], -89.9, 89.9)
+        walk[:, 1] = (walk[:, 1] + 180) % 360 - 180
+
+        # Point each duplicate at an earlier row, then follow chains of duplicates to their
+        # original by pointer jumping, so every duplicate copies a walk point
+        source = np.arange(size)
+        duplicates = self._rng.random(size) < self.duplicate_ratio
+        duplicates[0] = False
+        source[duplicates] = (self._rng.random(int(duplicates.sum())) * source[duplicates]).astype(np.int64)
+        while True:
+            next_source = source[source]
+            if np.array_equal(next_source, source):
+                break
+            source = next_source
+        return walk[source]
+
+    def _segment(self, kind: str, start: datetime.datetime, points: List[str], index: int) -> Dict[str, Any]:
+        end = start + datetime.timedelta(minutes=SEGMENT_MINUTES)
+        segment: Dict[str, Any] = {'startTime': _timestamp(start), 'endTime': _timestamp(end)}
+        ios = self.schema_type == IOS_SCHEMA
+
+        if kind == 'timelinePath':
+            if ios:
+                segment['timelinePath'] = [
+                    {'point': point, 'durationMinutesOffsetFromStartTime': str(i * SEGMENT_MINUTES // max(len(points), 1))}
+                    for i, point in enumerate(points)
+                ]
+            else:
+                segment['timelinePath'] = [
+                    {'point': point, 'time': _timestamp(start + datetime.timedelta(minutes=i * SEGMENT_MINUTES / max(len(points), 1)))}
+                    for i, point in enumerate(points)
+                ]
+        elif kind == 'visit':
+            if ios:
+                segment['visit'] = {
+                    'hierarchyLevel': '0',
+                    'probability': '0.850000',
+                    'topCandidate': {
+                        'probability': '0.640000',
+                        'semanticType': ('Home', 'Unknown', 'Searched Address')[index % 3],
+                        'placeID': f'ChIJ{index:012d}',
+                        'placeLocation': points[0],
+                    },
+                }
+            else:
+                segment['visit'] = {
+                    'hierarchyLevel': 0,
+                    'probability': 0.85,
+                    'topCandidate': {
+                        'placeId': f'ChIJ{index:012d}',
+                        'semanticType': 'UNKNOWN',
+                        'probability': 0.64,
+                        'placeLocation': {'latLng': points[0]},
+                    },
+                }
+        else:
+            if ios:
+                segment['activity'] = {
+                    'probability': '0.920000',
+                    'start': points[0],
+                    'end': points[1],
+                    'topCandidate': {'type': 'walking', 'probability': '0.810000'},
+                    'distanceMeters': '1250.000000',
+                }
+            else:
+                segment['activity'] = {
+                    'start': {'latLng': points[0]},
+                    'end': {'latLng': points[1]},
+                    'distanceMeters': 1250.0,
+                    'probability': 0.92,
+                    'topCandidate': {'type': 'WALKING', 'probability': 0.81},
+                }
+        return segment
+
+
+def _timestamp(moment: datetime.datetime) -> str:
+    return moment.isoformat(timespec='milliseconds')
+
+
+def export_path(data_dir: str, schema_type: str, points: int, duplicate_ratio: float, seed: int = 0) -> str:
+    """
+    Path of a synthetic export, generating it if it doesn't exist yet.
+
+    Args:
+        data_dir: Directory the exports are cached in
+        schema_type: IOS_SCHEMA or ANDROID_SCHEMA
+        points: Number of extracted points
+        duplicate_ratio: Share of duplicate points
+        seed: Random seed
+
+    Returns:
+        str: Path of the export
+    """
+    platform = 'ios' if schema_type == IOS_SCHEMA else 'android'
+    path = os.path.join(data_dir, f"{platform}-{points}-{duplicate_ratio:.2f}-{seed}.json")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        TimelineGenerator(schema_type, points, duplicate_ratio, seed).write(path + '.tmp')
+        os.replace(path + '.tmp', path)
+    return path
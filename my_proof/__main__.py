@@ -3,8 +3,8 @@ import logging
 import os
 import sys
 import traceback
-import zipfile
 
+from my_proof.models.proof_response import ProofResponse
 from my_proof.proof import Proof
 from my_proof.config import settings
 
@@ -18,25 +18,21 @@ def run() -> None:
 
     if not input_files_exist:
         raise FileNotFoundError(f"No input files found in {settings.INPUT_DIR}")
-    extract_input()
 
     proof = Proof()
     proof_response = proof.generate()
 
-    output_path = os.path.join(settings.OUTPUT_DIR, "results.json")
-    with open(output_path, 'w') as f:
-        json.dump(proof_response.model_dump(), f, indent=2)
+    write_results(proof_response)
+    if settings.METRICS_FILE:
+        proof.metrics.write(settings.OUTPUT_DIR)
     logging.info(f"Proof generation complete: {proof_response}")
 
 
-def extract_input() -> None:
-    """If the input directory contains any zip files, extract them"""
-    for input_filename in os.listdir(settings.INPUT_DIR):
-        input_file = os.path.join(settings.INPUT_DIR, input_filename)
-
-        if zipfile.is_zipfile(input_file):
-            with zipfile.ZipFile(input_file, 'r') as zip_ref:
-                zip_ref.extractall(settings.INPUT_DIR)
+def write_results(proof_response: ProofResponse, output_dir: str = None) -> None:
+    """Write the proof response to results.json in the output directory"""
+    output_path = os.path.join(output_dir or settings.OUTPUT_DIR, "results.json")
+    with open(output_path, 'w') as f:
+        json.dump(proof_response.model_dump(), f, indent=2)
 
 
 if __name__ == "__main__":
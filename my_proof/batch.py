@@ -0,0 +1,144 @@
+"""Generate proofs for many jobs in one long-lived process"""
+import json
+import logging
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from my_proof.__main__ import write_results
+from my_proof.config import Settings, settings
+from my_proof.models.batch import ProofJob
+from my_proof.proof import Proof
+from my_proof.utils.blockchain import BlockchainClient, cache_contributor_file_counts
+from my_proof.utils.schema import warm_validators
+
+# Shared by all jobs handled by a worker process
+_blockchain_client: Optional[BlockchainClient] = None
+
+
+def load_manifest(manifest_path: str) -> List[ProofJob]:
+    """
+    Load proof jobs from a manifest.
+
+    Args:
+        manifest_path: JSON lines file with one job object per line, with the fields of ProofJob.
+            Every job needs an owner_address, a job without one fails validation.
+
+    Returns:
+        List[ProofJob]: Jobs in manifest order
+    """
+    with open(manifest_path, 'r') as f:
+        return [ProofJob(**json.loads(line)) for line in f if line.strip()]
+
+
+def init_worker(file_counts: Optional[Dict[str, int]] = None) -> None:
+    """
+    Set up the state shared by all jobs of a worker process.
+
+    Args:
+        file_counts: Contributor file counts looked up ahead for the jobs, per owner address
+    """
+    global _blockchain_client
+    # The database connects on first use, so each worker gets its own engine and pool
+    _blockchain_client = BlockchainClient()
+    if file_counts:
+        cache_contributor_file_counts(file_counts)
+    warm_validators()
+
+
+def prefetch_file_counts(jobs: List[ProofJob]) -> Dict[str, int]:
+    """
+    Look up the contributor file counts of all job owners in JSON-RPC batches.
+
+    Args:
+        jobs: Jobs of the batch
+
+    Returns:
+        Dict[str, int]: Number of files per owner address, empty if the lookup failed
+    """
+    owners = [job.owner_address for job in jobs]
+    if not owners:
+        return {}
+    try:
+        file_counts = BlockchainClient().get_contributor_file_counts(owners)
+        logging.info(f"Looked up the file counts of {len(file_counts)} owners")
+        return file_counts
+    except Exception as e:
+        logging.error(f"Failed to prefetch contributor file counts: {str(e)}")
+        return {}
+
+
+def run_job(job: ProofJob) -> Dict[str, Any]:
+    """
+    Generate the proof of one job and write its results.json.
+
+    Args:
+        job: The job to run
+
+    Returns:
+        Dict[str, Any]: Summary of the job for the batch report
+    """
+    try:
+        if not (os.path.isdir(job.input_dir) and os.listdir(job.input_dir)):
+            raise FileNotFoundError(f"No input files found in {job.input_dir}")
+
+        job_settings = Settings(**{
+            **settings.model_dump(),
+            **job.settings_overrides(),
+        })
+        os.makedirs(job.output_dir, exist_ok=True)
+        proof = Proof(job_settings, _blockchain_client)
+        proof_response = proof.generate()
+
+        write_results(proof_response, job.output_dir)
+        if job_settings.METRICS_FILE:
+            proof.metrics.write(job.output_dir)
+        return {'input_dir': job.input_dir, 'valid': proof_response.valid, 'score': proof_response.score}
+
+    except Exception as e:
+        logging.error(f"Error during proof generation for {job.input_dir}: {e}")
+        traceback.print_exc()
+        return {'input_dir': job.input_dir, 'error': str(e)}
+
+
+def run_batch(manifest_path: str, workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Run every job of a manifest in a pool of long-lived worker processes.
+
+    Each worker keeps one database engine, one blockchain client and the Google user cache
+    for all the jobs it handles, so those are set up once per worker rather than once per job.
+    The contributor file counts of all owners are looked up ahead in JSON-RPC batches and
+    handed to the workers. A failing job is reported in the summary and doesn't stop the batch.
+
+    Args:
+        manifest_path: Path of the JSON lines manifest
+        workers: Number of worker processes, defaults to settings.BATCH_WORKERS or the CPU count
+
+    Returns:
+        List[Dict[str, Any]]: One summary per job, in manifest order
+    """
+    jobs = load_manifest(manifest_path)
+    workers = workers or settings.BATCH_WORKERS or os.cpu_count()
+    logging.info(f"Running {len(jobs)} proof jobs with {workers} workers")
+
+    # One batched lookup here instead of one contributorInfo call per job in the workers
+    file_counts = prefetch_file_counts(jobs)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(file_counts,)) as executor:
+        results = list(executor.map(run_job, jobs))
+
+    failed = sum('error' in result for result in results)
+    logging.info(f"Batch complete: {len(results) - failed} succeeded, {failed} failed")
+    return results
+
+
+# python -m my_proof.batch manifest.jsonl
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python -m my_proof.batch <manifest.jsonl>")
+        sys.exit(2)
+    results = run_batch(sys.argv[1])
+    print(json.dumps(results, indent=2))
+    sys.exit(1 if any('error' in result for result in results) else 0)
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from typing import Optional
+from typing import List, Optional
 
 class Settings(BaseSettings):
     """Global settings configuration using environment variables"""
@@ -33,6 +33,12 @@ class Settings(BaseSettings):
         pattern="^https?://.*$"
     )
     
+    RPC_TIMEOUT: float = Field(
+        default=10.0,
+        description="Timeout in seconds of a single RPC request",
+        gt=0
+    )
+    
     INPUT_DIR: str = Field(
         default="/input",
         description="Directory containing input files to process"
@@ -43,6 +49,90 @@ class Settings(BaseSettings):
         description="Directory where output files will be written"
     )
     
+    # Input limits
+    MAX_INPUT_FILE_MB: int = Field(
+        default=2048,
+        description="Largest uncompressed JSON member accepted from a zip archive, in MB",
+        gt=0
+    )
+    
+    MAX_INPUT_TOTAL_MB: int = Field(
+        default=8192,
+        description="Largest total uncompressed JSON accepted from one zip archive, in MB",
+        gt=0
+    )
+    
+    MAX_COMPRESSION_RATIO: int = Field(
+        default=200,
+        description="Highest uncompressed to compressed size ratio accepted for a zip member",
+        gt=0
+    )
+    
+    INPUT_READAHEAD_CHUNKS: int = Field(
+        default=4,
+        description="1 MB chunks of a zip member decompressed ahead of the parser on a background thread (0 disables)",
+        ge=0
+    )
+    
+    INPUT_DECOMPRESS_WORKERS: int = Field(
+        default=2,
+        description="Threads decompressing the next zip members into temporary files while files are parsed one at a time (0 disables)",
+        ge=0
+    )
+    
+    MAX_MEMORY_MB: Optional[int] = Field(
+        default=None,
+        description="Memory budget of coordinate deduplication in MB. Past it, sorted runs of coordinates are spilled to SPILL_DIR and merged from disk, files are parsed one at a time and coordinates are inserted in chunks (unset keeps everything in memory)",
+        gt=0
+    )
+    
+    SPILL_DIR: Optional[str] = Field(
+        default=None,
+        description="Directory of the temporary files spilled past MAX_MEMORY_MB, defaults to the system temporary directory"
+    )
+    
+    BATCH_WORKERS: Optional[int] = Field(
+        default=None,
+        description="Worker processes used by the batch runner (defaults to the number of CPUs)",
+        gt=0
+    )
+    
+    PARSE_WORKERS: int = Field(
+        default=1,
+        description="Processes parsing the files of a multi-file input at once, for inputs of at least PARSE_PROCESS_MIN_MB (1 parses in the proof process)",
+        gt=0
+    )
+    
+    PARSE_PROCESS_MIN_MB: int = Field(
+        default=64,
+        description="Total uncompressed input size below which files are parsed in the proof process, since starting the parsing processes would take longer",
+        ge=0
+    )
+    
+    WORKER_CONCURRENCY: Optional[int] = Field(
+        default=None,
+        description="Jobs the worker daemon runs at once (defaults to the number of CPUs)",
+        gt=0
+    )
+    
+    WORKER_POLL_INTERVAL: float = Field(
+        default=1.0,
+        description="Seconds the worker daemon waits before polling again when the job queue is empty",
+        gt=0
+    )
+    
+    WORKER_JOB_TIMEOUT: int = Field(
+        default=3600,
+        description="Seconds without a heartbeat from its worker after which a running job is considered abandoned and queued again",
+        gt=0
+    )
+    
+    WORKER_MAX_ATTEMPTS: int = Field(
+        default=3,
+        description="Times a job is claimed before it is marked failed",
+        ge=1
+    )
+    
     # Database settings
     POSTGRES_URL: str = Field(
         default=None,
@@ -50,6 +140,152 @@ class Settings(BaseSettings):
         pattern="^postgresql://.*$"
     )
     
+    DB_POOL_SIZE: int = Field(
+        default=5,
+        description="Connections kept open in the database connection pool",
+        ge=0
+    )
+    
+    DB_MAX_OVERFLOW: int = Field(
+        default=10,
+        description="Connections opened beyond DB_POOL_SIZE under load, closed when returned",
+        ge=0
+    )
+    
+    DB_POOL_PRE_PING: bool = Field(
+        default=True,
+        description="Check pooled connections before use, replacing those the server closed"
+    )
+    
+    DB_POOL_RECYCLE: int = Field(
+        default=1800,
+        description="Seconds after which pooled connections are replaced (-1 never replaces them)",
+        ge=-1
+    )
+    
+    DB_STATEMENT_TIMEOUT_MS: int = Field(
+        default=0,
+        description="Server-side timeout of a single statement in milliseconds (0 disables it)",
+        ge=0
+    )
+    
+    DB_SCHEMA_CHECK: bool = Field(
+        default=False,
+        description="Skip creating tables when the schema_version marker matches the models, saving the catalog queries of create_all"
+    )
+    
+    COORDINATE_CHUNK_SIZE: int = Field(
+        default=50000,
+        description="Coordinates copied and merged into the coordinates table per statement",
+        gt=0
+    )
+    
+    COORDINATE_STORAGE: str = Field(
+        default="rows",
+        description="Table coordinates are stored in: 'rows' (coordinates, one full row per point) or 'cells' (packed, partitioned coordinate_cells)",
+        pattern="^(rows|cells)$"
+    )
+    
+    COORDINATE_PARTITIONS: int = Field(
+        default=16,
+        description="Hash partitions of coordinate_cells, fixed once the table holds data",
+        gt=0
+    )
+    
+    COORDINATE_SHARD_URLS: List[str] = Field(
+        default=[],
+        description="PostgreSQL URLs of the shards the coordinate cells are spread over, as a JSON list. Shards store packed coordinate_cells rows whatever COORDINATE_STORAGE is, and can only be added at the end of the list (run python -m my_proof.utils.migrations shards after a change)"
+    )
+    
+    WRITE_BEHIND: bool = Field(
+        default=False,
+        description="Score uniqueness with a read-only probe and queue the new coordinates in coordinate_writes, for python -m my_proof.write_behind to insert"
+    )
+    
+    WRITE_BEHIND_POLL_INTERVAL: float = Field(
+        default=1.0,
+        description="Seconds the write-behind drainer waits when the queue is empty",
+        gt=0
+    )
+    
+    WRITE_BEHIND_MAX_ATTEMPTS: int = Field(
+        default=3,
+        description="Times a queued write is drained before it is left in coordinate_write_failures as a dead letter",
+        ge=1
+    )
+    
+    CELL_RESOLUTION_BITS: int = Field(
+        default=24,
+        description="Bits per axis of the coordinate cell key used for uniqueness (24 is about 1.2m x 2.4m at the equator)",
+        ge=1,
+        le=31
+    )
+    
+    INCREMENTAL_PROOFS: bool = Field(
+        default=False,
+        description="Only process the segments a storage account has not contributed before (changes the quality score and NOT_ENOUGH_DATA of repeat uploads, and disables FAST_SCAN for Google accounts)"
+    )
+    
+    # Scoring
+    AUTHENTICITY_SCORING: bool = Field(
+        default=False,
+        description="Multiply the overall score by the authenticity score. With FAST_SCAN, authenticity only checks the validated sample of each scanned file"
+    )
+    
+    # Proof result cache
+    RESULT_CACHE_ENABLED: bool = Field(
+        default=False,
+        description="Return the stored result when the same owner proves the same input again, instead of reprocessing it. The result is scored as a repeat, with no unique coordinates"
+    )
+    
+    RESULT_CACHE_DIR: Optional[str] = Field(
+        default=None,
+        description="Local directory caching proof results in front of the database (disabled if unset)"
+    )
+    
+    RESULT_CACHE_MAX_ENTRIES: int = Field(
+        default=10000,
+        description="Results kept in the local result cache before the least recently used are evicted",
+        gt=0
+    )
+    
+    # Coordinate pre-check filter
+    BLOOM_FILTER_PATH: Optional[str] = Field(
+        default=None,
+        description="Snapshot file of the coordinate Bloom filter, used to skip probable duplicates before the database (disabled if unset). Built by the worker at startup or with `python -m my_proof.utils.bloom`, proofs probe the database until it exists"
+    )
+    
+    BLOOM_FILTER_BITS: int = Field(
+        default=1 << 30,
+        description="Size in bits of a new coordinate filter (2^30 bits holds about 100M cells at a 1% false positive rate)",
+        gt=0
+    )
+    
+    BLOOM_FILTER_HASHES: int = Field(
+        default=7,
+        description="Number of hash functions of a new coordinate filter",
+        gt=0
+    )
+    
+    # Contribution sketches
+    SKETCHES_ENABLED: bool = Field(
+        default=False,
+        description="Store HyperLogLog and MinHash sketches of each contribution, and publish its estimated overlap with recent uploads and its most similar earlier upload"
+    )
+    
+    SKETCH_WINDOW_HOURS: int = Field(
+        default=24,
+        description="Hours of uploads the recent overlap of a contribution is estimated against",
+        gt=0
+    )
+    
+    NEAR_DUPLICATE_JACCARD: float = Field(
+        default=0.9,
+        description="Estimated Jaccard index of the cells above which an earlier upload is reported as a near duplicate",
+        gt=0,
+        le=1
+    )
+    
     # Google OAuth
     GOOGLE_TOKEN: Optional[str] = Field(
         default=None,
@@ -57,6 +293,78 @@ class Settings(BaseSettings):
         min_length=20
     )
     
+    GOOGLE_USERINFO_URL: str = Field(
+        default="https://www.googleapis.com/oauth2/v1/userinfo",
+        description="Google OAuth2 userinfo endpoint",
+        pattern="^https?://.*$"
+    )
+    
+    GOOGLE_TIMEOUT: float = Field(
+        default=10.0,
+        description="Timeout in seconds of a single Google API request",
+        gt=0
+    )
+    
+    # Network retries
+    NETWORK_RETRIES: int = Field(
+        default=3,
+        description="Attempts made for Google and RPC calls that fail with a transient error",
+        ge=1
+    )
+    
+    NETWORK_BACKOFF: float = Field(
+        default=0.5,
+        description="Delay in seconds before the first retry of a network call, doubled on each retry",
+        ge=0
+    )
+    
+    # Network clients
+    NETWORK_CACHE_TTL: float = Field(
+        default=300.0,
+        description="Seconds Google user lookups are cached per process and contributor file counts looked up ahead are kept (0 disables the cache)",
+        ge=0
+    )
+    
+    RPC_BATCH_SIZE: int = Field(
+        default=100,
+        description="contributorInfo calls sent in one JSON-RPC batch request when many owners are looked up at once",
+        gt=0
+    )
+    
+    # Schema validation
+    SCHEMA_FAIL_FAST: bool = Field(
+        default=True,
+        description="Stop schema validation at the first error instead of collecting all of them"
+    )
+    
+    SCHEMA_SAMPLE_SIZE: int = Field(
+        default=0,
+        description="If set, validate only this many randomly sampled items per array (0 validates everything)",
+        ge=0
+    )
+    
+    FAST_SCAN: bool = Field(
+        default=False,
+        description="Scan the coordinates of plain JSON files from their memory-mapped bytes instead of decoding every segment. Only used with SCHEMA_SAMPLE_SIZE set, validating the first SCHEMA_SAMPLE_SIZE segments, and not for incremental proofs"
+    )
+    
+    # Instrumentation
+    METRICS_ENABLED: bool = Field(
+        default=False,
+        description="Time each proof stage and log a performance report"
+    )
+    
+    METRICS_FILE: bool = Field(
+        default=False,
+        description="Also write the performance report to metrics.json in the output directory"
+    )
+    
+    PROFILE_MODE: Optional[str] = Field(
+        default=None,
+        description="Profile the proof with cProfile or tracemalloc and dump the result to the output directory",
+        pattern="^(cprofile|tracemalloc)$"
+    )
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
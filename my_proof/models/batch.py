@@ -0,0 +1,23 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class ProofJob(BaseModel):
+    """A single proof job of a batch manifest"""
+    input_dir: str
+    output_dir: str
+    # Required, since the owner's file count, duplicate check and cached results all depend on it
+    owner_address: str = Field(pattern="^0x[a-fA-F0-9]{40}$")
+    file_id: Optional[int] = 0
+    google_token: Optional[str] = None
+
+    def settings_overrides(self) -> dict:
+        """Settings fields this job overrides"""
+        return {
+            'INPUT_DIR': self.input_dir,
+            'OUTPUT_DIR': self.output_dir,
+            'OWNER_ADDRESS': self.owner_address,
+            'FILE_ID': self.file_id,
+            'GOOGLE_TOKEN': self.google_token,
+        }
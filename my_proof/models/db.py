@@ -1,11 +1,14 @@
 """SQLAlchemy database models for storing Spotify contribution data"""
 import datetime
 
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, UniqueConstraint, ARRAY
+from sqlalchemy import BigInteger, Boolean, Column, ForeignKey, Index, Integer, JSON, LargeBinary, Sequence, String, Float, DateTime, UniqueConstraint, ARRAY
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
+# Bump whenever a model changes, so databases with an older schema run create_all again (see utils/db.py)
+SCHEMA_VERSION = 6
+
 class Contributors(Base):
     """
     Tracks contributor information and hashed PII for privacy.
@@ -41,18 +44,170 @@ class Contributions(Base):
     created_at = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
 
 
+class ContributionSketches(Base):
+    """
+    HyperLogLog and MinHash sketches of the cells of each contribution (see utils/sketches.py).
+    """
+    __tablename__ = 'contribution_sketches'
+
+    contribution_id = Column(Integer, ForeignKey('contributions.id'), primary_key=True)
+    estimated_cells = Column(Integer, nullable=False)
+    hll = Column(LargeBinary, nullable=False)
+    minhash = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
+
+
+class SketchBands(Base):
+    """
+    LSH band hashes of the contribution MinHashes, so uploads similar to a new one are found
+    with an index lookup instead of comparing every sketch.
+    """
+    __tablename__ = 'sketch_bands'
+
+    band_hash = Column(BigInteger, primary_key=True, autoincrement=False)
+    contribution_id = Column(Integer, ForeignKey('contribution_sketches.contribution_id'), primary_key=True)
+
+
+class SketchAggregates(Base):
+    """
+    Hourly HyperLogLogs of the contributed cells, over all cells ('global') and per region
+    ('region:<n>', see utils/sketches.region_keys), merged into by each proof.
+    """
+    __tablename__ = 'sketch_aggregates'
+
+    scope = Column(String, primary_key=True)
+    window_start = Column(DateTime(timezone=True), primary_key=True)
+    hll = Column(LargeBinary, nullable=False)
+    contributions = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
+
+
 class Coordinates(Base):
     """
     Stores all coordinates anonymously to track unique contributions.
+    Uniqueness is decided by the quantized grid cell of the coordinate (see utils/cells.py).
     """
     __tablename__ = 'coordinates'
 
     id = Column(Integer, primary_key=True)
     longitude = Column(Float, nullable=False)
     latitude = Column(Float, nullable=False)
+    cell = Column(BigInteger)
     contributor_id = Column(Integer, ForeignKey('contributors.id'), nullable=False)
     created_at = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
 
     __table_args__ = (
-        UniqueConstraint('latitude', 'longitude', name='uix_lat_lng'),
-    )
\ No newline at end of file
+        UniqueConstraint('cell', name='uix_cell'),
+    )
+
+
+coordinate_cells_seq = Sequence('coordinate_cells_seq', metadata=Base.metadata)
+
+class CoordinateCells(Base):
+    """
+    Compact alternative to Coordinates, used when COORDINATE_STORAGE is 'cells'.
+    Each unique cell is one narrow row: the cell key (which encodes the position, see
+    utils/cells.py), the contributor and an insertion sequence number for incremental reads.
+    The table is hash-partitioned on the cell into COORDINATE_PARTITIONS partitions, created
+    by utils/db.create_cell_partitions. The sequence is indexed with BRIN, which stays tiny
+    because rows are appended in sequence order.
+    """
+    __tablename__ = 'coordinate_cells'
+
+    cell = Column(BigInteger, primary_key=True, autoincrement=False)
+    contributor_id = Column(Integer, nullable=False)
+    seq = Column(BigInteger, coordinate_cells_seq, server_default=coordinate_cells_seq.next_value(), nullable=False)
+
+    __table_args__ = (
+        Index('ix_coordinate_cells_seq', 'seq', postgresql_using='brin'),
+        {'postgresql_partition_by': 'HASH (cell)'},
+    )
+
+
+class ContributorFingerprints(Base):
+    """
+    Tracks the timeline segments each storage account has already contributed, so repeat
+    uploads only process new segments (see utils/fingerprint.py).
+    """
+    __tablename__ = 'contributor_fingerprints'
+
+    storage_user_id_hash = Column(String, primary_key=True)
+    watermark = Column(DateTime(timezone=True))
+    segment_hashes = Column(LargeBinary, nullable=False, default=b'')
+    segment_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
+
+
+class ProofResults(Base):
+    """
+    Caches proof responses by a hash of the input and the proof version (see utils/result_cache.py),
+    so resubmitting the same file returns the same result without reprocessing it.
+    """
+    __tablename__ = 'proof_results'
+
+    cache_key = Column(String(64), primary_key=True)
+    response = Column(JSON, nullable=False)
+    file_id = Column(Integer)
+    created_at = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
+
+
+class ProofJobs(Base):
+    """
+    Queue of proof jobs for the worker daemon (see my_proof/worker.py).
+    Workers claim pending jobs with SELECT ... FOR UPDATE SKIP LOCKED.
+    """
+    __tablename__ = 'proof_jobs'
+
+    id = Column(Integer, primary_key=True)
+    status = Column(String, nullable=False, default='pending')  # pending, running, done or failed
+    job = Column(JSON, nullable=False)  # Fields of models.batch.ProofJob
+    result = Column(JSON)
+    error = Column(String)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)  # Renewed by the worker running the job
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_proof_jobs_status_id', 'status', 'id'),
+    )
+
+
+class CoordinateWrites(Base):
+    """
+    Durable write-behind queue of the new coordinates of proofs made with WRITE_BEHIND.
+    Each row holds the coordinates of one contribution, queued in the proof's transaction and
+    merged into the coordinate storage by my_proof/write_behind.py.
+    """
+    __tablename__ = 'coordinate_writes'
+
+    id = Column(Integer, primary_key=True)
+    contributor_id = Column(Integer, ForeignKey('contributors.id'), nullable=False)
+    coordinates = Column(LargeBinary, nullable=False)  # float64 (latitude, longitude) rows, little-endian
+    count = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
+
+
+class CoordinateWriteFailures(Base):
+    """
+    Failed drains of a coordinate_writes row. A row that failed WRITE_BEHIND_MAX_ATTEMPTS times
+    is a dead letter: the drainer skips it until its failure row is deleted.
+    """
+    __tablename__ = 'coordinate_write_failures'
+
+    write_id = Column(Integer, ForeignKey('coordinate_writes.id', ondelete='CASCADE'), primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(String)
+    updated_at = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
+
+
+class SchemaVersion(Base):
+    """
+    Single-row marker of the SCHEMA_VERSION the tables were last created for.
+    """
+    __tablename__ = 'schema_version'
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
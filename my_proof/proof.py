@@ -1,31 +1,460 @@
+import datetime
 import hashlib
-import json
 import logging
 import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from typing import IO, TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
 
-from my_proof.models.db import Contributions, Contributors
 from my_proof.models.proof_response import ProofResponse
 from my_proof.utils import scoring
+from my_proof.utils.authenticity import TrackCollector, TrackStats
 from my_proof.utils.blockchain import BlockchainClient
-from my_proof.utils.db import db
-from my_proof.utils.google import extract_coordinates, get_google_user
-from my_proof.utils.schema import validate_schema
-from my_proof.config import settings
+from my_proof.utils.cells import cell_keys
+from my_proof.utils.fingerprint import ContributorFingerprint
+from my_proof.utils.google import CoordinateCollector, CoordinateRuns, get_google_user
+from my_proof.utils.inputs import InputFile, extract_members, list_input_files, prefetch_members
+from my_proof.utils.metrics import NULL_SPAN, Metrics, Span
+from my_proof.utils.result_cache import LIVE_ERRORS, DiskResultCache, is_cacheable, result_cache_key
+from my_proof.utils.scanner import scan_coordinates
+from my_proof.utils.schema import StreamValidator
+from my_proof.utils.shared_arrays import SharedArray, share_array, take_array
+from my_proof.utils.sketches import ContributionSketch, HyperLogLog, estimate_overlap
+from my_proof.utils.timeline import TimelineReader, is_segment_event
+from my_proof.config import Settings, settings
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+    from my_proof.utils.bloom import BloomFilter
+    from my_proof.utils.db import Database
 
 
 class Proof:
-    def __init__(self):
-        self.proof_response = ProofResponse(dlp_id=settings.DLP_ID)
-        self.blockchain_client = BlockchainClient()
+    def __init__(self, job_settings: Optional[Settings] = None, blockchain_client: Optional[BlockchainClient] = None):
+        """
+        Args:
+            job_settings: Settings of this proof job, defaults to the global settings
+            blockchain_client: Client to reuse across proofs, a new one is created if not given
+        """
+        self.settings = job_settings or settings
+        self.proof_response = ProofResponse(dlp_id=self.settings.DLP_ID)
+        self._blockchain_client = blockchain_client
+        self.metrics = Metrics(self.settings.METRICS_ENABLED, self.settings.PROFILE_MODE)
+
+    @property
+    def blockchain_client(self) -> BlockchainClient:
+        """The blockchain client, created on first use since it loads web3"""
+        if self._blockchain_client is None:
+            self._blockchain_client = BlockchainClient()
+        return self._blockchain_client
 
     def generate(self) -> ProofResponse:
         """Generate proofs for all input files."""
+        with self.metrics.profile(self.settings.OUTPUT_DIR):
+            proof_response = self._generate()
+        self.metrics.stop()
+        self.metrics.log_report()
+        return proof_response
+
+    def _generate(self) -> ProofResponse:
         logging.info("Starting proof generation")
-        errors = []
 
+        # The Google and RPC lookups and the database setup (including loading web3 and SQLAlchemy)
+        # don't depend on the input, so run them while the files are parsed
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            storage_user_future = executor.submit(self.check_storage_user)
+            file_count_future = executor.submit(self.get_contributor_file_count)
+            database_future = executor.submit(self.connect_database)
+
+            # The same input proven again gets its earlier result instead of being ingested twice
+            cache_key = None
+            if self.settings.RESULT_CACHE_ENABLED:
+                with self.metrics.span('result_cache_lookup'):
+                    cache_key = result_cache_key(self.settings)
+                    cached_response = self.get_cached_result(cache_key, database_future)
+                if cached_response is not None:
+                    logging.info(f"Returning the cached result of input {cache_key}")
+                    # The same content uploaded again under a new file must still fail the duplicate check
+                    _, errors = storage_user_future.result()
+                    cached_response = self.rescore_repeat(cached_response)
+                    self.proof_response = self.apply_live_errors(cached_response, errors, file_count_future.result())
+                    return self.proof_response
+
+            # Skipping the segments contributed before needs the account's fingerprint, loaded once
+            # the account and database are known and only waited for at the first segment
+            fingerprint_future = None
+            if self.settings.INCREMENTAL_PROOFS and self.settings.GOOGLE_TOKEN:
+                fingerprint_future = executor.submit(
+                    lambda: self.load_fingerprint(storage_user_future.result()[0], database_future.result())
+                )
+
+            track = TrackStats()
+            parsed_files, schema_matches = self.parse_input_files(fingerprint_future, track)
+            fingerprint = None if fingerprint_future is None else fingerprint_future.result()
+
+            storage_user_hash, errors = storage_user_future.result()
+            existing_file_count = file_count_future.result()
+            db = database_future.result()
+
+        from my_proof.models.db import Contributions, Contributors
+
+        # Get existing file count from blockchain
+        if existing_file_count > 0:
+            errors.append(f"DUPLICATE_CONTRIBUTION")
+
+        # All files count towards one contribution: their coordinates are deduplicated together
+        # and scored once, so an export split over several files scores like a single one
+        schema_types = sorted({schema_type for schema_type, _ in parsed_files})
+        schema_type = schema_types[0] if len(schema_types) == 1 else schema_types
+        if len(parsed_files) > 1:
+            with self.metrics.span('merge_coordinates') as span:
+                runs = CoordinateRuns()
+                for _, file_coordinates in parsed_files:
+                    runs.add(file_coordinates)
+                coordinates = runs.result()
+                span.count('coordinates', len(coordinates))
+        elif parsed_files:
+            coordinates = parsed_files[0][1]
+
+        # Everything is written in one transaction: ids come back from the INSERTs, so nothing
+        # has to be committed early, and a failure leaves no partial contribution behind
+        sketch_scopes = None
+        with db.session() as session:
+            if parsed_files:
+                if len(coordinates) < scoring.MIN_COORDINATES:
+                    errors.append(f"NOT_ENOUGH_DATA")
+
+                # Save the contributor and coordinates to the database
+                with self.metrics.span('save_contributor') as span:
+                    contributor = Contributors(
+                        wallet_address=self.settings.OWNER_ADDRESS,
+                        ip_address_hash=None, # TODO: Add ip address hash
+                        storage_source="google-drive",
+                        storage_user_id_hash=storage_user_hash
+                    )
+                    session.add(contributor)
+                    session.flush()
+                    span.count('rows_inserted')
+                with self.metrics.span('insert_coordinates') as span:
+                    unique_count, duplicate_count = self.insert_coordinates(session, coordinates, contributor.id, span)
+
+                # Calculate proof-of-contribution scores
+                self.proof_response.ownership = 0
+                self.proof_response.quality = scoring.calculate_quality_score(len(coordinates))
+                self.proof_response.authenticity = scoring.calculate_authenticity_score(
+                    track.intervals,
+                    track.teleport_ratio,
+                    track.duplicate_timestamp_ratio,
+                    track.regular_interval_share
+                )
+                # A repeat upload without new segments has no coordinates left to score
+                total_coordinates = unique_count + duplicate_count
+                self.proof_response.uniqueness = unique_count / total_coordinates if total_coordinates else 0.0
+
+                self.proof_response.score = self.overall_score(
+                    self.proof_response.quality,
+                    self.proof_response.uniqueness,
+                    self.proof_response.authenticity
+                )
+
+                # Additional (public) properties to include in the proof about the data
+                self.proof_response.attributes = {
+                    'schema_type': schema_type,
+                    'files': len(parsed_files),
+                    'coordinates': len(coordinates),
+                    'unique_coordinates': unique_count,
+                    'track': track.summary(),
+                }
+
+                # Additional metadata about the proof, written onchain
+                self.proof_response.metadata = {
+                    'schema_type': schema_type,
+                }
+
+                self.proof_response.valid = len(errors) == 0
+
+                # Save contribution to the database
+                contribution = Contributions(
+                    contributor_id=contributor.id,
+                    score=self.proof_response.score,
+                    quality=self.proof_response.quality,
+                    uniqueness=self.proof_response.uniqueness,
+                    authenticity=self.proof_response.authenticity,
+                    ownership=self.proof_response.ownership,
+                    valid=self.proof_response.valid,
+                    file_id=self.settings.FILE_ID,
+                    coordinates=len(coordinates),
+                    unique_coordinates=unique_count,
+                    errors=errors if len(errors) > 0 else None
+                )
+                session.add(contribution)
+
+                if self.settings.SKETCHES_ENABLED:
+                    with self.metrics.span('sketches'):
+                        self.proof_response.attributes['sketch'], sketch_scopes = self.sketch_contribution(session, db, coordinates, contribution)
+
+            if fingerprint is not None and parsed_files:
+                with self.metrics.span('save_fingerprint'):
+                    db.save_fingerprint(session, storage_user_hash, fingerprint)
+                self.proof_response.attributes['segments'] = fingerprint.summary()
+
+            if not schema_matches:
+                errors.append(f"INVALID_SCHEMA")
+
+            # Only include errors if there are any
+            if len(errors) > 0:
+                self.proof_response.attributes['errors'] = errors
+
+            if cache_key is not None:
+                self.save_result(session, cache_key, db)
+
+            # Send the contributions and commit the whole proof
+            with self.metrics.span('commit') as span:
+                session.flush()
+                span.count('rows_inserted', 1 if parsed_files else 0)
+                session.commit()
+
+        if sketch_scopes:
+            with self.metrics.span('merge_sketch_aggregates'):
+                self.merge_sketch_aggregates(db, sketch_scopes)
+
+        if cache_key is not None:
+            self.cache_result_locally(cache_key)
+
+        return self.proof_response
+
+    def sketch_contribution(
+        self,
+        session: 'Session',
+        db: 'Database',
+        coordinates: np.ndarray,
+        contribution: Any
+    ) -> Tuple[Dict[str, Any], Dict[str, HyperLogLog]]:
+        """
+        Sketch the contribution's cells, compare them with recent and similar uploads, and store the sketches.
+
+        The overlap with recent uploads is estimated per region against the region's hourly
+        aggregates of the last SKETCH_WINDOW_HOURS. The contribution is merged into them by
+        merge_sketch_aggregates once it is committed, so the proof's transaction doesn't hold
+        the aggregate rows every other proof updates.
+
+        Args:
+            session: SQLAlchemy session
+            db: Connected database
+            coordinates: (N, 2) array of the contribution's unique coordinates
+            contribution: The Contributions row, not flushed yet
+
+        Returns:
+            Tuple[Dict[str, Any], Dict[str, HyperLogLog]]: (public sketch attributes of the proof,
+            sketch of each aggregate scope)
+        """
+        sketch = ContributionSketch.from_coordinates(coordinates)
+        scopes = {'global': sketch.hll, **{f"region:{region}": hll for region, hll in sketch.regions.items()}}
+        window_start = datetime.datetime.now(datetime.UTC).replace(minute=0, second=0, microsecond=0)
+        recent = db.load_sketch_aggregates(session, list(scopes), window_start - datetime.timedelta(hours=self.settings.SKETCH_WINDOW_HOURS - 1))
+
+        shared_cells = total_cells = 0.0
+        for region, hll in sketch.regions.items():
+            if f"region:{region}" in recent:
+                shared, count = estimate_overlap(hll, recent[f"region:{region}"])
+            else:
+                shared, count = 0.0, hll.estimate()
+            shared_cells += shared
+            total_cells += count
+        near_duplicate = db.find_near_duplicate(session, sketch.minhash)
+
+        session.flush()
+        db.save_sketch(session, contribution.id, sketch)
+
+        attributes = {
+            'estimated_cells': round(sketch.hll.estimate()),
+            'regions': len(sketch.regions),
+            'recent_overlap': round(shared_cells / total_cells, 4) if total_cells else 0.0,
+        }
+        if near_duplicate is not None and near_duplicate[1] >= self.settings.NEAR_DUPLICATE_JACCARD:
+            attributes['near_duplicate_file_id'] = near_duplicate[0]
+            attributes['near_duplicate_similarity'] = round(near_duplicate[1], 4)
+        return attributes, scopes
+
+    def merge_sketch_aggregates(self, db: 'Database', scopes: Dict[str, HyperLogLog]) -> None:
+        """
+        Merge a committed contribution's sketches into the hourly aggregates, in a transaction of their own.
+
+        The aggregates only feed the overlap estimates of later proofs, so a failed merge is
+        logged and leaves the committed proof as it is.
+
+        Args:
+            db: Connected database
+            scopes: Sketch of each aggregate scope, from sketch_contribution
+        """
+        from sqlalchemy.exc import SQLAlchemyError
+
+        window_start = datetime.datetime.now(datetime.UTC).replace(minute=0, second=0, microsecond=0)
+        try:
+            with db.session() as session:
+                db.merge_sketch_aggregates(session, scopes, window_start)
+        except SQLAlchemyError as e:
+            logging.error(f"Failed to merge the sketch aggregates: {str(e)}")
+
+    def get_contributor_file_count(self) -> int:
+        """Number of files the owner has already contributed to the DLP"""
+        with self.metrics.span('contributor_file_count'):
+            return self.blockchain_client.get_contributor_file_count(self.settings.OWNER_ADDRESS)
+
+    def connect_database(self) -> 'Database':
+        """Load the database layer and connect, creating missing tables"""
+        with self.metrics.span('connect_database'):
+            from my_proof.utils.db import db
+
+            db.init()
+            return db
+
+    def load_fingerprint(self, storage_user_hash: Optional[str], db: 'Database') -> Optional[ContributorFingerprint]:
+        """
+        Load the fingerprint of the segments the storage account has already contributed.
+
+        Args:
+            storage_user_hash: Hash of the Google user id, None if the user is unknown
+            db: Connected database
+
+        Returns:
+            Optional[ContributorFingerprint]: The fingerprint (empty for a first contribution),
+            None if the account is unknown and every segment has to be processed
+        """
+        if storage_user_hash is None:
+            return None
+        with self.metrics.span('load_fingerprint'), db.session() as session:
+            fingerprint = db.load_fingerprint(session, storage_user_hash)
+        return fingerprint or ContributorFingerprint()
+
+    def get_cached_result(self, cache_key: str, database_future: 'Future[Database]') -> Optional[ProofResponse]:
+        """
+        Look up the result of an earlier proof of the same input, in the local cache and then the database.
+
+        Args:
+            cache_key: Key from result_cache_key
+            database_future: Future of the database connection, only waited for on a local miss
+
+        Returns:
+            Optional[ProofResponse]: The earlier result, None on a miss
+        """
+        disk_cache = self.disk_result_cache()
+        response = disk_cache.get(cache_key) if disk_cache else None
+        if response is None:
+            db = database_future.result()
+            with db.session() as session:
+                response = db.get_proof_result(session, cache_key)
+            if response is not None and disk_cache:
+                disk_cache.put(cache_key, response)
+        return None if response is None else ProofResponse(**response)
+
+    def overall_score(self, quality: float, uniqueness: float, authenticity: float) -> float:
+        """
+        Combine the proof-of-contribution scores into the overall score.
+
+        Args:
+            quality: Quality score
+            uniqueness: Share of coordinates not stored before
+            authenticity: Authenticity score, only applied with AUTHENTICITY_SCORING
+
+        Returns:
+            float: Overall score between 0 and 1
+        """
+        # If uniqueness is high, give more weight to quality
+        if uniqueness > 0.5:
+            score = 0.5 * quality + 0.5 * uniqueness
+        else:
+            score = 0.005 * quality + 0.995 * uniqueness
+        # A track that looks fabricated loses its score in proportion
+        if self.settings.AUTHENTICITY_SCORING:
+            score *= authenticity
+        return score
+
+    def rescore_repeat(self, response: ProofResponse) -> ProofResponse:
+        """
+        Score a cached result as a repeat of its proof.
+
+        The cached result was committed along with the coordinates of its input, so none of
+        them are unique anymore when the same owner proves the same input again. Uniqueness
+        drops to 0 and the score is recomputed, as reprocessing the input would.
+
+        Args:
+            response: The cached result
+
+        Returns:
+            ProofResponse: The result with the uniqueness and score of a repeat
+        """
+        attributes = dict(response.attributes or {})
+        if 'unique_coordinates' in attributes:
+            attributes['unique_coordinates'] = 0
+        return response.model_copy(update={
+            'attributes': attributes,
+            'uniqueness': 0.0,
+            'score': self.overall_score(response.quality, 0.0, response.authenticity),
+        })
+
+    def apply_live_errors(self, response: ProofResponse, errors: List[str], existing_file_count: int) -> ProofResponse:
+        """
+        Replace the storage account and duplicate errors of a cached result with those of this proof.
+
+        Args:
+            response: The cached result
+            errors: Storage errors of this proof
+            existing_file_count: Files the owner has already contributed, read for this proof
+
+        Returns:
+            ProofResponse: The result with the current errors, invalid if any of them is set
+        """
+        live_errors = list(errors)
+        if existing_file_count > 0:
+            live_errors.append("DUPLICATE_CONTRIBUTION")
+        attributes = dict(response.attributes or {})
+        cached_errors = [error for error in attributes.get('errors') or [] if error not in LIVE_ERRORS]
+        all_errors = live_errors + cached_errors
+        if all_errors:
+            attributes['errors'] = all_errors
+        else:
+            attributes.pop('errors', None)
+        # A result cached as invalid stays invalid even if its live errors have cleared since
+        return response.model_copy(update={
+            'attributes': attributes,
+            'valid': response.valid and not live_errors,
+        })
+
+    def save_result(self, session: 'Session', cache_key: str, db: 'Database') -> None:
+        """Store the result of this proof in the database, unless it may change on a retry"""
+        response = self.proof_response.model_dump()
+        if is_cacheable(response):
+            db.save_proof_result(session, cache_key, response, self.settings.FILE_ID)
+
+    def cache_result_locally(self, cache_key: str) -> None:
+        """Store the result of this proof in the local cache once it is committed, unless it may change on a retry"""
+        response = self.proof_response.model_dump()
+        disk_cache = self.disk_result_cache()
+        if disk_cache and is_cacheable(response):
+            disk_cache.put(cache_key, response)
+
+    def disk_result_cache(self) -> Optional[DiskResultCache]:
+        """The local result cache, None if RESULT_CACHE_DIR is unset"""
+        if not self.settings.RESULT_CACHE_DIR:
+            return None
+        return DiskResultCache(self.settings.RESULT_CACHE_DIR, self.settings.RESULT_CACHE_MAX_ENTRIES)
+
+    def check_storage_user(self) -> Tuple[Optional[str], List[str]]:
+        """
+        Look up the Google account the data was exported from.
+
+        Returns:
+            Tuple[Optional[str], List[str]]: (hash of the Google user id, storage errors)
+        """
+        errors = []
         storage_user_hash = None
-        if settings.GOOGLE_TOKEN:
-            google_user = get_google_user()
+        if self.settings.GOOGLE_TOKEN:
+            with self.metrics.span('google_user'):
+                google_user = get_google_user(self.settings.GOOGLE_TOKEN)
             if google_user:
                 storage_user_hash = hashlib.sha256(google_user.id.encode()).hexdigest()
                 if not google_user.verified_email:
@@ -34,89 +463,374 @@ class Proof:
                 errors.append("UNVERIFIED_STORAGE_USER")
         else:
             errors.append("MISSING_STORAGE_TOKEN")
+        return storage_user_hash, errors
 
-        # Get existing file count from blockchain
-        existing_file_count = self.blockchain_client.get_contributor_file_count()
-        if existing_file_count > 0:
-            errors.append(f"DUPLICATE_CONTRIBUTION")
+    def parse_input_files(
+        self,
+        fingerprint_future: Optional['Future[ContributorFingerprint]'] = None,
+        track: Optional[TrackStats] = None
+    ) -> Tuple[List[Tuple[str, np.ndarray]], bool]:
+        """
+        Parse, validate and extract the coordinates of all input files.
 
-        # Iterate through files and calculate data validity
-        for input_filename in os.listdir(settings.INPUT_DIR):
-            logging.info(f"Checking file: {input_filename}")
-            input_file = os.path.join(settings.INPUT_DIR, input_filename)
-
-            if os.path.splitext(input_file)[1].lower() == '.json':
-                with open(input_file, 'r') as f:
-                    json_content = f.read()
-                    logging.info(f"Validating file: {json_content[:50]}...")
-                    input_data = json.loads(json_content)
-                    schema_type, schema_matches = validate_schema(input_data)
-                    if not schema_matches:
-                        errors.append(f"INVALID_SCHEMA")
-                        break
-                    
-                    coordinates = extract_coordinates(input_data, schema_type)
-                    if len(coordinates) < scoring.MIN_COORDINATES:
-                        errors.append(f"NOT_ENOUGH_DATA")
-                        
-                    # Save the contributor and coordinates to the database
-                    with db.session() as session:
-                        contributor = Contributors(
-                            wallet_address=settings.OWNER_ADDRESS,
-                            ip_address_hash=None, # TODO: Add ip address hash
-                            storage_source="google-drive",
-                            storage_user_id_hash=storage_user_hash
-                        )
-                        session.add(contributor)
-                        session.commit()
-                        unique_coordinates, duplicate_coordinates = db.batch_insert_coordinates(session, coordinates, contributor.id)
-
-                        # Calculate proof-of-contribution scores
-                        self.proof_response.ownership = 0
-                        self.proof_response.quality = scoring.calculate_quality_score(len(coordinates)) if schema_matches else 0.0
-                        self.proof_response.authenticity = 0
-                        self.proof_response.uniqueness = unique_coordinates / (unique_coordinates + duplicate_coordinates)
-
-                        # Calculate overall score. If uniqueness is high, give more weight to quality.
-                        if self.proof_response.uniqueness > 0.5:
-                            self.proof_response.score = 0.5 * self.proof_response.quality + 0.5 * self.proof_response.uniqueness
-                        else:
-                            self.proof_response.score = 0.005 * self.proof_response.quality + 0.995 * self.proof_response.uniqueness
-
-                        # Additional (public) properties to include in the proof about the data
-                        self.proof_response.attributes = {
-                            'schema_type': schema_type,
-                            'coordinates': len(coordinates),
-                            'unique_coordinates': unique_coordinates,
-                        }
-                        
-                        # Additional metadata about the proof, written onchain
-                        self.proof_response.metadata = {
-                            'schema_type': schema_type,
-                        }
-                        
-                        self.proof_response.valid = len(errors) == 0
-                        
-                        # Save contribution to the database
-                        contribution = Contributions(
-                            contributor_id=contributor.id,
-                            score=self.proof_response.score,
-                            quality=self.proof_response.quality,
-                            uniqueness=self.proof_response.uniqueness,
-                            authenticity=self.proof_response.authenticity,
-                            ownership=self.proof_response.ownership,
-                            valid=self.proof_response.valid,
-                            file_id=settings.FILE_ID,
-                            coordinates=len(coordinates),
-                            unique_coordinates=unique_coordinates,
-                            errors=errors if len(errors) > 0 else None
-                        )
-                        session.add(contribution)
-                        session.commit()
-        
-        # Only include errors if there are any
-        if len(errors) > 0:
-            self.proof_response.attributes['errors'] = errors
+        Files are parsed one at a time unless PARSE_WORKERS is set and the input holds at least
+        PARSE_PROCESS_MIN_MB, then in up to PARSE_WORKERS processes at once. MAX_MEMORY_MB keeps
+        them in the proof process, since each process would need the whole budget. Either way,
+        the next zip members are decompressed by INPUT_DECOMPRESS_WORKERS threads meanwhile.
 
-        return self.proof_response
+        Args:
+            fingerprint_future: Future of the segments contributed before, which are skipped
+            track: Track statistics the valid files are added to
+
+        Returns:
+            Tuple[List[Tuple[str, np.ndarray]], bool]: ((schema_type, coordinates) of each valid
+            file up to the first invalid one, whether all files matched their schema)
+        """
+        input_files = list_input_files(self.settings.INPUT_DIR)
+        workers = min(self.settings.PARSE_WORKERS, len(input_files))
+        input_mb = sum(input_file.size for input_file in input_files) / (1024 * 1024)
+        if self.settings.MAX_MEMORY_MB or input_mb < self.settings.PARSE_PROCESS_MIN_MB:
+            workers = 1
+        if workers > 1:
+            # The processes are handed a copy of the fingerprint, so it's needed up front
+            fingerprint = None if fingerprint_future is None else fingerprint_future.result()
+            results = self.parse_files_in_processes(input_files, workers, fingerprint)
+        else:
+            prefetched = prefetch_members(input_files, self.settings.INPUT_DECOMPRESS_WORKERS)
+            results = (self.parse_file(input_file, fingerprint_future) for input_file in prefetched)
+
+        parsed_files = []
+        for schema_type, schema_matches, coordinates, file_track in results:
+            if not schema_matches:
+                return parsed_files, False
+            parsed_files.append((schema_type, coordinates))
+            if track is not None:
+                track.merge(file_track)
+        return parsed_files, True
+
+    def parse_files_in_processes(
+        self,
+        input_files: List[InputFile],
+        workers: int,
+        fingerprint: Optional[ContributorFingerprint] = None
+    ) -> List[Tuple[str, bool, np.ndarray, TrackStats]]:
+        """
+        Parse files in a pool of processes, one file per process at a time.
+
+        Only the coordinate arrays come back, through shared memory, along with the track
+        statistics, the segments each process found new and its metrics spans. As in the
+        sequential loop, files after the first one that fails its schema are left out. Zip
+        members are extracted into files by INPUT_DECOMPRESS_WORKERS threads ahead of their
+        process, which reads them from disk.
+
+        Args:
+            input_files: Files to parse
+            workers: Number of processes
+            fingerprint: Segments contributed before, which are skipped
+
+        Returns:
+            List[Tuple[str, bool, np.ndarray, TrackStats]]: (schema_type, schema_matches, coordinates,
+            track statistics) of each file up to the first invalid one, in input order
+        """
+        results = []
+        futures = []
+        read = 0  # Futures whose result was taken, or raised
+        extracted = extract_members(input_files, self.settings.INPUT_DECOMPRESS_WORKERS)
+        try:
+            # Spawned rather than forked, since the prelude threads may hold locks
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'), initializer=_init_parse_process) as executor:
+                try:
+                    for input_file in extracted:
+                        futures.append(executor.submit(_parse_file_in_process, self.settings, input_file, fingerprint))
+                    for future in futures:
+                        if results and not results[-1][1]:
+                            break
+                        read += 1
+                        schema_type, schema_matches, shared_coordinates, file_track, recorded, spans = future.result()
+                        results.append((schema_type, schema_matches, take_array(shared_coordinates), file_track))
+                        self.metrics.spans.extend(spans)
+                        if fingerprint is not None:
+                            fingerprint.absorb(recorded)
+                finally:
+                    # Free the shared memory of files parsed past the invalid or failed one
+                    _release_parse_results(futures[read:])
+        finally:
+            extracted.close()
+            for input_file in input_files:
+                input_file.remove_extracted()
+        return results
+
+    def parse_file(
+        self,
+        input_file: InputFile,
+        fingerprint_future: Optional['Future[ContributorFingerprint]'] = None
+    ) -> Tuple[str, bool, np.ndarray, TrackStats]:
+        """
+        Parse, validate and extract the coordinates and track statistics of one input file.
+
+        Args:
+            input_file: The input file
+            fingerprint_future: Future of the segments contributed before, which are skipped
+
+        Returns:
+            Tuple[str, bool, np.ndarray, TrackStats]: (schema_type, schema_matches, (N, 2) array of
+            unique coordinates, track statistics)
+        """
+        logging.info(f"Checking file: {input_file.name}")
+        with self.metrics.span('parse_file') as span:
+            span.count('bytes_read', input_file.size)
+            track = TrackStats()
+            result = None
+            # Scanning skips the segments' decoding, which fingerprints need, and can only map plain files
+            if self.settings.FAST_SCAN and self.settings.SCHEMA_SAMPLE_SIZE and fingerprint_future is None and input_file.member is None:
+                result = self.scan_file(input_file, span, track)
+            if result is None:
+                track = TrackStats()
+                with input_file.open() as f:
+                    result = self.process_file(f, span, fingerprint_future, track)
+            schema_type, schema_matches, coordinates = result
+            span.count('coordinates', len(coordinates))
+        return schema_type, schema_matches, coordinates, track
+
+    def scan_file(self, input_file: InputFile, span=NULL_SPAN, track: Optional[TrackStats] = None) -> Optional[Tuple[str, bool, np.ndarray]]:
+        """
+        Validate the first SCHEMA_SAMPLE_SIZE segments of a file, then scan the coordinates of all
+        of them from the memory-mapped file without decoding any more segments.
+
+        Only the validated segments are decoded, so the track statistics cover those segments.
+
+        Args:
+            input_file: A plain JSON input file
+            span: Metrics span the validation and scan times are added to
+            track: Track statistics the validated segments are added to
+
+        Returns:
+            Optional[Tuple[str, bool, np.ndarray]]: (schema_type, schema_matches, (N, 2) array of
+            unique coordinates), None if the file needs the full parser
+        """
+        with input_file.open() as f:
+            reader = TimelineReader(f)
+            schema_type = reader.schema_type
+            logging.info(f"Validating the first {self.settings.SCHEMA_SAMPLE_SIZE} segments as {schema_type}")
+            validator = StreamValidator(schema_type, sample_size=0)
+            track_collector = TrackCollector(schema_type, track) if track is not None else None
+            checked_segments = 0
+            with span.timer('validate'):
+                for event, key, value in reader.events():
+                    if not validator.validate(event, key, value):
+                        return schema_type, False, np.empty((0, 2))
+                    if is_segment_event(event, key):
+                        if track_collector is not None:
+                            track_collector.add_segment(value)
+                        checked_segments += 1
+                        if checked_segments >= self.settings.SCHEMA_SAMPLE_SIZE:
+                            break
+                else:
+                    # The whole document was read, so its document-level constraints can be checked too
+                    if not validator.finish(reader):
+                        return schema_type, False, np.empty((0, 2))
+
+        if track_collector is not None:
+            track_collector.finish()
+        with span.timer('scan'):
+            coordinates = scan_coordinates(input_file.path, schema_type)
+        if coordinates is None:
+            logging.info(f"Unusual structure in {input_file.name}, using the full parser")
+            return None
+        return schema_type, True, coordinates
+
+    def process_file(
+        self,
+        f: IO[str],
+        span=NULL_SPAN,
+        fingerprint_future: Optional['Future[ContributorFingerprint]'] = None,
+        track: Optional[TrackStats] = None
+    ) -> Tuple[str, bool, np.ndarray]:
+        """
+        Stream a timeline export, validating and extracting coordinates one segment at a time.
+
+        Args:
+            f: The opened input file
+            span: Metrics span the validation, extraction and dedup times are added to
+            fingerprint_future: Future of the segments contributed before, which are neither
+                validated nor extracted. It is waited for at the first segment.
+            track: Track statistics the timed points of the segments are added to
+
+        Returns:
+            Tuple[str, bool, np.ndarray]: (schema_type, schema_matches, (N, 2) array of unique coordinates)
+        """
+        reader = TimelineReader(f)
+        schema_type = reader.schema_type
+        logging.info(f"Validating file as {schema_type}")
+        validator = StreamValidator(schema_type)
+
+        collector = CoordinateCollector(schema_type)
+        track_collector = TrackCollector(schema_type, track) if track is not None else None
+        extraction_failed = False
+        fingerprint = None
+        for event, key, value in reader.events():
+            if fingerprint_future is not None and is_segment_event(event, key):
+                with span.timer('fingerprint'):
+                    if fingerprint is None:
+                        fingerprint = fingerprint_future.result()
+                    if not fingerprint.is_new(value):
+                        span.count('known_segments')
+                        continue
+            with span.timer('validate'):
+                if not validator.validate(event, key, value):
+                    return schema_type, False, np.empty((0, 2))
+            if is_segment_event(event, key) and not extraction_failed:
+                span.count('segments')
+                try:
+                    with span.timer('extract'):
+                        collector.add_segment(value)
+                except Exception as e:
+                    logging.error(f"Failed to extract coordinates: {str(e)}")
+                    extraction_failed = True
+                if track_collector is not None:
+                    with span.timer('track'):
+                        track_collector.add_segment(value)
+
+        with span.timer('validate'):
+            if not validator.finish(reader):
+                return schema_type, False, np.empty((0, 2))
+        if extraction_failed:
+            return schema_type, True, np.empty((0, 2))
+        if track_collector is not None:
+            with span.timer('track'):
+                track_collector.finish()
+        try:
+            with span.timer('dedup'):
+                return schema_type, True, collector.result()
+        except Exception as e:
+            logging.error(f"Failed to extract coordinates: {str(e)}")
+            return schema_type, True, np.empty((0, 2))
+
+    def insert_coordinates(self, session: 'Session', coordinates: np.ndarray, contributor_id: int, span=NULL_SPAN) -> Tuple[int, int]:
+        """
+        Insert coordinates, a chunk at a time with MAX_MEMORY_MB set.
+
+        The cell keys and filter probes of a chunk take several times the memory of its rows,
+        so under a budget the (possibly memory-mapped) coordinates are streamed to the database
+        in chunks of a sixteenth of the budget.
+
+        Args:
+            session: SQLAlchemy session
+            coordinates: (N, 2) array of unique (latitude, longitude) rows
+            contributor_id: ID of the contributor
+            span: Metrics span the row counts are added to
+
+        Returns:
+            Tuple[int, int]: (successful inserts, duplicates skipped)
+        """
+        from my_proof.utils.bloom import get_coordinate_filter
+        from my_proof.utils.db import db
+
+        # Refreshed once for all chunks. Without a snapshot, every point is probed in the database.
+        coordinate_filter = get_coordinate_filter(db.engine)
+        if not self.settings.MAX_MEMORY_MB:
+            return self.insert_coordinate_chunk(session, coordinates, contributor_id, coordinate_filter, span)
+
+        chunk_rows = max(self.settings.COORDINATE_CHUNK_SIZE, (self.settings.MAX_MEMORY_MB << 20) // 16 // 16)  # 16 bytes per row
+        inserted = skipped = 0
+        for start in range(0, len(coordinates), chunk_rows):
+            chunk_inserted, chunk_skipped = self.insert_coordinate_chunk(
+                session, np.array(coordinates[start:start + chunk_rows]), contributor_id, coordinate_filter, span
+            )
+            inserted += chunk_inserted
+            skipped += chunk_skipped
+        return inserted, skipped
+
+    def insert_coordinate_chunk(
+        self,
+        session: 'Session',
+        coordinates: np.ndarray,
+        contributor_id: int,
+        coordinate_filter: Optional['BloomFilter'] = None,
+        span=NULL_SPAN
+    ) -> Tuple[int, int]:
+        """
+        Insert coordinates, skipping those the coordinate filter already knows.
+
+        Cells the filter reports as known are counted as duplicates without a database round
+        trip, so only probably-new points are sent to Postgres. At the filter's false positive
+        rate a new point is miscounted as a duplicate.
+
+        With WRITE_BEHIND, the new points are only found with a read-only probe and queued in
+        the proof's transaction, and the write-behind drainer inserts them later. Until then,
+        a concurrent proof of the same points also counts them as new.
+
+        Args:
+            session: SQLAlchemy session
+            coordinates: (N, 2) array of unique (latitude, longitude) rows
+            contributor_id: ID of the contributor
+            coordinate_filter: Filter of the known cells, None to probe every point in the database
+            span: Metrics span the row counts are added to
+
+        Returns:
+            Tuple[int, int]: (successful inserts, duplicates skipped)
+        """
+        from my_proof.utils.db import db
+
+        span.count('coordinates', len(coordinates))
+        known = 0
+        if coordinate_filter is not None and len(coordinates) > 0:
+            probably_known = coordinate_filter.contains(cell_keys(coordinates))
+            coordinates = coordinates[~probably_known]
+            known = int(probably_known.sum())
+            logging.info(f"Coordinate filter skipped {known} of {known + len(coordinates)} coordinates")
+            span.count('filter_skipped', known)
+
+        if self.settings.WRITE_BEHIND:
+            # One point per cell, like the COPY path where ON CONFLICT (cell) drops the rest
+            _, first_in_cell = np.unique(cell_keys(coordinates), return_index=True)
+            cell_coordinates = coordinates[np.sort(first_in_cell)]
+            new_coordinates = cell_coordinates[db.probe_new_coordinates(session, cell_coordinates)]
+            db.enqueue_coordinate_write(session, new_coordinates, contributor_id)
+            span.count('rows_queued', len(new_coordinates))
+            return len(new_coordinates), len(coordinates) - len(new_coordinates) + known
+
+        inserted, skipped = db.copy_insert_coordinates(session, coordinates, contributor_id)
+        span.count('rows_inserted', inserted)
+        return inserted, skipped + known
+
+
+def _init_parse_process() -> None:
+    # Names the spans recorded in this process in the metrics report
+    threading.current_thread().name = f"parse-{os.getpid()}"
+
+
+def _completed(value: Any) -> Future:
+    """A future already holding a value"""
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def _release_parse_results(futures: List[Future]) -> None:
+    """Cancel parsing processes whose results won't be read, and free the shared memory of those already done"""
+    for future in futures:
+        if future.cancel():
+            continue
+        try:
+            take_array(future.result()[2])
+        except Exception:
+            pass
+
+
+def _parse_file_in_process(
+    job_settings: Settings,
+    input_file: InputFile,
+    fingerprint: Optional[ContributorFingerprint]
+) -> Tuple[str, bool, SharedArray, TrackStats, Optional[ContributorFingerprint], List[Span]]:
+    """
+    Parse one input file in a parsing process.
 
+    Returns:
+        Tuple: (schema_type, schema_matches, coordinates in shared memory, track statistics,
+        segments found new, metrics spans)
+    """
+    proof = Proof(job_settings)
+    schema_type, schema_matches, coordinates, track = proof.parse_file(input_file, None if fingerprint is None else _completed(fingerprint))
+    recorded = None if fingerprint is None else fingerprint.recorded()
+    return schema_type, schema_matches, share_array(coordinates), track, recorded, proof.metrics.spans
@@ -0,0 +1,254 @@
+"""Spatiotemporal statistics of a timeline track, for the authenticity score"""
+import datetime
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from my_proof.utils.google import COORDINATE_BATCH_SIZE, parse_points
+from my_proof.utils.timeline import IOS_SCHEMA
+
+EARTH_RADIUS_M = 6371008.8  # Mean Earth radius
+MAX_SPEED_MPS = 300.0  # About 1080 km/h, faster than any airliner, so faster moves are teleports
+DUPLICATE_TIME_DISTANCE_M = 1000.0  # Points at the same time further apart than this are conflicting, closer ones are segment boundaries
+MAX_INTERVAL_S = 3600  # Longest sampling interval counted in the regularity histogram
+
+
+def haversine_m(coordinates_a: np.ndarray, coordinates_b: np.ndarray) -> np.ndarray:
+    """
+    Great-circle distances between two arrays of points.
+
+    Args:
+        coordinates_a: (N, 2) array of (latitude, longitude) rows in degrees
+        coordinates_b: (N, 2) array of (latitude, longitude) rows in degrees
+
+    Returns:
+        np.ndarray: (N,) distances in meters
+    """
+    lat_a, lng_a = np.radians(coordinates_a[:, 0]), np.radians(coordinates_a[:, 1])
+    lat_b, lng_b = np.radians(coordinates_b[:, 0]), np.radians(coordinates_b[:, 1])
+    a = np.sin((lat_b - lat_a) / 2) ** 2 + np.cos(lat_a) * np.cos(lat_b) * np.sin((lng_b - lng_a) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _timestamp(value: str) -> float:
+    moment = datetime.datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp()
+
+
+class TrackStats:
+    """
+    Streaming statistics of the moves between consecutive points of a track.
+
+    Batches of timed points are added in track order and reduced to counts straight away, with
+    whole-batch NumPy operations: haversine speeds, teleports (moves faster than MAX_SPEED_MPS),
+    points at the same time but different places, the longest run of equal timestamps and a
+    histogram of the sampling intervals. Memory doesn't grow with the track. The last point of
+    a batch is carried over, so moves across batches are counted too.
+    """
+
+    def __init__(self):
+        self.points = 0
+        self.intervals = 0
+        self.moving_intervals = 0
+        self.out_of_order = 0
+        self.teleports = 0
+        self.duplicate_timestamps = 0
+        self.longest_duplicate_run = 0
+        self.max_speed_mps = 0.0
+        self.interval_histogram = np.zeros(MAX_INTERVAL_S + 1, dtype=np.int64)
+        self._last_time: Optional[float] = None
+        self._last_coordinate: Optional[np.ndarray] = None
+        self._run = 0
+
+    def add(self, times: np.ndarray, coordinates: np.ndarray) -> None:
+        """
+        Add a batch of points.
+
+        Args:
+            times: (N,) POSIX timestamps in seconds
+            coordinates: (N, 2) array of (latitude, longitude) rows
+        """
+        if len(times) == 0:
+            return
+        self.points += len(times)
+        if self._last_time is not None:
+            times = np.concatenate(([self._last_time], times))
+            coordinates = np.concatenate((self._last_coordinate[None, :], coordinates))
+        self._last_time = float(times[-1])
+        self._last_coordinate = coordinates[-1].copy()
+        if len(times) < 2:
+            return
+
+        deltas = np.diff(times)
+        distances = haversine_m(coordinates[:-1], coordinates[1:])
+        self.intervals += len(deltas)
+        self.out_of_order += int(np.count_nonzero(deltas < 0))
+
+        moving = deltas > 0
+        self.moving_intervals += int(np.count_nonzero(moving))
+        if moving.any():
+            speeds = distances[moving] / deltas[moving]
+            self.teleports += int(np.count_nonzero(speeds > MAX_SPEED_MPS))
+            self.max_speed_mps = max(self.max_speed_mps, float(speeds.max()))
+            seconds = np.rint(deltas[moving]).astype(np.int64)
+            self.interval_histogram += np.bincount(seconds[seconds <= MAX_INTERVAL_S], minlength=MAX_INTERVAL_S + 1)
+
+        same_time = deltas == 0
+        self.duplicate_timestamps += int(np.count_nonzero(same_time & (distances > DUPLICATE_TIME_DISTANCE_M)))
+        self._count_runs(same_time)
+
+    def merge(self, other: 'TrackStats') -> None:
+        """Add the counts of another track, e.g. another file. No move is counted between the two."""
+        self.points += other.points
+        self.intervals += other.intervals
+        self.moving_intervals += other.moving_intervals
+        self.out_of_order += other.out_of_order
+        self.teleports += other.teleports
+        self.duplicate_timestamps += other.duplicate_timestamps
+        self.longest_duplicate_run = max(self.longest_duplicate_run, other.longest_duplicate_run)
+        self.max_speed_mps = max(self.max_speed_mps, other.max_speed_mps)
+        self.interval_histogram += other.interval_histogram
+
+    @property
+    def teleport_ratio(self) -> float:
+        return self.teleports / self.moving_intervals if self.moving_intervals else 0.0
+
+    @property
+    def duplicate_timestamp_ratio(self) -> float:
+        return self.duplicate_timestamps / self.intervals if self.intervals else 0.0
+
+    @property
+    def regular_interval_share(self) -> float:
+        """Share of the sampling intervals equal to the most common one, to the second"""
+        total = int(self.interval_histogram.sum())
+        return int(self.interval_histogram.max()) / total if total else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts and ratios for the proof attributes"""
+        return {
+            'points': self.points,
+            'teleports': self.teleports,
+            'teleport_ratio': round(self.teleport_ratio, 6),
+            'duplicate_timestamps': self.duplicate_timestamps,
+            'longest_duplicate_run': self.longest_duplicate_run,
+            'regular_interval_share': round(self.regular_interval_share, 6),
+            'out_of_order': self.out_of_order,
+            'max_speed_kmh': round(self.max_speed_mps * 3.6, 1),
+        }
+
+    def _count_runs(self, same_time: np.ndarray) -> None:
+        """Track the longest run of consecutive equal timestamps, in points"""
+        breaks = np.flatnonzero(~same_time)
+        if len(breaks) == 0:
+            self._run += len(same_time)
+            self.longest_duplicate_run = max(self.longest_duplicate_run, self._run + 1)
+            return
+        runs = [self._run + int(breaks[0])]
+        if len(breaks) > 1:
+            runs.append(int((np.diff(breaks) - 1).max()))
+        self._run = len(same_time) - 1 - int(breaks[-1])
+        runs.append(self._run)
+        longest = max(runs)
+        if longest:
+            self.longest_duplicate_run = max(self.longest_duplicate_run, longest + 1)
+
+
+class TrackCollector:
+    """
+    Collects the timed points of streamed segments in track order and feeds them to TrackStats.
+
+    Points of timelinePath entries get their own time, visit locations the segment start and
+    activity start and end points the segment start and end. Raw points are buffered and parsed
+    in batches of `batch_size`. Each batch is sorted by time before it is added, since exports
+    list overlapping segments (a path and the visits along it) one after the other.
+    """
+
+    def __init__(self, schema_type: str, stats: TrackStats, batch_size: int = COORDINATE_BATCH_SIZE):
+        self.schema_type = schema_type
+        self.stats = stats
+        self.batch_size = batch_size
+        self._times: List[float] = []
+        self._offsets: List[Any] = []  # Minutes after the time, converted a batch at a time
+        self._points: List[str] = []
+
+    def add_segment(self, segment: Dict[str, Any]) -> None:
+        """Buffer the timed points of a segment. Segments with unreadable times are left out."""
+        times_added = len(self._times)
+        try:
+            self._add_segment(segment)
+        except (KeyError, TypeError, ValueError):
+            del self._times[times_added:]
+            del self._offsets[times_added:]
+            del self._points[times_added:]
+            return
+        if len(self._points) >= self.batch_size:
+            self._flush()
+
+    def finish(self) -> None:
+        """Add the remaining buffered points"""
+        self._flush()
+
+    def _add_segment(self, segment: Dict[str, Any]) -> None:
+        start = _timestamp(segment['startTime'])
+        ios = self.schema_type == IOS_SCHEMA
+
+        paths = [path for path in segment.get('timelinePath', ()) if 'point' in path]
+        if paths:
+            if ios:
+                self._times.extend([start] * len(paths))
+                self._offsets.extend([path.get('durationMinutesOffsetFromStartTime', 0) for path in paths])
+            else:
+                self._times.extend([_timestamp(path['time']) for path in paths])
+                self._offsets.extend([0] * len(paths))
+            self._points.extend([path['point'] for path in paths])
+
+        place_location = segment.get('visit', {}).get('topCandidate', {}).get('placeLocation')
+        if place_location:
+            self._times.append(start)
+            self._offsets.append(0)
+            self._points.append(place_location if ios else place_location['latLng'])
+
+        activity = segment.get('activity')
+        if activity:
+            for key, moment in (('start', start), ('end', None)):
+                point = activity.get(key)
+                if point:
+                    self._times.append(_timestamp(segment['endTime']) if moment is None else moment)
+                    self._offsets.append(0)
+                    self._points.append(point if ios else point['latLng'])
+
+    def _flush(self) -> None:
+        if not self._points:
+            return
+        times, coordinates = self._parse()
+        self._times, self._offsets, self._points = [], [], []
+        if not len(times):
+            return
+        order = np.argsort(times, kind='stable')
+        self.stats.add(times[order], coordinates[order])
+
+    def _parse(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Parse the buffered points in bulk, or one at a time to keep the valid ones of a batch with malformed points"""
+        try:
+            times = np.array(self._times, dtype=np.float64) + 60 * np.array(self._offsets, dtype=np.float64)
+            coordinates = parse_points(self._points, self.schema_type)
+            if len(coordinates) == len(times):
+                return times, coordinates
+        except (TypeError, ValueError):
+            pass
+
+        kept_times, kept_coordinates = [], []
+        for time, offset, point in zip(self._times, self._offsets, self._points):
+            try:
+                parsed = parse_points([point], self.schema_type)
+                timestamp = time + 60 * float(offset)
+            except (TypeError, ValueError):
+                continue
+            if len(parsed):
+                kept_times.append(timestamp)
+                kept_coordinates.append(parsed[0])
+        logging.error(f"Skipped {len(self._points) - len(kept_times)} malformed track points")
+        return np.array(kept_times, dtype=np.float64), np.array(kept_coordinates, dtype=np.float64).reshape(-1, 2)
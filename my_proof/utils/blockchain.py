@@ -1,50 +1,161 @@
 import json
 import os
-from web3 import Web3
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
 import logging
 
 from my_proof.config import settings
+from my_proof.utils.network import TTLCache, http_session
+from my_proof.utils.retry import call_with_retry, is_transient_http_error
+
+CONTRACT_PATH = os.path.join(os.path.dirname(__file__), '..', 'contracts', 'dlp-contract.json')
+
+# Files contributed per lowercase owner address, looked up ahead for the next proof of each owner
+_file_count_cache = TTLCache()
+
+
+@lru_cache(maxsize=None)
+def load_contract_abi() -> List[Dict[str, Any]]:
+    """The DLP contract ABI, read once per process"""
+    with open(CONTRACT_PATH, 'r') as f:
+        return json.load(f)
+
+
+def cache_contributor_file_counts(file_counts: Dict[str, int]) -> None:
+    """
+    Store file counts looked up elsewhere, e.g. by the batch runner before starting its workers.
+
+    Each count is used by one lookup only, so the duplicate check of a later proof of the same
+    owner reads the count again.
+
+    Args:
+        file_counts: Number of files per owner address
+    """
+    _file_count_cache.update({owner.lower(): count for owner, count in file_counts.items()})
+
 
 class BlockchainClient:
     """Client for interacting with blockchain contracts."""
-    
+
     def __init__(self):
         """Initialize the blockchain client using global settings."""
+        # web3 is by far the slowest import, so it is only loaded once a client is needed
+        from web3 import Web3
+
         try:
-            self.w3 = Web3(Web3.HTTPProvider(settings.RPC_URL))
-            
-            # Load the contract ABI
-            contract_path = os.path.join(os.path.dirname(__file__), '..', 'contracts', 'dlp-contract.json')
-            with open(contract_path, 'r') as f:
-                contract_abi = json.load(f)
-                
+            self.w3 = Web3(Web3.HTTPProvider(
+                settings.RPC_URL,
+                request_kwargs={'timeout': settings.RPC_TIMEOUT},
+                session=http_session()
+            ))
+
             # Create contract instance
             self.contract = self.w3.eth.contract(
                 address=settings.DLP_CONTRACT_ADDRESS,
-                abi=contract_abi
+                abi=load_contract_abi()
             )
-            
+
         except Exception as e:
             logging.error(f"Failed to initialize blockchain client: {str(e)}")
             raise
 
-    def get_contributor_file_count(self) -> int:
+    def get_contributor_file_count(self, owner_address: Optional[str] = None) -> int:
         """
-        Get the number of files contributed by the configured address.
-        
+        Get the number of files contributed by an address.
+
+        Args:
+            owner_address: Contributor address, defaults to settings.OWNER_ADDRESS
+
         Returns:
             int: Number of files contributed by the address
         """
         try:
-            if not settings.OWNER_ADDRESS:
+            owner_address = owner_address or settings.OWNER_ADDRESS
+            if not owner_address:
                 raise ValueError("OWNER_ADDRESS is not set in environment")
-            
-            contributor_info = self.contract.functions.contributorInfo(
-                Web3.to_checksum_address(settings.OWNER_ADDRESS)
-            ).call()
-            
-            return contributor_info[1]  # [contributorAddress, filesListCount]
-            
+
+            file_counts = self.get_contributor_file_counts([owner_address])
+            if owner_address.lower() not in file_counts:
+                raise ValueError(f"contributorInfo call failed for {owner_address}")
+            return file_counts[owner_address.lower()]
+
         except Exception as e:
             logging.error(f"Error getting contributor file count: {str(e)}")
             return 0
+
+    def get_contributor_file_counts(self, owner_addresses: Iterable[str]) -> Dict[str, int]:
+        """
+        Get the number of files contributed by many addresses.
+
+        Counts stored with cache_contributor_file_counts within NETWORK_CACHE_TTL seconds are
+        used once and dropped. The others are read with contributorInfo eth_calls sent
+        RPC_BATCH_SIZE at a time in one JSON-RPC batch request, so thousands of owners cost a
+        few round trips instead of one each. Counts read here are not cached, as a count read
+        for an earlier proof may miss the files added since.
+
+        Args:
+            owner_addresses: Contributor addresses
+
+        Returns:
+            Dict[str, int]: Number of files per lowercase address, leaving out addresses whose
+            call failed
+        """
+        file_counts = {}
+        missing = []
+        for owner_address in dict.fromkeys(address.lower() for address in owner_addresses):
+            cached_count = _file_count_cache.pop(owner_address)
+            if cached_count is None:
+                missing.append(owner_address)
+            else:
+                file_counts[owner_address] = cached_count
+
+        for start in range(0, len(missing), settings.RPC_BATCH_SIZE):
+            batch = missing[start:start + settings.RPC_BATCH_SIZE]
+            try:
+                fetched = call_with_retry(
+                    lambda: self._call_contributor_info(batch),
+                    f"contributorInfo batch of {len(batch)}",
+                    is_transient=is_transient_http_error
+                )
+            except Exception as e:
+                logging.error(f"Error getting contributor file counts: {str(e)}")
+                continue
+            file_counts.update(fetched)
+        return file_counts
+
+    def _call_contributor_info(self, owner_addresses: List[str]) -> Dict[str, int]:
+        """Send one JSON-RPC batch of contributorInfo eth_calls"""
+        from eth_utils import get_abi_output_types
+
+        function_abi = self.contract.get_function_by_name('contributorInfo').abi
+        output_types = get_abi_output_types(function_abi)
+        requests_batch = [
+            {
+                'jsonrpc': '2.0',
+                'id': i,
+                'method': 'eth_call',
+                'params': [
+                    {
+                        'to': self.contract.address,
+                        'data': self.contract.encode_abi('contributorInfo', args=[self.w3.to_checksum_address(owner_address)]),
+                    },
+                    'latest',
+                ],
+            }
+            for i, owner_address in enumerate(owner_addresses)
+        ]
+        response = http_session().post(settings.RPC_URL, json=requests_batch, timeout=settings.RPC_TIMEOUT)
+        response.raise_for_status()
+        responses = response.json()
+        if not isinstance(responses, list):
+            # A node without batch support answers with a single error
+            raise ValueError(f"Unexpected JSON-RPC batch response: {responses}")
+
+        file_counts = {}
+        for item in responses:
+            if 'result' not in item or item.get('id') not in range(len(owner_addresses)):
+                logging.error(f"contributorInfo call failed: {item.get('error')}")
+                continue
+            contributor_info = self.w3.codec.decode(output_types, bytes.fromhex(item['result'][2:]))[0]
+            file_counts[owner_addresses[item['id']]] = contributor_info[1]  # [contributorAddress, filesListCount]
+        return file_counts
@@ -0,0 +1,225 @@
+"""Probabilistic pre-check of known coordinate cells"""
+import logging
+import os
+import struct
+import threading
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from my_proof.config import settings
+from my_proof.utils.cells import mix_keys
+
+SNAPSHOT_MAGIC = b'KWBLOOM1'
+SNAPSHOT_HEADER = struct.Struct('<8sQIQQ')  # magic, bits, hashes, id watermark, keys added
+REFRESH_BATCH_SIZE = 500000  # Coordinates read from the database per refresh query
+
+# Rows added since the watermark, per COORDINATE_STORAGE. The watermark is a coordinates id or a
+# coordinate_cells seq, so the snapshot has to be rebuilt when the storage is switched.
+REFRESH_QUERIES = {
+    'rows': "SELECT id, cell FROM coordinates WHERE id > :watermark AND cell IS NOT NULL ORDER BY id LIMIT :limit",
+    'cells': "SELECT seq, cell FROM coordinate_cells WHERE seq > :watermark ORDER BY seq LIMIT :limit",
+}
+
+
+
+class BloomFilter:
+    """
+    Bloom filter over int64 cell keys, backed by a memory-mapped snapshot file.
+
+    Bit positions come from double hashing of one 64-bit mix per key, so adding and probing
+    work on whole key arrays at once. Bits are only ever set, which means a reader that sees a
+    snapshot in the middle of an update can only get extra "probably new" answers, never a
+    wrong "known".
+    """
+
+    def __init__(self, path: str, bits: np.ndarray, num_bits: int, num_hashes: int, watermark: int, count: int):
+        self.path = path
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.watermark = watermark
+        self.count = count
+        self._bits = bits
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: str, num_bits: int, num_hashes: int) -> 'BloomFilter':
+        """
+        Open the snapshot at `path`, creating an empty one if it doesn't exist.
+
+        Args:
+            path: Snapshot file path
+            num_bits: Size of the bit array for a new snapshot
+            num_hashes: Number of hash functions for a new snapshot
+
+        Returns:
+            BloomFilter: Filter memory-mapped onto the snapshot
+        """
+        if not os.path.exists(path):
+            num_bytes = (num_bits + 7) // 8
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, num_bytes * 8, num_hashes, 0, 0))
+                f.truncate(SNAPSHOT_HEADER.size + num_bytes)
+            os.replace(tmp_path, path)
+
+        with open(path, 'rb') as f:
+            magic, num_bits, num_hashes, watermark, count = SNAPSHOT_HEADER.unpack(f.read(SNAPSHOT_HEADER.size))
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"Not a coordinate filter snapshot: {path}")
+        bits = np.memmap(path, dtype=np.uint8, mode='r+', offset=SNAPSHOT_HEADER.size, shape=(num_bits // 8,))
+        return cls(path, bits, num_bits, num_hashes, watermark, count)
+
+    def add(self, keys: np.ndarray) -> None:
+        """Add an array of cell keys to the filter."""
+        for positions in self._positions(keys):
+            np.bitwise_or.at(self._bits, positions >> np.uint64(3), (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+        self.count += len(keys)
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        """
+        Probe an array of cell keys.
+
+        Returns:
+            np.ndarray: Boolean array, False means the key was definitely never added
+        """
+        found = np.ones(len(keys), dtype=bool)
+        for positions in self._positions(keys):
+            found &= (self._bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1 == 1
+        return found
+
+    def refresh(self, engine: Engine, batch_size: int = REFRESH_BATCH_SIZE) -> int:
+        """
+        Add the cells of coordinates inserted since the last refresh and persist the snapshot.
+
+        Rows are read in id (or seq) order above the stored watermark. A row whose id was assigned
+        before the watermark but committed after it is missed, which only costs a database
+        round trip for that point later, since the filter then answers "probably new".
+
+        Args:
+            engine: Engine connected to the coordinates database
+            batch_size: Rows read per query
+
+        Returns:
+            int: Number of keys added
+        """
+        added = 0
+        with self._lock:
+            while True:
+                with engine.connect() as conn:
+                    rows = conn.execute(text(REFRESH_QUERIES[settings.COORDINATE_STORAGE]),
+                                        {'watermark': self.watermark, 'limit': batch_size}).fetchall()
+                if not rows:
+                    break
+                self.add(np.array([row[1] for row in rows], dtype=np.int64))
+                self.watermark = rows[-1][0]
+                added += len(rows)
+            if added:
+                self.flush()
+        if added:
+            logging.info(f"Coordinate filter refreshed with {added} keys up to id {self.watermark}")
+        return added
+
+    def flush(self) -> None:
+        """Write the bits and then the header (with the new watermark) back to the snapshot."""
+        self._bits.flush()
+        with open(self.path, 'r+b') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.num_bits, self.num_hashes, self.watermark, self.count))
+
+    @property
+    def false_positive_rate(self) -> float:
+        """Expected false positive rate at the current number of keys"""
+        return (1.0 - np.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def _positions(self, keys: np.ndarray):
+        hashed = mix_keys(np.asarray(keys, dtype=np.int64))
+        h1 = hashed & np.uint64(0xFFFFFFFF)
+        h2 = (hashed >> np.uint64(32)) | np.uint64(1)
+        num_bits = np.uint64(self.num_bits)
+        with np.errstate(over='ignore'):
+            for i in range(self.num_hashes):
+                yield (h1 + np.uint64(i) * h2) % num_bits
+
+
+_coordinate_filter: Optional[BloomFilter] = None
+_coordinate_filter_lock = threading.Lock()
+
+
+def _filter_enabled() -> bool:
+    # The snapshot watermark follows the ids of one database, so it can't follow several shards
+    return bool(settings.BLOOM_FILTER_PATH) and not settings.COORDINATE_SHARD_URLS
+
+
+def get_coordinate_filter(engine: Engine) -> Optional[BloomFilter]:
+    """
+    Get the process-wide coordinate filter, refreshed with the rows added since its snapshot.
+
+    A missing snapshot is not built here, since that reads the whole coordinates table: it is
+    built by `refresh_coordinate_filter`, when a worker starts or from the command line.
+    Proofs call this once before their ingestion.
+
+    Args:
+        engine: Engine connected to the coordinates database
+
+    Returns:
+        Optional[BloomFilter]: The filter, or None if BLOOM_FILTER_PATH is not configured, no
+        snapshot has been built yet or the coordinates are sharded
+    """
+    global _coordinate_filter
+    if not _filter_enabled():
+        return None
+    with _coordinate_filter_lock:
+        if _coordinate_filter is None:
+            if not os.path.exists(settings.BLOOM_FILTER_PATH):
+                return None
+            _coordinate_filter = BloomFilter.open(settings.BLOOM_FILTER_PATH, settings.BLOOM_FILTER_BITS, settings.BLOOM_FILTER_HASHES)
+    _coordinate_filter.refresh(engine)
+    return _coordinate_filter
+
+
+def refresh_coordinate_filter(engine: Engine) -> Optional[BloomFilter]:
+    """
+    Build the coordinate filter snapshot if it doesn't exist, or bring it up to date.
+
+    A new snapshot is filled under a temporary name and moved to BLOOM_FILTER_PATH once it holds
+    every stored cell, so proofs never open a partial one.
+
+    Args:
+        engine: Engine connected to the coordinates database
+
+    Returns:
+        Optional[BloomFilter]: The filter, or None if BLOOM_FILTER_PATH is not configured or the
+        coordinates are sharded
+    """
+    global _coordinate_filter
+    if not _filter_enabled():
+        return None
+    path = settings.BLOOM_FILTER_PATH
+    with _coordinate_filter_lock:
+        if _coordinate_filter is None:
+            if os.path.exists(path):
+                _coordinate_filter = BloomFilter.open(path, settings.BLOOM_FILTER_BITS, settings.BLOOM_FILTER_HASHES)
+            else:
+                logging.info(f"Building the coordinate filter snapshot {path}")
+                building = BloomFilter.open(f"{path}.{os.getpid()}.build", settings.BLOOM_FILTER_BITS, settings.BLOOM_FILTER_HASHES)
+                building.refresh(engine)
+                os.replace(building.path, path)
+                building.path = path
+                _coordinate_filter = building
+    _coordinate_filter.refresh(engine)
+    return _coordinate_filter
+
+
+# python -m my_proof.utils.bloom
+if __name__ == "__main__":
+    from my_proof.utils.db import db
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    coordinate_filter = refresh_coordinate_filter(db.engine)
+    if coordinate_filter is None:
+        print("BLOOM_FILTER_PATH is not set, or the coordinates are sharded")
+    else:
+        print(f"{coordinate_filter.count} keys up to id {coordinate_filter.watermark}, "
+              f"false positive rate {coordinate_filter.false_positive_rate:.2e}")
@@ -0,0 +1,121 @@
+"""Quantized spatial cell keys for coordinates"""
+import numpy as np
+
+from my_proof.config import settings
+
+_SPREAD_MASKS = [
+    (16, 0x0000FFFF0000FFFF),
+    (8, 0x00FF00FF00FF00FF),
+    (4, 0x0F0F0F0F0F0F0F0F),
+    (2, 0x3333333333333333),
+    (1, 0x5555555555555555),
+]
+_COMPACT_MASKS = [
+    (1, 0x3333333333333333),
+    (2, 0x0F0F0F0F0F0F0F0F),
+    (4, 0x00FF00FF00FF00FF),
+    (8, 0x0000FFFF0000FFFF),
+    (16, 0x00000000FFFFFFFF),
+]
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_JUMP_MULTIPLIER = np.uint64(2862933555777941757)
+
+
+def cell_keys(coordinates: np.ndarray, bits: int = None) -> np.ndarray:
+    """
+    Compute the grid cell key of each coordinate.
+
+    Latitude and longitude are quantized to `bits` bits each and interleaved into a Z-order
+    (Morton) key, longitude bit first, which is the bit layout of a geohash. Nearby points
+    therefore share key prefixes, and points closer than the cell size map to the same key.
+
+    Args:
+        coordinates: (N, 2) array of (latitude, longitude) rows
+        bits: Bits per axis, defaults to settings.CELL_RESOLUTION_BITS (at 24 bits a cell
+            is about 1.2m x 2.4m at the equator)
+
+    Returns:
+        np.ndarray: (N,) int64 array of cell keys
+    """
+    bits = bits or settings.CELL_RESOLUTION_BITS
+    coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    lat = _quantize(coordinates[:, 0], -90.0, 180.0, bits)
+    lng = _quantize(coordinates[:, 1], -180.0, 360.0, bits)
+    return ((_spread(lng) << np.uint64(1)) | _spread(lat)).astype(np.int64)
+
+
+def cell_centers(keys: np.ndarray, bits: int = None) -> np.ndarray:
+    """
+    Compute the center coordinate of each cell key, the inverse of cell_keys.
+
+    Args:
+        keys: (N,) int64 array of cell keys
+        bits: Bits per axis the keys were computed with
+
+    Returns:
+        np.ndarray: (N, 2) float64 array of (latitude, longitude) rows
+    """
+    bits = bits or settings.CELL_RESOLUTION_BITS
+    keys = np.asarray(keys, dtype=np.int64).astype(np.uint64)
+    scale = float(1 << bits)
+    lat = (_compact(keys) + 0.5) / scale * 180.0 - 90.0
+    lng = (_compact(keys >> np.uint64(1)) + 0.5) / scale * 360.0 - 180.0
+    return np.column_stack((lat, lng))
+
+
+def mix_keys(keys: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, spreads every input bit over the whole 64-bit output"""
+    with np.errstate(over='ignore'):
+        z = keys.astype(np.uint64) + _GOLDEN_GAMMA
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def cell_shards(keys: np.ndarray, shards: int) -> np.ndarray:
+    """
+    Assign each cell key to one of `shards` shards with jump consistent hashing.
+
+    Nearby cells share key prefixes, so the keys are mixed first to spread a dense area over
+    all shards. Growing from n to n + 1 shards only moves 1 / (n + 1) of the keys, all of
+    them to the new shard. The jumps of all keys are taken together, a few passes per key.
+
+    Args:
+        keys: (N,) int64 array of cell keys
+        shards: Number of shards
+
+    Returns:
+        np.ndarray: (N,) int64 array of shard indices in [0, shards)
+    """
+    hashed = mix_keys(np.asarray(keys, dtype=np.int64))
+    shard = np.zeros(len(hashed), dtype=np.int64)
+    jump = np.zeros(len(hashed), dtype=np.int64)
+    active = np.arange(len(hashed))
+    while len(active):
+        shard[active] = jump[active]
+        with np.errstate(over='ignore'):
+            hashed[active] = hashed[active] * _JUMP_MULTIPLIER + np.uint64(1)
+        jump[active] = ((shard[active] + 1) * (float(1 << 31) / ((hashed[active] >> np.uint64(33)) + 1).astype(np.float64))).astype(np.int64)
+        active = active[jump[active] < shards]
+    return shard
+
+
+def _quantize(values: np.ndarray, offset: float, span: float, bits: int) -> np.ndarray:
+    cells = np.floor((values - offset) / span * (1 << bits))
+    return np.clip(cells, 0, (1 << bits) - 1).astype(np.uint64)
+
+
+def _spread(values: np.ndarray) -> np.ndarray:
+    """Insert a zero bit between each of the low 32 bits"""
+    values = values & np.uint64(0xFFFFFFFF)
+    for shift, mask in _SPREAD_MASKS:
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+def _compact(values: np.ndarray) -> np.ndarray:
+    """Inverse of _spread: gather every other bit"""
+    values = values & np.uint64(0x5555555555555555)
+    for shift, mask in _COMPACT_MASKS:
+        values = (values | (values >> np.uint64(shift))) & np.uint64(mask)
+    return values
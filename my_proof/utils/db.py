@@ -1,41 +1,445 @@
 """Database connection and session management"""
+import datetime
+import io
 import logging
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Generator, List, Tuple
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Tuple, TypeVar
 
-from sqlalchemy import create_engine
+import numpy as np
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.engine import URL, Connection, Engine, make_url
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import ProgrammingError, SQLAlchemyError
 from sqlalchemy.dialects.postgresql import insert
 
-from my_proof.models.db import Base, Coordinates
+from my_proof.models.db import (
+    SCHEMA_VERSION, Base, ContributionSketches, Contributions, ContributorFingerprints, CoordinateCells,
+    CoordinateWriteFailures, CoordinateWrites, Coordinates, ProofResults, SchemaVersion, SketchAggregates, SketchBands, coordinate_cells_seq
+)
 from my_proof.config import settings
+from my_proof.utils.cells import cell_centers, cell_keys, cell_shards
+from my_proof.utils.fingerprint import ContributorFingerprint
+from my_proof.utils.sketches import ContributionSketch, HyperLogLog, MinHash
 
 logger = logging.getLogger(__name__)
 
+NEAR_DUPLICATE_CANDIDATES = 100  # Most recent uploads sharing a band that are compared with a new one
+
+T = TypeVar('T')
+
+# Binary COPY framing, see https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.4
+COPY_BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + b'\x00\x00\x00\x00' + b'\x00\x00\x00\x00'
+COPY_BINARY_TRAILER = b'\xff\xff'
+
+def pack_copy_binary(*columns: np.ndarray) -> bytes:
+    """
+    Encode equally long 8-byte numeric columns as a PostgreSQL binary COPY payload.
+    
+    Args:
+        columns: One float64 or int64 array per table column, in COPY column order
+        
+    Returns:
+        bytes: Payload for COPY ... FROM STDIN WITH (FORMAT binary)
+    """
+    fields = [('count', '>i2')]
+    for i, column in enumerate(columns):
+        fields += [(f'len{i}', '>i4'), (f'val{i}', '>f8' if column.dtype.kind == 'f' else '>i8')]
+    rows = np.empty(len(columns[0]), dtype=np.dtype(fields))
+    rows['count'] = len(columns)
+    for i, column in enumerate(columns):
+        rows[f'len{i}'] = 8
+        rows[f'val{i}'] = column
+    return COPY_BINARY_HEADER + rows.tobytes() + COPY_BINARY_TRAILER
+
+def unpack_copy_binary(data: bytes, *dtypes: str) -> Tuple[np.ndarray, ...]:
+    """
+    Decode a PostgreSQL binary COPY payload of fixed-width, non-null numeric columns.
+
+    Args:
+        data: Output of COPY ... TO STDOUT WITH (FORMAT binary)
+        dtypes: NumPy dtype of each column in COPY column order, e.g. 'i8' for int8 and 'f8' for float8
+
+    Returns:
+        Tuple[np.ndarray, ...]: One native-endian array per column
+    """
+    extension_length = struct.unpack_from('>i', data, len(COPY_BINARY_HEADER) - 4)[0]
+    body = data[len(COPY_BINARY_HEADER) + extension_length:len(data) - len(COPY_BINARY_TRAILER)]
+    fields = [('count', '>i2')]
+    for i, dtype in enumerate(dtypes):
+        fields += [(f'len{i}', '>i4'), (f'val{i}', np.dtype(dtype).newbyteorder('>'))]
+    rows = np.frombuffer(body, dtype=np.dtype(fields))
+    for i, dtype in enumerate(dtypes):
+        if np.any(rows[f'len{i}'] != np.dtype(dtype).itemsize):
+            raise ValueError(f"Column {i} holds NULLs or values that are not {dtype}")
+    return tuple(rows[f'val{i}'].astype(dtype) for i, dtype in enumerate(dtypes))
+
+def create_cell_partitions(connection: Connection, partitions: int) -> None:
+    """
+    Create the hash partitions of coordinate_cells that don't exist yet.
+
+    The number of partitions is fixed once rows are stored, changing it means copying the
+    table into a newly partitioned one.
+
+    Args:
+        connection: Connection to run the DDL on
+        partitions: Number of partitions
+    """
+    for remainder in range(partitions):
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS coordinate_cells_p{remainder} PARTITION OF coordinate_cells "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        ))
+
+# DDL of each SCHEMA_VERSION for tables that already exist, which create_all leaves as they are.
+# Version 1 holds the cell key of coordinates from before the schema_version marker, whose
+# existing rows are backfilled with `python -m my_proof.utils.migrations cell-keys`.
+COLUMN_MIGRATIONS = {
+    1: [
+        "ALTER TABLE coordinates ADD COLUMN IF NOT EXISTS cell BIGINT",
+        "ALTER TABLE coordinates DROP CONSTRAINT IF EXISTS uix_lat_lng",
+    ],
+    6: [
+        "ALTER TABLE proof_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITHOUT TIME ZONE",
+    ],
+}
+
+def add_new_columns(connection: Connection, stored_version: Optional[int]) -> None:
+    """
+    Add the columns and constraints of the SCHEMA_VERSIONs after the stored one to tables that already exist.
+
+    The ALTERs lock their table, so they only run when the stored version is older.
+
+    Args:
+        connection: Connection to run the DDL on
+        stored_version: Version of the schema_version marker, None if it was never written
+    """
+    for version, statements in sorted(COLUMN_MIGRATIONS.items()):
+        if stored_version is not None and version <= stored_version:
+            continue
+        for statement in statements:
+            connection.execute(text(statement))
+        if version == 1 and not connection.execute(text("SELECT 1 FROM pg_constraint WHERE conname = 'uix_cell'")).first():
+            connection.execute(text("ALTER TABLE coordinates ADD CONSTRAINT uix_cell UNIQUE (cell)"))
+
+def database_url(postgres_url: str) -> URL:
+    """
+    Parse a postgresql:// URL, pinning the psycopg2 driver from requirements.txt.
+    
+    Newer SQLAlchemy versions default plain postgresql:// URLs to psycopg 3, and the COPY
+    ingestion relies on psycopg2's copy_expert.
+    """
+    url = make_url(postgres_url)
+    if url.drivername == 'postgresql':
+        url = url.set(drivername='postgresql+psycopg2')
+    return url
+
+def engine_options() -> Dict[str, Any]:
+    """Connection pool and session options of the engine, from the settings"""
+    options = {
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+    }
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        # Set once per connection by libpq rather than with a SET per transaction
+        options['connect_args'] = {'options': f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+def _coordinate_table() -> str:
+    return 'coordinate_cells' if settings.COORDINATE_STORAGE == 'cells' else 'coordinates'
+
+def copy_probe_cells(cursor: Any, cells: np.ndarray, table: str, chunk_size: int) -> np.ndarray:
+    """
+    Find the cells a table doesn't hold yet.
+
+    Each chunk is sent with a binary COPY into a temporary table and anti-joined against the
+    table's cell index, and the row numbers of the missing cells come back with a binary COPY.
+
+    Args:
+        cursor: psycopg2 cursor inside a transaction
+        cells: (N,) int64 cell keys
+        table: Table to probe, coordinates or coordinate_cells
+        chunk_size: Cells per COPY and probe
+
+    Returns:
+        np.ndarray: (N,) boolean mask of the cells not in the table
+    """
+    new = np.zeros(len(cells), dtype=bool)
+    cursor.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS coordinates_probe "
+        "(idx int8 NOT NULL, cell int8 NOT NULL) ON COMMIT DROP"
+    )
+    for start in range(0, len(cells), chunk_size):
+        chunk = cells[start:start + chunk_size]
+        cursor.execute("TRUNCATE coordinates_probe")
+        cursor.copy_expert(
+            "COPY coordinates_probe (idx, cell) FROM STDIN WITH (FORMAT binary)",
+            io.BytesIO(pack_copy_binary(np.arange(start, start + len(chunk), dtype=np.int64), chunk))
+        )
+        buffer = io.BytesIO()
+        cursor.copy_expert(
+            f"COPY (SELECT p.idx FROM coordinates_probe p WHERE NOT EXISTS "
+            f"(SELECT 1 FROM {table} t WHERE t.cell = p.cell)) TO STDOUT WITH (FORMAT binary)",
+            buffer
+        )
+        new[unpack_copy_binary(buffer.getvalue(), 'i8')[0]] = True
+    return new
+
+def copy_read_cells(cursor: Any, table: str, contributor_id: Optional[int] = None) -> np.ndarray:
+    """
+    Read the cell keys of a table with a binary COPY.
+
+    Args:
+        cursor: psycopg2 cursor
+        table: Table to read, coordinates or coordinate_cells
+        contributor_id: Only read the cells first contributed by this contributor
+
+    Returns:
+        np.ndarray: int64 cell keys, in no particular order
+    """
+    query = f"SELECT cell FROM {table} WHERE cell IS NOT NULL"
+    if contributor_id is not None:
+        query = cursor.mogrify(query + " AND contributor_id = %s", (contributor_id,)).decode()
+    buffer = io.BytesIO()
+    cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT binary)", buffer)
+    return unpack_copy_binary(buffer.getvalue(), 'i8')[0]
+
+def copy_merge_cells(cursor: Any, cells: np.ndarray, contributor_ids: np.ndarray, chunk_size: int) -> int:
+    """
+    Insert cells into coordinate_cells through a binary COPY into a staging table, skipping stored cells.
+
+    Args:
+        cursor: psycopg2 cursor inside a transaction
+        cells: (N,) int64 cell keys
+        contributor_ids: (N,) int64 contributor of each cell
+        chunk_size: Cells per COPY and merge
+
+    Returns:
+        int: Number of cells inserted
+    """
+    cursor.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS cells_staging "
+        "(cell int8 NOT NULL, contributor_id int8 NOT NULL) ON COMMIT DROP"
+    )
+    inserted = 0
+    for start in range(0, len(cells), chunk_size):
+        cursor.execute("TRUNCATE cells_staging")
+        cursor.copy_expert(
+            "COPY cells_staging (cell, contributor_id) FROM STDIN WITH (FORMAT binary)",
+            io.BytesIO(pack_copy_binary(cells[start:start + chunk_size], contributor_ids[start:start + chunk_size]))
+        )
+        cursor.execute(
+            "INSERT INTO coordinate_cells (cell, contributor_id) "
+            "SELECT cell, contributor_id FROM cells_staging ON CONFLICT (cell) DO NOTHING"
+        )
+        inserted += cursor.rowcount
+    return inserted
+
+def create_shard_tables(engine: Engine) -> None:
+    """Create the coordinate_cells table, sequence and partitions of a shard if missing"""
+    coordinate_cells_seq.create(engine, checkfirst=True)
+    CoordinateCells.__table__.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        create_cell_partitions(connection, settings.COORDINATE_PARTITIONS)
+
+class CoordinateShards:
+    """
+    Coordinate cells spread over several Postgres instances by a hash of the cell key.
+
+    Each shard holds a coordinate_cells table with the cells routed to it by
+    cells.cell_shards, so each shard's unique index only takes its share of the writes.
+    Operations are split by shard and run on all shards at once, in one transaction per shard,
+    and their counts are added up.
+    """
+
+    def __init__(self, urls: List[str]):
+        """
+        Args:
+            urls: PostgreSQL URL of each shard, in shard order
+        """
+        self.urls = list(urls)
+        self._engines: Optional[List[Engine]] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._init_lock = threading.Lock()
+
+    @property
+    def engines(self) -> List[Engine]:
+        """The engine of each shard, creating missing tables on first use"""
+        with self._init_lock:
+            if self._engines is None:
+                engines = [create_engine(database_url(url), **engine_options()) for url in self.urls]
+                for engine in engines:
+                    create_shard_tables(engine)
+                self._executor = ThreadPoolExecutor(max_workers=len(engines), thread_name_prefix='shard')
+                self._engines = engines
+        return self._engines
+
+    def fan_out(self, work: Callable[[int, Any], T], shards: Iterable[int]) -> Dict[int, T]:
+        """
+        Run work(shard, cursor) on several shards at once, each in its own transaction.
+
+        Args:
+            work: Function of the shard index and a psycopg2 cursor
+            shards: Indices of the shards to run it on
+
+        Returns:
+            Dict[int, T]: Result per shard index
+        """
+        engines = self.engines
+
+        def run(shard: int) -> T:
+            with engines[shard].begin() as connection:
+                cursor = connection.connection.cursor()
+                try:
+                    return work(shard, cursor)
+                finally:
+                    cursor.close()
+
+        futures = {shard: self._executor.submit(run, shard) for shard in shards}
+        return {shard: future.result() for shard, future in futures.items()}
+
+    def route(self, cells: np.ndarray) -> np.ndarray:
+        """Shard index of each cell key"""
+        return cell_shards(cells, len(self.urls))
+
+    def insert_cells(self, cells: np.ndarray, contributor_ids: np.ndarray, chunk_size: int = None) -> Tuple[int, int]:
+        """
+        Insert cells on their shards, skipping those already stored.
+
+        Args:
+            cells: (N,) int64 cell keys
+            contributor_ids: (N,) int64 contributor of each cell
+            chunk_size: Cells per COPY and merge, defaults to settings.COORDINATE_CHUNK_SIZE
+
+        Returns:
+            Tuple[int, int]: (successful inserts, duplicates skipped)
+        """
+        if len(cells) == 0:
+            return 0, 0
+        chunk_size = chunk_size or settings.COORDINATE_CHUNK_SIZE
+        routes = self.route(cells)
+
+        def insert(shard: int, cursor: Any) -> int:
+            rows = routes == shard
+            return copy_merge_cells(cursor, cells[rows], contributor_ids[rows], chunk_size)
+
+        inserted = sum(self.fan_out(insert, np.unique(routes).tolist()).values())
+        return inserted, len(cells) - inserted
+
+    def probe_new_cells(self, cells: np.ndarray, chunk_size: int = None) -> np.ndarray:
+        """
+        Find the cells their shard doesn't hold yet, without writing to coordinate_cells.
+
+        Args:
+            cells: (N,) int64 cell keys
+            chunk_size: Cells per COPY and probe, defaults to settings.COORDINATE_CHUNK_SIZE
+
+        Returns:
+            np.ndarray: (N,) boolean mask of the cells not stored yet
+        """
+        new = np.zeros(len(cells), dtype=bool)
+        if len(cells) == 0:
+            return new
+        chunk_size = chunk_size or settings.COORDINATE_CHUNK_SIZE
+        routes = self.route(cells)
+
+        def probe(shard: int, cursor: Any) -> np.ndarray:
+            rows = np.flatnonzero(routes == shard)
+            return rows[copy_probe_cells(cursor, cells[rows], 'coordinate_cells', chunk_size)]
+
+        for rows in self.fan_out(probe, np.unique(routes).tolist()).values():
+            new[rows] = True
+        return new
+
+    def read_cells(self, contributor_id: Optional[int] = None) -> np.ndarray:
+        """
+        Read the stored cell keys of all shards.
+
+        Args:
+            contributor_id: Only read the cells first contributed by this contributor
+
+        Returns:
+            np.ndarray: int64 cell keys, in no particular order
+        """
+        parts = self.fan_out(lambda shard, cursor: copy_read_cells(cursor, 'coordinate_cells', contributor_id), range(len(self.urls)))
+        return np.concatenate([parts[shard] for shard in sorted(parts)])
+
 class Database:
-    """Database connection manager"""
+    """Database connection manager, connecting on first use"""
     def __init__(self):
         self._engine = None
         self._session_local = None
-        self.init()
+        self._shards = None
+        self._init_lock = threading.Lock()
 
     def init(self) -> None:
         """Initialize database connection and create tables"""
+        with self._init_lock:
+            if self._engine is None:
+                self._init()
+
+    def _init(self) -> None:
         try:
-            self._engine = create_engine(settings.POSTGRES_URL)
-            Base.metadata.create_all(self._engine)
-            self._session_local = sessionmaker(bind=self._engine)
+            engine = create_engine(database_url(settings.POSTGRES_URL), **engine_options())
+            stored_version = self._stored_schema_version(engine)
+            if not (settings.DB_SCHEMA_CHECK and stored_version == SCHEMA_VERSION):
+                Base.metadata.create_all(engine)
+                with engine.begin() as connection:
+                    if stored_version is None or stored_version < SCHEMA_VERSION:
+                        add_new_columns(connection, stored_version)
+                    if settings.COORDINATE_STORAGE == 'cells':
+                        create_cell_partitions(connection, settings.COORDINATE_PARTITIONS)
+                if stored_version != SCHEMA_VERSION:
+                    self._mark_schema_current(engine)
+            self._session_local = sessionmaker(bind=engine)
+            self._engine = engine
             logger.info("Database initialized successfully")
         except SQLAlchemyError as e:
             logger.error(f"Database initialization failed: {e}")
             raise
 
+    def _stored_schema_version(self, engine: Engine) -> Optional[int]:
+        """The SCHEMA_VERSION the tables were last created or migrated for, None if the marker was never written"""
+        try:
+            with engine.connect() as connection:
+                return connection.execute(select(SchemaVersion.version).where(SchemaVersion.id == 1)).scalar()
+        except ProgrammingError:
+            # No marker table yet
+            return None
+
+    def _mark_schema_current(self, engine: Engine) -> None:
+        with engine.begin() as connection:
+            connection.execute(
+                insert(SchemaVersion)
+                .values(id=1, version=SCHEMA_VERSION, updated_at=datetime.datetime.now(datetime.UTC))
+                .on_conflict_do_update(index_elements=['id'], set_={'version': SCHEMA_VERSION, 'updated_at': datetime.datetime.now(datetime.UTC)})
+            )
+
+    @property
+    def shards(self) -> Optional['CoordinateShards']:
+        """The coordinate shards, None if COORDINATE_SHARD_URLS is empty"""
+        if not settings.COORDINATE_SHARD_URLS:
+            return None
+        with self._init_lock:
+            if self._shards is None:
+                self._shards = CoordinateShards(settings.COORDINATE_SHARD_URLS)
+        return self._shards
+
+    @property
+    def engine(self) -> Engine:
+        """The underlying SQLAlchemy engine"""
+        self.init()
+        return self._engine
+
     @contextmanager
     def session(self) -> Generator[Session, None, None]:
         """Provide a transactional scope around a series of operations"""
-        if not self._session_local:
-            raise RuntimeError("Database not initialized. Call init() first.")
+        self.init()
 
         session = self._session_local()
         try:
@@ -49,38 +453,39 @@ class Database:
 
     def get_session(self) -> Session:
         """Get a new database session"""
-        if not self._session_local:
-            raise RuntimeError("Database not initialized. Call init() first.")
+        self.init()
         return self._session_local()
 
-    def batch_insert_coordinates(self, session: Session, coordinates: List[Tuple[float, float]], contributor_id: int) -> Tuple[int, int]:
+    def batch_insert_coordinates(self, session: Session, coordinates: np.ndarray, contributor_id: int) -> Tuple[int, int]:
         """
-        Batch insert coordinates with conflict handling.
+        Batch insert coordinates with conflict handling on their grid cell.
         
         Args:
             session: SQLAlchemy session
-            coordinates: List of (latitude, longitude) tuples
+            coordinates: (N, 2) array of (latitude, longitude) rows
             contributor_id: ID of the contributor
             
         Returns:
             Tuple[int, int]: (successful inserts, duplicates skipped)
         """
-        if not coordinates:
+        if len(coordinates) == 0:
             return 0, 0
             
         # Prepare batch insert statement
+        coordinates = np.asarray(coordinates, dtype=np.float64)
         stmt = insert(Coordinates).values([
             {
                 'latitude': lat,
                 'longitude': lng,
+                'cell': cell,
                 'contributor_id': contributor_id
             }
-            for lat, lng in coordinates
+            for (lat, lng), cell in zip(coordinates.tolist(), cell_keys(coordinates).tolist())
         ])
         
         # Add ON CONFLICT DO NOTHING clause
         stmt = stmt.on_conflict_do_nothing(
-            index_elements=['latitude', 'longitude']
+            index_elements=['cell']
         )
         
         # Execute and get results
@@ -90,5 +495,375 @@ class Database:
         
         return inserted, skipped
 
-# Global database instance
+    def copy_insert_coordinates(self, session: Session, coordinates: np.ndarray, contributor_id: int, chunk_size: int = None) -> Tuple[int, int]:
+        """
+        Bulk insert coordinates through a COPY into a staging table, with conflict handling on their grid cell.
+        
+        Each chunk is sent with a binary COPY into a temporary table and then merged into
+        coordinates (or coordinate_cells, if COORDINATE_STORAGE is 'cells') with a single
+        INSERT ... SELECT ... ON CONFLICT DO NOTHING. This avoids building and compiling one
+        huge INSERT statement, and keeps every statement small.
+
+        Sharded coordinates are inserted on all shards at once instead, in the shards' own
+        transactions, which commit before the session does.
+        
+        Args:
+            session: SQLAlchemy session
+            coordinates: (N, 2) array of (latitude, longitude) rows
+            contributor_id: ID of the contributor
+            chunk_size: Rows per COPY and merge, defaults to settings.COORDINATE_CHUNK_SIZE
+            
+        Returns:
+            Tuple[int, int]: (successful inserts, duplicates skipped)
+        """
+        if len(coordinates) == 0:
+            return 0, 0
+        chunk_size = chunk_size or settings.COORDINATE_CHUNK_SIZE
+        coordinates = np.asarray(coordinates, dtype=np.float64)
+        cells = cell_keys(coordinates)
+        if self.shards is not None:
+            return self.shards.insert_cells(cells, np.full(len(cells), contributor_id, dtype=np.int64), chunk_size)
+
+        if settings.COORDINATE_STORAGE == 'cells':
+            merge_sql = (
+                "INSERT INTO coordinate_cells (cell, contributor_id) "
+                "SELECT cell, %s FROM coordinates_staging ON CONFLICT (cell) DO NOTHING"
+            )
+        else:
+            merge_sql = (
+                "INSERT INTO coordinates (cell, latitude, longitude, contributor_id, created_at) "
+                "SELECT cell, latitude, longitude, %s, timezone('utc', now()) FROM coordinates_staging "
+                "ON CONFLICT (cell) DO NOTHING"
+            )
+
+        # The temporary table lives on this transaction's connection and is dropped on commit
+        cursor = session.connection().connection.cursor()
+        try:
+            cursor.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS coordinates_staging "
+                "(cell int8 NOT NULL, latitude float8 NOT NULL, longitude float8 NOT NULL) ON COMMIT DROP"
+            )
+            inserted = 0
+            for start in range(0, len(coordinates), chunk_size):
+                chunk = coordinates[start:start + chunk_size]
+                cursor.execute("TRUNCATE coordinates_staging")
+                cursor.copy_expert(
+                    "COPY coordinates_staging (cell, latitude, longitude) FROM STDIN WITH (FORMAT binary)",
+                    io.BytesIO(pack_copy_binary(cells[start:start + chunk_size], chunk[:, 0], chunk[:, 1]))
+                )
+                cursor.execute(merge_sql, (contributor_id,))
+                inserted += cursor.rowcount
+        finally:
+            cursor.close()
+
+        return inserted, len(coordinates) - inserted
+
+    def probe_new_coordinates(self, session: Session, coordinates: np.ndarray, chunk_size: int = None) -> np.ndarray:
+        """
+        Find the coordinates whose cell isn't stored yet, without writing to the coordinate storage.
+
+        Only a temporary table is written, so the probe takes no row locks (see copy_probe_cells).
+        Sharded coordinates are probed on all shards at once.
+
+        Args:
+            session: SQLAlchemy session
+            coordinates: (N, 2) array of unique (latitude, longitude) rows
+            chunk_size: Rows per COPY and probe, defaults to settings.COORDINATE_CHUNK_SIZE
+
+        Returns:
+            np.ndarray: (N,) boolean mask of the coordinates not stored yet
+        """
+        if len(coordinates) == 0:
+            return np.zeros(0, dtype=bool)
+        chunk_size = chunk_size or settings.COORDINATE_CHUNK_SIZE
+        cells = cell_keys(np.asarray(coordinates, dtype=np.float64))
+        if self.shards is not None:
+            return self.shards.probe_new_cells(cells, chunk_size)
+
+        cursor = session.connection().connection.cursor()
+        try:
+            return copy_probe_cells(cursor, cells, _coordinate_table(), chunk_size)
+        finally:
+            cursor.close()
+
+    def enqueue_coordinate_write(self, session: Session, coordinates: np.ndarray, contributor_id: int) -> None:
+        """
+        Queue coordinates for the write-behind drainer, as part of the session's transaction.
+
+        Args:
+            session: SQLAlchemy session
+            coordinates: (N, 2) array of (latitude, longitude) rows
+            contributor_id: ID of the contributor
+        """
+        if len(coordinates) == 0:
+            return
+        session.add(CoordinateWrites(
+            contributor_id=contributor_id,
+            coordinates=np.ascontiguousarray(coordinates, dtype='<f8').tobytes(),
+            count=len(coordinates),
+            created_at=datetime.datetime.now(datetime.UTC)
+        ))
+
+    def drain_coordinate_write(self, session: Session) -> Optional[Tuple[int, int, int, Optional[str]]]:
+        """
+        Insert the oldest queued coordinates with the fewest failed drains and remove them from the queue.
+
+        The queue row is claimed with SKIP LOCKED, so several drainers can share the queue,
+        and deleted in the same transaction as the insert. A drainer that dies before
+        committing leaves the row queued, and replaying it is harmless since the insert skips
+        cells that are already stored.
+
+        A failed insert is rolled back to a savepoint and counted in coordinate_write_failures
+        instead, so the rows behind it are drained first and a row that failed
+        WRITE_BEHIND_MAX_ATTEMPTS times is no longer claimed.
+
+        Args:
+            session: SQLAlchemy session, committed by the caller
+
+        Returns:
+            Optional[Tuple[int, int, int, Optional[str]]]: (queue row id, successful inserts,
+            duplicates skipped, error of a failed insert), None if no row is left to drain
+        """
+        attempts = func.coalesce(CoordinateWriteFailures.attempts, 0)
+        row = session.execute(
+            select(CoordinateWrites)
+            .outerjoin(CoordinateWriteFailures, CoordinateWriteFailures.write_id == CoordinateWrites.id)
+            .where(attempts < settings.WRITE_BEHIND_MAX_ATTEMPTS)
+            .order_by(attempts, CoordinateWrites.id)
+            .limit(1)
+            .with_for_update(of=CoordinateWrites, skip_locked=True)
+        ).scalar_one_or_none()
+        if row is None:
+            return None
+        coordinates = np.frombuffer(row.coordinates, dtype='<f8').reshape(-1, 2)
+        try:
+            with session.begin_nested():
+                inserted, skipped = self.copy_insert_coordinates(session, coordinates, row.contributor_id)
+        except Exception as e:
+            logger.error(f"Failed to drain coordinate write {row.id}: {e}")
+            now = datetime.datetime.now(datetime.UTC)
+            session.execute(
+                insert(CoordinateWriteFailures)
+                .values(write_id=row.id, attempts=1, error=str(e), updated_at=now)
+                .on_conflict_do_update(
+                    index_elements=['write_id'],
+                    set_={'attempts': CoordinateWriteFailures.attempts + 1, 'error': str(e), 'updated_at': now}
+                )
+            )
+            return row.id, 0, 0, str(e)
+        session.delete(row)
+        return row.id, inserted, skipped, None
+
+    def read_cells(self, session: Session, contributor_id: Optional[int] = None) -> np.ndarray:
+        """
+        Read stored cell keys with a binary COPY, without building a Python object per row.
+
+        Args:
+            session: SQLAlchemy session
+            contributor_id: Only read the cells first contributed by this contributor
+
+        Returns:
+            np.ndarray: int64 cell keys, in no particular order
+        """
+        if self.shards is not None:
+            return self.shards.read_cells(contributor_id)
+        cursor = session.connection().connection.cursor()
+        try:
+            return copy_read_cells(cursor, _coordinate_table(), contributor_id)
+        finally:
+            cursor.close()
+
+    def read_coordinates(self, session: Session, contributor_id: Optional[int] = None) -> np.ndarray:
+        """
+        Read stored coordinates as the centers of their cells.
+
+        Args:
+            session: SQLAlchemy session
+            contributor_id: Only read the coordinates first contributed by this contributor
+
+        Returns:
+            np.ndarray: (N, 2) float64 array of (latitude, longitude) rows, accurate to the cell size
+        """
+        return cell_centers(self.read_cells(session, contributor_id))
+
+    def load_fingerprint(self, session: Session, storage_user_id_hash: str) -> Optional[ContributorFingerprint]:
+        """
+        Load the fingerprint of the segments a storage account has already contributed.
+
+        Args:
+            session: SQLAlchemy session
+            storage_user_id_hash: Hash of the storage account user id
+
+        Returns:
+            Optional[ContributorFingerprint]: The fingerprint, None for a first contribution
+        """
+        row = session.get(ContributorFingerprints, storage_user_id_hash)
+        if row is None:
+            return None
+        return ContributorFingerprint.from_bytes(row.watermark, row.segment_hashes)
+
+    def save_fingerprint(self, session: Session, storage_user_id_hash: str, fingerprint: ContributorFingerprint) -> None:
+        """
+        Add the new segments recorded in a fingerprint to the stored fingerprint.
+
+        The stored row is locked and merged rather than overwritten, so concurrent proofs of the
+        same account don't lose each other's segments.
+
+        Args:
+            session: SQLAlchemy session
+            storage_user_id_hash: Hash of the storage account user id
+            fingerprint: Fingerprint loaded before the proof, with its new segments recorded
+        """
+        session.execute(
+            insert(ContributorFingerprints)
+            .values(storage_user_id_hash=storage_user_id_hash, segment_hashes=b'', segment_count=0)
+            .on_conflict_do_nothing(index_elements=['storage_user_id_hash'])
+        )
+        row = session.get(ContributorFingerprints, storage_user_id_hash, with_for_update=True, populate_existing=True)
+        merged = fingerprint.merge(ContributorFingerprint.from_bytes(row.watermark, row.segment_hashes))
+        row.watermark = merged.watermark
+        row.segment_hashes = merged.to_bytes()
+        row.segment_count = len(merged.hashes)
+        row.updated_at = datetime.datetime.now(datetime.UTC)
+
+    def find_near_duplicate(self, session: Session, minhash: MinHash) -> Optional[Tuple[int, float]]:
+        """
+        Find the earlier upload whose cells are most similar to a new one's.
+
+        Only uploads sharing an LSH band with the new one are compared, so the lookup is a few
+        index probes however many uploads are stored.
+
+        Args:
+            session: SQLAlchemy session
+            minhash: MinHash of the new upload's cells
+
+        Returns:
+            Optional[Tuple[int, float]]: (file ID, estimated Jaccard index) of the most similar
+            upload, None if no upload shares a band
+        """
+        band_hashes = np.unique(minhash.band_hashes()).tolist()
+        if not band_hashes:
+            return None
+        candidates = session.execute(
+            select(Contributions.file_id, ContributionSketches.minhash)
+            .join(Contributions, Contributions.id == ContributionSketches.contribution_id)
+            .where(ContributionSketches.contribution_id.in_(
+                select(SketchBands.contribution_id).where(SketchBands.band_hash.in_(band_hashes))
+            ))
+            .order_by(ContributionSketches.contribution_id.desc())
+            .limit(NEAR_DUPLICATE_CANDIDATES)
+        ).all()
+        similarities = [(file_id, minhash.jaccard(MinHash.from_bytes(data))) for file_id, data in candidates]
+        return max(similarities, key=lambda similarity: similarity[1], default=None)
+
+    def save_sketch(self, session: Session, contribution_id: int, sketch: ContributionSketch) -> None:
+        """
+        Store the sketches of a contribution and index its MinHash bands.
+
+        Args:
+            session: SQLAlchemy session
+            contribution_id: ID of the contribution, already flushed
+            sketch: Sketches of the contribution's cells
+        """
+        session.add(ContributionSketches(
+            contribution_id=contribution_id,
+            estimated_cells=round(sketch.hll.estimate()),
+            hll=sketch.hll.to_bytes(),
+            minhash=sketch.minhash.to_bytes(),
+            created_at=datetime.datetime.now(datetime.UTC)
+        ))
+        session.flush()
+        band_hashes = np.unique(sketch.minhash.band_hashes()).tolist()
+        if band_hashes:
+            session.execute(insert(SketchBands).values([
+                {'band_hash': band_hash, 'contribution_id': contribution_id} for band_hash in band_hashes
+            ]))
+
+    def load_sketch_aggregates(self, session: Session, scopes: List[str], since: datetime.datetime) -> Dict[str, HyperLogLog]:
+        """
+        Merge the hourly aggregates of some scopes since a time.
+
+        Args:
+            session: SQLAlchemy session
+            scopes: Aggregate scopes, 'global' or 'region:<n>'
+            since: Start of the oldest hourly window to include
+
+        Returns:
+            Dict[str, HyperLogLog]: Sketch of the cells contributed in each scope, leaving out
+            scopes without contributions
+        """
+        merged: Dict[str, HyperLogLog] = {}
+        rows = session.execute(
+            select(SketchAggregates.scope, SketchAggregates.hll)
+            .where(SketchAggregates.scope.in_(scopes), SketchAggregates.window_start >= since)
+        )
+        for scope, data in rows:
+            hll = HyperLogLog.from_bytes(data)
+            merged[scope] = merged[scope].merge(hll) if scope in merged else hll
+        return merged
+
+    def merge_sketch_aggregates(self, session: Session, sketches: Dict[str, HyperLogLog], window_start: datetime.datetime) -> None:
+        """
+        Merge a contribution's sketches into the hourly aggregates of their scopes.
+
+        The aggregate rows are locked in scope order, so concurrent proofs wait for each other
+        instead of deadlocking, and hold the locks until the session commits. Proofs merge in
+        a short transaction of their own, after their contribution is committed.
+
+        Args:
+            session: SQLAlchemy session
+            sketches: Sketch per scope
+            window_start: Start of the current hourly window
+        """
+        scopes = sorted(sketches)
+        session.execute(
+            insert(SketchAggregates)
+            .values([{'scope': scope, 'window_start': window_start, 'hll': b'', 'contributions': 0} for scope in scopes])
+            .on_conflict_do_nothing(index_elements=['scope', 'window_start'])
+        )
+        rows = session.execute(
+            select(SketchAggregates)
+            .where(SketchAggregates.scope.in_(scopes), SketchAggregates.window_start == window_start)
+            .order_by(SketchAggregates.scope)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ).scalars()
+        now = datetime.datetime.now(datetime.UTC)
+        for row in rows:
+            sketch = sketches[row.scope]
+            row.hll = (sketch.merge(HyperLogLog.from_bytes(row.hll)) if row.hll else sketch).to_bytes()
+            row.contributions += 1
+            row.updated_at = now
+
+    def get_proof_result(self, session: Session, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached proof response.
+
+        Args:
+            session: SQLAlchemy session
+            cache_key: Key from utils.result_cache.result_cache_key
+
+        Returns:
+            Optional[Dict[str, Any]]: The stored response, None on a miss
+        """
+        row = session.get(ProofResults, cache_key)
+        return None if row is None else row.response
+
+    def save_proof_result(self, session: Session, cache_key: str, response: Dict[str, Any], file_id: Optional[int] = None) -> None:
+        """
+        Cache a proof response. The first response stored for a key is kept.
+
+        Args:
+            session: SQLAlchemy session
+            cache_key: Key from utils.result_cache.result_cache_key
+            response: The proof response as a dict
+            file_id: File the response was generated for
+        """
+        session.execute(
+            insert(ProofResults)
+            .values(cache_key=cache_key, response=response, file_id=file_id, created_at=datetime.datetime.now(datetime.UTC))
+            .on_conflict_do_nothing(index_elements=['cache_key'])
+        )
+
+# Global database instance, connected on first use
 db = Database()
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""Per-contributor fingerprint of the timeline segments already contributed"""
+import datetime
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+SEGMENT_HASH_BYTES = 8  # Truncated digest size, collisions are negligible below billions of segments
+
+
+def segment_hash(segment: Any) -> int:
+    """
+    Hash a segment independently of key order and formatting.
+
+    Args:
+        segment: A decoded timeline segment
+
+    Returns:
+        int: Unsigned 64-bit hash of the canonical JSON of the segment
+    """
+    canonical = json.dumps(segment, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    digest = hashlib.blake2b(canonical.encode(), digest_size=SEGMENT_HASH_BYTES).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def segment_time(segment: Any, field: str) -> Optional[datetime.datetime]:
+    """
+    Parse the startTime or endTime of a segment.
+
+    Returns:
+        Optional[datetime.datetime]: Timezone-aware time, None if missing or malformed
+    """
+    try:
+        moment = datetime.datetime.fromisoformat(segment[field])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=datetime.timezone.utc)
+
+
+class ContributorFingerprint:
+    """
+    The segments a contributor has already contributed, to process only new ones on a repeat upload.
+
+    A fingerprint is a time watermark (the latest segment endTime seen) and the sorted 64-bit
+    hashes of all segments seen. Segments that start after the watermark are new without a
+    lookup. Older segments are new only if their hash is unknown, which catches segments
+    Google added or revised after the last upload. Segments found new are recorded, and
+    `merge` folds them into the stored fingerprint once they are saved.
+    """
+
+    def __init__(self, watermark: Optional[datetime.datetime] = None, hashes: Optional[np.ndarray] = None):
+        """
+        Args:
+            watermark: Latest segment endTime already contributed
+            hashes: Sorted uint64 hashes of the segments already contributed
+        """
+        self.watermark = watermark
+        self.hashes = np.empty(0, dtype=np.uint64) if hashes is None else hashes
+        self.known_segments = 0
+        self.new_segments = 0
+        self._new_hashes: List[int] = []
+        self._new_watermark = watermark
+
+    @classmethod
+    def from_bytes(cls, watermark: Optional[datetime.datetime], data: Optional[bytes]) -> 'ContributorFingerprint':
+        """Load a fingerprint stored with `to_bytes`"""
+        return cls(watermark, np.frombuffer(data or b'', dtype='<u8').astype(np.uint64))
+
+    def is_new(self, segment: Any) -> bool:
+        """
+        Check a segment against the fingerprint, recording it if it is new.
+
+        Segments without readable times are always new, so they still get validated.
+
+        Args:
+            segment: A decoded timeline segment
+
+        Returns:
+            bool: True if the segment has not been contributed before
+        """
+        hashed = segment_hash(segment)
+        start = segment_time(segment, 'startTime')
+        end = segment_time(segment, 'endTime')
+
+        if self.watermark is not None and start is not None and start <= self.watermark:
+            position = np.searchsorted(self.hashes, np.uint64(hashed))
+            if position < len(self.hashes) and int(self.hashes[position]) == hashed:
+                self.known_segments += 1
+                return False
+
+        self._new_hashes.append(hashed)
+        if end is not None and (self._new_watermark is None or end > self._new_watermark):
+            self._new_watermark = end
+        self.new_segments += 1
+        return True
+
+    def recorded(self) -> 'ContributorFingerprint':
+        """
+        The segments recorded by `is_new`, without the known hashes.
+
+        A process checking segments against its own copy of a fingerprint sends this back,
+        and the copy the proof saves takes it in with `absorb`.
+        """
+        part = ContributorFingerprint(self.watermark)
+        part.known_segments = self.known_segments
+        part.new_segments = self.new_segments
+        part._new_hashes = self._new_hashes
+        part._new_watermark = self._new_watermark
+        return part
+
+    def absorb(self, part: 'ContributorFingerprint') -> None:
+        """Add the counts and new segments recorded by another copy of this fingerprint"""
+        self.known_segments += part.known_segments
+        self.new_segments += part.new_segments
+        self._new_hashes.extend(part._new_hashes)
+        if part._new_watermark is not None and (self._new_watermark is None or part._new_watermark > self._new_watermark):
+            self._new_watermark = part._new_watermark
+
+    def merge(self, other: Optional['ContributorFingerprint'] = None) -> 'ContributorFingerprint':
+        """
+        Combine the known segments, the new segments recorded by `is_new` and another fingerprint.
+
+        Args:
+            other: Fingerprint stored since this one was loaded, e.g. by a concurrent proof
+
+        Returns:
+            ContributorFingerprint: Fingerprint covering all of them
+        """
+        parts = [self.hashes, np.array(self._new_hashes, dtype=np.uint64)]
+        watermarks = [self._new_watermark]
+        if other is not None:
+            parts.append(other.hashes)
+            watermarks.append(other.watermark)
+        watermarks = [watermark for watermark in watermarks if watermark is not None]
+        return ContributorFingerprint(max(watermarks) if watermarks else None, np.unique(np.concatenate(parts)))
+
+    def to_bytes(self) -> bytes:
+        """Serialize the hashes as little-endian uint64"""
+        return self.hashes.astype('<u8').tobytes()
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts of known and new segments, for the proof attributes"""
+        return {
+            'known_segments': self.known_segments,
+            'new_segments': self.new_segments,
+            'watermark': None if self.watermark is None else self.watermark.isoformat(),
+        }
@@ -1,38 +1,75 @@
+import hashlib
 import logging
-import requests
 import re
-from typing import Optional, List, Tuple, Dict, Any
+import tempfile
+from typing import Optional, List, Dict, Any, Iterable, Iterator
+
+import numpy as np
 
 from my_proof.models.google import GoogleUserInfo
 from my_proof.config import settings
+from my_proof.utils.network import TTLCache, http_session
+from my_proof.utils.retry import call_with_retry, is_transient_http_error
+
+COORDINATE_BATCH_SIZE = 100000  # Raw points parsed per bulk conversion
+MIN_MERGE_BLOCK_ROWS = 4096  # Smallest block read from each spilled run per merge round
+IOS_POINT_PATTERN = re.compile(r'geo:(-?\d+\.\d+),(-?\d+\.\d+)')
+
+# Batches of points joined by ';' that the bulk conversion parses exactly like the per-point
+# parsing: each point is a single "geo:lat,lng" (iOS) or "lat,lng" after removing degree signs
+# and spaces (Android). Possessive quantifiers never backtrack, halving the match time.
+_DECIMAL = r'-?\d++\.\d++'
+_NUMBER = r'-?\d++(?:\.\d++)?+'
+IOS_POINTS_PATTERN = re.compile(rf'geo:{_DECIMAL},{_DECIMAL}(?:;geo:{_DECIMAL},{_DECIMAL})*+')
+ANDROID_POINTS_PATTERN = re.compile(rf'{_NUMBER},{_NUMBER}(?:;{_NUMBER},{_NUMBER})*+')
 
-def get_google_user() -> Optional[GoogleUserInfo]:
+_google_user_cache = TTLCache()
+
+def get_google_user(token: Optional[str] = None) -> Optional[GoogleUserInfo]:
     """
     Get Google user information using the OAuth token.
     
+    Successful lookups are cached per process by token hash for NETWORK_CACHE_TTL seconds,
+    so jobs of a batch that share a token only make one request. Requests go through the
+    pooled session, reusing the connection to Google across lookups.
+    
+    Args:
+        token: OAuth2 access token, defaults to settings.GOOGLE_TOKEN
+        
     Returns:
         Optional[GoogleUserInfo]: User information if successful, None if failed
     """
     try:
-        if not settings.GOOGLE_TOKEN:
+        token = token or settings.GOOGLE_TOKEN
+        if not token:
             raise ValueError("GOOGLE_TOKEN is not set in environment")
-            
-        response = requests.get(
-            "https://www.googleapis.com/oauth2/v1/userinfo",
-            params={"alt": "json"},
-            headers={"Authorization": f"Bearer {settings.GOOGLE_TOKEN}"}
-        )
         
-        response.raise_for_status()
-        user_data = response.json()
+        token_hash = hashlib.sha256(token.encode()).hexdigest()
+        cached_user = _google_user_cache.get(token_hash)
+        if cached_user is not None:
+            return cached_user
+
+        def fetch_user_data() -> Dict[str, Any]:
+            response = http_session().get(
+                settings.GOOGLE_USERINFO_URL,
+                params={"alt": "json"},
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=settings.GOOGLE_TIMEOUT
+            )
+            response.raise_for_status()
+            return response.json()
+        
+        user_data = call_with_retry(fetch_user_data, "Google user info request", is_transient=is_transient_http_error)
         
-        return GoogleUserInfo(**user_data)
+        google_user = GoogleUserInfo(**user_data)
+        _google_user_cache.set(token_hash, google_user)
+        return google_user
         
     except Exception as e:
         logging.error(f"Failed to get Google user info: {str(e)}")
         return None
 
-def extract_coordinates(timeline_data: Dict[str, Any], schema_type: str) -> List[Tuple[float, float]]:
+def extract_coordinates(timeline_data: Dict[str, Any], schema_type: str) -> np.ndarray:
     """
     Extract all coordinates from a Google Timeline JSON object.
     
@@ -41,65 +78,283 @@ def extract_coordinates(timeline_data: Dict[str, Any], schema_type: str) -> List
         schema_type: The schema type ('google-timeline-ios.json' or 'google-timeline-android.json')
         
     Returns:
-        List[Tuple[float, float]]: List of (latitude, longitude) tuples
+        np.ndarray: (N, 2) float64 array of unique (latitude, longitude) rows
     """
-    coordinates = set()  # Use set to avoid duplicates
-    
     try:
-        # iOS format
         if schema_type == 'google-timeline-ios.json':
-            for entry in timeline_data:
-                # Extract from timelinePath points
-                if 'timelinePath' in entry:
-                    for path in entry['timelinePath']:
-                        if 'point' in path:
-                            # Format: "geo:37.421955,-122.084058"
-                            match = re.match(r'geo:(-?\d+\.\d+),(-?\d+\.\d+)', path['point'])
-                            if match:
-                                lat, lng = float(match.group(1)), float(match.group(2))
-                                coordinates.add((lat, lng))
-                
-                # Extract from visit locations
-                if 'visit' in entry and 'topCandidate' in entry['visit']:
-                    place_loc = entry['visit']['topCandidate'].get('placeLocation')
-                    if place_loc:
-                        match = re.match(r'geo:(-?\d+\.\d+),(-?\d+\.\d+)', place_loc)
-                        if match:
-                            lat, lng = float(match.group(1)), float(match.group(2))
-                            coordinates.add((lat, lng))
-                            
-        # Android format
+            segments = timeline_data
         elif schema_type == 'google-timeline-android.json':
-            for segment in timeline_data['semanticSegments']:
-                # Extract from timelinePath
-                if 'timelinePath' in segment:
-                    for path in segment['timelinePath']:
-                        if 'point' in path:
-                            # Format: "lat,lng" or "lat°, lng°"
-                            point = path['point'].replace('°', '').replace(' ', '')
-                            lat, lng = map(float, point.split(','))
-                            coordinates.add((lat, lng))
-                
-                # Extract from visit locations
-                if 'visit' in segment and 'topCandidate' in segment['visit']:
-                    place_loc = segment['visit']['topCandidate'].get('placeLocation', {}).get('latLng')
-                    if place_loc:
-                        lat, lng = map(float, place_loc.replace('°', '').replace(' ', '').split(','))
-                        coordinates.add((lat, lng))
-                
-                # Extract from activity locations
-                if 'activity' in segment:
-                    activity = segment['activity']
-                    for point in ['start', 'end']:
-                        if point in activity and 'latLng' in activity[point]:
-                            lat_lng = activity[point]['latLng']
-                            lat, lng = map(float, lat_lng.replace('°', '').replace(' ', '').split(','))
-                            coordinates.add((lat, lng))
+            segments = timeline_data['semanticSegments']
         else:
             raise ValueError(f"Unsupported schema type: {schema_type}")
 
-        return list(coordinates)
+        collector = CoordinateCollector(schema_type)
+        for segment in segments:
+            collector.add_segment(segment)
+        return collector.result()
         
     except Exception as e:
         logging.error(f"Failed to extract coordinates: {str(e)}")
-        return []
+        return np.empty((0, 2), dtype=np.float64)
+
+def segment_points(segment: Dict[str, Any], schema_type: str) -> List[str]:
+    """
+    Collect the raw point strings of a single timeline segment without parsing them.
+    
+    Args:
+        segment: One entry of the iOS top-level array or of the Android semanticSegments array
+        schema_type: The schema type ('google-timeline-ios.json' or 'google-timeline-android.json')
+        
+    Returns:
+        List[str]: Raw points, "geo:lat,lng" for iOS and "lat°, lng°" for Android
+    """
+    points = []
+
+    # iOS format
+    if schema_type == 'google-timeline-ios.json':
+        # Extract from timelinePath points
+        if 'timelinePath' in segment:
+            for path in segment['timelinePath']:
+                if 'point' in path:
+                    points.append(path['point'])
+        
+        # Extract from visit locations
+        if 'visit' in segment and 'topCandidate' in segment['visit']:
+            place_loc = segment['visit']['topCandidate'].get('placeLocation')
+            if place_loc:
+                points.append(place_loc)
+                    
+    # Android format
+    elif schema_type == 'google-timeline-android.json':
+        # Extract from timelinePath
+        if 'timelinePath' in segment:
+            for path in segment['timelinePath']:
+                if 'point' in path:
+                    points.append(path['point'])
+        
+        # Extract from visit locations
+        if 'visit' in segment and 'topCandidate' in segment['visit']:
+            place_loc = segment['visit']['topCandidate'].get('placeLocation', {}).get('latLng')
+            if place_loc:
+                points.append(place_loc)
+        
+        # Extract from activity locations
+        if 'activity' in segment:
+            activity = segment['activity']
+            for point in ['start', 'end']:
+                if point in activity and 'latLng' in activity[point]:
+                    points.append(activity[point]['latLng'])
+    else:
+        raise ValueError(f"Unsupported schema type: {schema_type}")
+
+    return points
+
+def parse_points(points: List[str], schema_type: str) -> np.ndarray:
+    """
+    Parse raw point strings in bulk into a contiguous coordinate array.
+    
+    All points are joined into one string and converted by a single numpy call, once a regex
+    over the whole batch has checked that every point holds exactly one pair of plain numbers.
+    Any other batch is parsed point by point instead, which skips iOS points that don't match
+    "geo:lat,lng" and raises on malformed Android points, so both give the same coordinates.
+    
+    Args:
+        points: Raw points as returned by segment_points
+        schema_type: The schema type ('google-timeline-ios.json' or 'google-timeline-android.json')
+        
+    Returns:
+        np.ndarray: (N, 2) float64 array of (latitude, longitude) rows
+    """
+    if not points:
+        return np.empty((0, 2), dtype=np.float64)
+
+    text = ';'.join(points)
+    if schema_type == 'google-timeline-ios.json':
+        # Format: "geo:37.421955,-122.084058"
+        bulk = IOS_POINTS_PATTERN.fullmatch(text) is not None
+        text = text.replace('geo:', '')
+    else:
+        # Format: "lat,lng" or "lat°, lng°"
+        text = text.replace('°', '').replace(' ', '')
+        bulk = ANDROID_POINTS_PATTERN.fullmatch(text) is not None
+
+    if bulk:
+        values = np.fromstring(text.replace(';', ','), dtype=np.float64, sep=',')
+        if values.size == 2 * len(points):
+            return values.reshape(-1, 2)
+
+    coordinates = []
+    for point in points:
+        if schema_type == 'google-timeline-ios.json':
+            match = IOS_POINT_PATTERN.match(point)
+            if match:
+                coordinates.append((float(match.group(1)), float(match.group(2))))
+        else:
+            lat, lng = map(float, point.replace('°', '').replace(' ', '').split(','))
+            coordinates.append((lat, lng))
+    return np.array(coordinates, dtype=np.float64).reshape(-1, 2)
+
+def unique_coordinates(coordinates: np.ndarray) -> np.ndarray:
+    """
+    Deduplicate coordinate rows.
+    
+    Each (latitude, longitude) row is viewed as one complex number, which numpy sorts
+    lexicographically, so duplicates end up adjacent and are dropped with a single mask.
+    
+    Args:
+        coordinates: (N, 2) float64 array of (latitude, longitude) rows
+        
+    Returns:
+        np.ndarray: (M, 2) float64 array of unique rows, sorted by latitude then longitude
+    """
+    if len(coordinates) == 0:
+        return np.empty((0, 2), dtype=np.float64)
+
+    # Adding 0.0 turns -0.0 into 0.0 and gives a fresh contiguous float64 copy
+    keys = np.sort((np.asarray(coordinates, dtype=np.float64) + 0.0).view(np.complex128).ravel())
+    keep = np.empty(len(keys), dtype=bool)
+    keep[0] = True
+    np.not_equal(keys[1:], keys[:-1], out=keep[1:])
+    return keys[keep].view(np.float64).reshape(-1, 2)
+
+
+class CoordinateRuns:
+    """
+    Merges deduplicated chunks of coordinates into one set of unique coordinates, within a memory budget.
+    
+    Chunks stay in memory while they fit in a quarter of the budget, leaving room for the
+    copies a merge sorts. Past that, they are merged into one sorted run and spilled to an
+    unlinked temporary file. When there are runs, the result is a streaming k-way merge of
+    all of them, written to one more file and memory-mapped, so memory use stays flat
+    however many coordinates there are. Without a budget nothing is spilled.
+    """
+
+    def __init__(self, memory_budget_mb: Optional[int] = None, spill_dir: Optional[str] = None):
+        """
+        Args:
+            memory_budget_mb: Memory budget in MB, defaults to settings.MAX_MEMORY_MB (None keeps everything in memory)
+            spill_dir: Directory of the spilled runs, defaults to settings.SPILL_DIR
+        """
+        memory_budget_mb = memory_budget_mb or settings.MAX_MEMORY_MB
+        self.budget_bytes = memory_budget_mb << 20 if memory_budget_mb else None
+        self.spill_dir = spill_dir or settings.SPILL_DIR
+        self._chunks: List[np.ndarray] = []
+        self._chunk_bytes = 0
+        self._runs: List[np.ndarray] = []
+
+    def add(self, coordinates: np.ndarray) -> None:
+        """
+        Add a chunk of coordinates.
+        
+        Args:
+            coordinates: (N, 2) float64 array of unique rows in the order of unique_coordinates,
+                e.g. the result of another CoordinateRuns
+        """
+        if len(coordinates) == 0:
+            return
+        if isinstance(coordinates, np.memmap):
+            # Already spilled, so it is merged from its file like any other run
+            self._runs.append(coordinates.view(np.complex128).reshape(-1))
+            return
+        self._chunks.append(coordinates)
+        self._chunk_bytes += coordinates.nbytes
+        if self.budget_bytes and self._chunk_bytes > self.budget_bytes // 4:
+            self._spill()
+
+    def result(self) -> np.ndarray:
+        """
+        Merge all chunks.
+        
+        Returns:
+            np.ndarray: (N, 2) float64 array of unique (latitude, longitude) rows, memory-mapped
+            if anything was spilled
+        """
+        if not self._runs:
+            if len(self._chunks) == 1:
+                return self._chunks[0]
+            return unique_coordinates(np.concatenate(self._chunks)) if self._chunks else np.empty((0, 2), dtype=np.float64)
+
+        if self._chunks:
+            self._spill()
+        if len(self._runs) > 1:
+            self._runs = [self._write_run(self._merge_runs())]
+        return self._runs[0].view(np.float64).reshape(-1, 2)
+
+    def _spill(self) -> None:
+        merged = self._chunks[0] if len(self._chunks) == 1 else unique_coordinates(np.concatenate(self._chunks))
+        self._chunks, self._chunk_bytes = [], 0
+        self._runs.append(self._write_run([merged.view(np.complex128).reshape(-1)]))
+        logging.info(f"Spilled a run of {len(merged)} coordinates to disk")
+
+    def _write_run(self, blocks: Iterable[np.ndarray]) -> np.ndarray:
+        """Write complex128 key blocks to a temporary file, which is already unlinked, and map it"""
+        with tempfile.TemporaryFile(dir=self.spill_dir) as f:
+            count = 0
+            for block in blocks:
+                block.tofile(f)
+                count += len(block)
+            f.flush()
+            if count == 0:
+                return np.empty(0, dtype=np.complex128)
+            # The mapping outlives the file handle and frees the disk space once dropped
+            return np.memmap(f, dtype=np.complex128, mode='r', shape=(count,))
+
+    def _merge_runs(self) -> Iterator[np.ndarray]:
+        """
+        Merge the sorted runs block by block, yielding unique keys in sorted order.
+        
+        Each round reads the next block of every run and takes everything up to the smallest
+        last key of the blocks. All keys up to it are in the blocks, so each round's keys are
+        complete and sort and deduplicate on their own.
+        """
+        runs = self._runs
+        block_rows = max(MIN_MERGE_BLOCK_ROWS, (self.budget_bytes or 0) // (4 * 16 * len(runs)))
+        positions = [0] * len(runs)
+        while True:
+            blocks = {i: run[positions[i]:positions[i] + block_rows] for i, run in enumerate(runs) if positions[i] < len(run)}
+            if not blocks:
+                return
+            frontier = np.sort(np.array([block[-1] for block in blocks.values()]))[0]
+            taken = []
+            for i, block in blocks.items():
+                end = int(np.searchsorted(block, frontier, side='right'))
+                taken.append(block[:end])
+                positions[i] += end
+            yield unique_coordinates(np.concatenate(taken).view(np.float64).reshape(-1, 2)).view(np.complex128).reshape(-1)
+
+
+class CoordinateCollector:
+    """
+    Accumulates the coordinates of streamed segments.
+    
+    Raw point strings are buffered and parsed in batches of `batch_size` by parse_points, and
+    each parsed batch is deduplicated straight away so only unique rows are kept between batches.
+    The batches are merged by CoordinateRuns, spilling to disk past MAX_MEMORY_MB.
+    """
+
+    def __init__(self, schema_type: str, batch_size: int = COORDINATE_BATCH_SIZE):
+        self.schema_type = schema_type
+        self.batch_size = batch_size
+        self._points: List[str] = []
+        self._runs = CoordinateRuns()
+
+    def add_segment(self, segment: Dict[str, Any]) -> None:
+        """Buffer the raw points of a segment, parsing them once a full batch is collected."""
+        self._points.extend(segment_points(segment, self.schema_type))
+        if len(self._points) >= self.batch_size:
+            self._flush()
+
+    def result(self) -> np.ndarray:
+        """
+        Parse any remaining points and merge all batches.
+        
+        Returns:
+            np.ndarray: (N, 2) float64 array of unique (latitude, longitude) rows
+        """
+        self._flush()
+        return self._runs.result()
+
+    def _flush(self) -> None:
+        if self._points:
+            self._runs.add(unique_coordinates(parse_points(self._points, self.schema_type)))
+            self._points = []
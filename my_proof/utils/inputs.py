@@ -0,0 +1,321 @@
+"""Input sources: plain JSON files and JSON members of zip archives, read without extraction"""
+import io
+import logging
+import os
+import posixpath
+import queue
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Generator, IO, Iterator, List, Optional, Tuple
+
+from my_proof.config import settings
+
+READAHEAD_CHUNK_SIZE = 1 << 20  # Decompressed bytes per readahead chunk
+
+
+class InputFile:
+    """A JSON input, either a plain file or a member of a zip archive"""
+
+    def __init__(self, path: str, member: Optional[str] = None, size: Optional[int] = None):
+        """
+        Args:
+            path: Path of the JSON file or of the zip archive
+            member: Name of the JSON member inside the archive, None for a plain file
+            size: Uncompressed size in bytes, taken from the file if not given
+        """
+        self.path = path
+        self.member = member
+        self.size = os.path.getsize(path) if size is None else size
+        # Set by prefetch_members while the member is decompressed ahead
+        self.decompressed: Optional[Future] = None
+        # Set by extract_members once the member is decompressed ahead into a file
+        self.extracted_path: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return f"{os.path.basename(self.path)}:{self.member}" if self.member else os.path.basename(self.path)
+
+    @contextmanager
+    def open(self) -> Generator[IO[str], None, None]:
+        """
+        Open the input as a text stream.
+
+        Zip members are decompressed on the fly, by a background thread when
+        INPUT_READAHEAD_CHUNKS is set, so decompression overlaps with parsing. A member that
+        prefetch_members has started decompressing is read from its temporary file instead,
+        and one extract_members has decompressed from its extracted file.
+        """
+        if self.member is None or self.extracted_path is not None:
+            with open(self.path if self.member is None else self.extracted_path, 'r', encoding='utf-8') as f:
+                yield f
+            return
+
+        if self.decompressed is not None and not self.decompressed.cancel():
+            spool = self.decompressed.result()
+            self.decompressed = None
+            text = io.TextIOWrapper(spool, encoding='utf-8')
+            try:
+                yield text
+            finally:
+                text.close()
+            return
+        self.decompressed = None
+
+        with zipfile.ZipFile(self.path, 'r') as archive:
+            with archive.open(self.member, 'r') as member:
+                raw = member
+                if settings.INPUT_READAHEAD_CHUNKS:
+                    raw = io.BufferedReader(ReadaheadReader(member, settings.INPUT_READAHEAD_CHUNKS))
+                text = io.TextIOWrapper(raw, encoding='utf-8')
+                try:
+                    yield text
+                finally:
+                    text.close()
+
+    def remove_extracted(self) -> None:
+        """Remove the file extract_members decompressed the member into, if any"""
+        if self.extracted_path is not None:
+            try:
+                os.remove(self.extracted_path)
+            except FileNotFoundError:
+                pass
+            self.extracted_path = None
+
+    def __repr__(self) -> str:
+        return f"InputFile({self.name!r})"
+
+
+def list_input_files(input_dir: str) -> List[InputFile]:
+    """
+    List the JSON inputs of a directory.
+
+    Plain .json files are used as they are, and .json members at the root of zip archives are
+    read straight out of the archive. Archives are checked against the size limits before any
+    member is read.
+
+    Args:
+        input_dir: Directory containing the input files
+
+    Returns:
+        List[InputFile]: The JSON inputs, in directory order
+    """
+    input_files = []
+    for input_filename in os.listdir(input_dir):
+        input_path = os.path.join(input_dir, input_filename)
+
+        if zipfile.is_zipfile(input_path):
+            input_files.extend(_archive_members(input_path))
+        elif os.path.splitext(input_path)[1].lower() == '.json':
+            input_files.append(InputFile(input_path))
+    return input_files
+
+
+def _archive_members(archive_path: str) -> List[InputFile]:
+    """
+    Check an archive against path traversal and decompression bombs and list its JSON members.
+
+    zipfile never decompresses a member past its declared size, so checking the declared sizes
+    and compression ratios here bounds what reading the members can produce.
+    """
+    max_file_size = settings.MAX_INPUT_FILE_MB * 1024 * 1024
+    max_total_size = settings.MAX_INPUT_TOTAL_MB * 1024 * 1024
+    members = []
+    total_size = 0
+
+    with zipfile.ZipFile(archive_path, 'r') as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            name = info.filename
+            if name.startswith('/') or '\\' in name or '..' in posixpath.normpath(name).split('/'):
+                raise ValueError(f"Unsafe path in archive {archive_path}: {name}")
+            # Like extracting and listing the directory, only members at the archive root count
+            if '/' in name or os.path.splitext(name)[1].lower() != '.json':
+                continue
+
+            if info.file_size > max_file_size:
+                raise ValueError(f"Archive member {name} is larger than {settings.MAX_INPUT_FILE_MB} MB")
+            if info.file_size > settings.MAX_COMPRESSION_RATIO * max(info.compress_size, 1):
+                raise ValueError(f"Archive member {name} exceeds the maximum compression ratio")
+            total_size += info.file_size
+            if total_size > max_total_size:
+                raise ValueError(f"Archive {archive_path} holds more than {settings.MAX_INPUT_TOTAL_MB} MB of JSON")
+            members.append(InputFile(archive_path, name, info.file_size))
+
+    logging.info(f"Found {len(members)} JSON files in {os.path.basename(archive_path)}")
+    return members
+
+
+def prefetch_members(input_files: List[InputFile], workers: int) -> Iterator[InputFile]:
+    """
+    Yield the inputs in order, decompressing the next zip members on a thread pool meanwhile.
+
+    While one input is parsed, the zip members among the next `workers` inputs are each
+    decompressed by a pool thread into a temporary file, kept in memory up to the readahead
+    size and spilled to SPILL_DIR past it. zlib releases the GIL, so the members decompress
+    in parallel with each other and with the parser. A member whose decompression hasn't
+    started when it is reached is streamed as usual.
+
+    Args:
+        input_files: Inputs in parsing order
+        workers: Members decompressed at once
+
+    Yields:
+        InputFile: The inputs, each prefetched member opening its temporary file
+    """
+    members = [input_file for input_file in input_files if input_file.member is not None]
+    if workers < 1 or len(members) < 2:
+        yield from input_files
+        return
+
+    spool_size = max(settings.INPUT_READAHEAD_CHUNKS, 1) * READAHEAD_CHUNK_SIZE
+    submitted: Dict[int, InputFile] = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='decompress') as executor:
+        try:
+            for position, input_file in enumerate(input_files):
+                for upcoming in input_files[position + 1:position + 1 + workers]:
+                    if upcoming.member is not None and id(upcoming) not in submitted:
+                        upcoming.decompressed = executor.submit(_decompress_member, upcoming, spool_size)
+                        submitted[id(upcoming)] = upcoming
+                yield input_file
+        finally:
+            # Inputs left unparsed, e.g. after an invalid file, drop their temporary files
+            for input_file in submitted.values():
+                future, input_file.decompressed = input_file.decompressed, None
+                if future is not None and not future.cancel():
+                    try:
+                        future.result().close()
+                    except Exception:
+                        pass
+
+
+def extract_members(input_files: List[InputFile], workers: int) -> Iterator[InputFile]:
+    """
+    Yield the inputs in order, each zip member once a pool thread has decompressed it into a file.
+
+    The counterpart of prefetch_members for inputs parsed in other processes, which can't read
+    an in-memory spool: the members among the next `workers` inputs are extracted into
+    temporary files in SPILL_DIR while the earlier inputs are parsed. The caller removes the
+    files with `remove_extracted` once the inputs are parsed, including those of inputs
+    extracted ahead but never yielded.
+
+    Args:
+        input_files: Inputs in parsing order
+        workers: Members decompressed at once
+
+    Yields:
+        InputFile: The inputs, each member with its extracted_path set
+    """
+    if workers < 1 or not any(input_file.member is not None for input_file in input_files):
+        yield from input_files
+        return
+
+    submitted: Dict[int, Tuple[InputFile, Future]] = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='extract') as executor:
+        try:
+            for position, input_file in enumerate(input_files):
+                for upcoming in input_files[position:position + 1 + workers]:
+                    if upcoming.member is not None and id(upcoming) not in submitted:
+                        submitted[id(upcoming)] = (upcoming, executor.submit(_extract_member, upcoming))
+                if input_file.member is not None:
+                    input_file.extracted_path = submitted[id(input_file)][1].result()
+                yield input_file
+        finally:
+            # Hand the files extracted ahead to their inputs, so the caller removes them too
+            for upcoming, future in submitted.values():
+                if upcoming.extracted_path is None and not future.cancel():
+                    try:
+                        upcoming.extracted_path = future.result()
+                    except Exception:
+                        pass
+
+
+def _extract_member(input_file: InputFile) -> str:
+    """Decompress a zip member into a named temporary file and return its path"""
+    fd, path = tempfile.mkstemp(suffix='.json', dir=settings.SPILL_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as extracted:
+            with zipfile.ZipFile(input_file.path, 'r') as archive:
+                with archive.open(input_file.member, 'r') as member:
+                    shutil.copyfileobj(member, extracted, READAHEAD_CHUNK_SIZE)
+        return path
+    except BaseException:
+        os.remove(path)
+        raise
+
+
+def _decompress_member(input_file: InputFile, spool_size: int) -> IO[bytes]:
+    """Decompress a zip member into a temporary file, rewound for reading"""
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_size, dir=settings.SPILL_DIR)
+    try:
+        with zipfile.ZipFile(input_file.path, 'r') as archive:
+            with archive.open(input_file.member, 'r') as member:
+                shutil.copyfileobj(member, spool, READAHEAD_CHUNK_SIZE)
+        spool.seek(0)
+        return spool
+    except Exception:
+        spool.close()
+        raise
+
+
+class ReadaheadReader(io.RawIOBase):
+    """
+    Reads a binary stream on a background thread into a bounded queue of chunks.
+
+    zlib releases the GIL while decompressing, so the next chunks of a zip member are
+    decompressed while the current ones are parsed. At most `depth` chunks are buffered.
+    """
+
+    def __init__(self, source: BinaryIO, depth: int, chunk_size: int = READAHEAD_CHUNK_SIZE):
+        self._queue: queue.Queue = queue.Queue(maxsize=depth)
+        self._chunk = b''
+        self._offset = 0
+        self._closed_event = threading.Event()
+        self._thread = threading.Thread(target=self._fill, args=(source, chunk_size), daemon=True)
+        self._thread.start()
+
+    def _fill(self, source: BinaryIO, chunk_size: int) -> None:
+        try:
+            while not self._closed_event.is_set():
+                chunk = source.read(chunk_size)
+                self._put(chunk)
+                if not chunk:
+                    return
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item) -> None:
+        while not self._closed_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._offset >= len(self._chunk):
+            item = self._queue.get()
+            if isinstance(item, Exception):
+                raise item
+            if not item:
+                # Keep returning EOF on later reads
+                self._queue.put(b'')
+                return 0
+            self._chunk, self._offset = item, 0
+
+        size = min(len(buffer), len(self._chunk) - self._offset)
+        buffer[:size] = self._chunk[self._offset:self._offset + size]
+        self._offset += size
+        return size
+
+    def close(self) -> None:
+        self._closed_event.set()
+        self._thread.join()
+        super().close()
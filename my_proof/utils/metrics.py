@@ -0,0 +1,257 @@
+"""Per-proof stage instrumentation and profiling"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Generator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+METRICS_FILENAME = 'metrics.json'
+CPROFILE_FILENAME = 'profile.pstats'
+TRACEMALLOC_FILENAME = 'tracemalloc.txt'
+TRACEMALLOC_TOP_LINES = 50  # Allocation sites written to the tracemalloc dump
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of the process so far in MB, None where it can't be measured"""
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class _NullTimer:
+    """Timer context of a disabled span"""
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+class NullSpan:
+    """
+    Span handed out when metrics are disabled.
+
+    Every method is a no-op, so instrumented code costs one method call per use and
+    needs no checks of its own.
+    """
+    __slots__ = ()
+    _timer = _NullTimer()
+
+    def __enter__(self) -> 'NullSpan':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def count(self, name: str, value: int = 1) -> None:
+        return None
+
+    def timer(self, name: str) -> _NullTimer:
+        return self._timer
+
+
+NULL_SPAN = NullSpan()
+
+
+class _Timer:
+    """Adds the wall time of a block to one of the span's timers"""
+    __slots__ = ('_timers', '_name', '_start')
+
+    def __init__(self, timers: Dict[str, float], name: str):
+        self._timers = timers
+        self._name = name
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self._timers[self._name] = self._timers.get(self._name, 0.0) + time.perf_counter() - self._start
+
+
+class Span:
+    """
+    A named stage of a proof.
+
+    Records wall time, CPU time of the thread running the stage and the process peak RSS when
+    the stage ends. Counts (bytes read, coordinates, rows) are added with `count`, and the time
+    spent in interleaved sub-steps of the stage is accumulated with `timer`.
+    """
+
+    def __init__(self, metrics: 'Metrics', name: str):
+        self._metrics = metrics
+        self.name = name
+        self.counts: Dict[str, int] = {}
+        self.timers: Dict[str, float] = {}
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_rss_mb: Optional[float] = None
+        self.thread = threading.current_thread().name
+
+    def __enter__(self) -> 'Span':
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.wall = time.perf_counter() - self._wall_start
+        self.cpu = time.thread_time() - self._cpu_start
+        self.peak_rss_mb = peak_rss_mb()
+        self._metrics.spans.append(self)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Spans recorded in a parsing process are sent back without the metrics holding them
+        state = self.__dict__.copy()
+        state['_metrics'] = None
+        return state
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + int(value)
+
+    def timer(self, name: str) -> _Timer:
+        return _Timer(self.timers, name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'thread': self.thread,
+            'wall_s': round(self.wall, 6),
+            'cpu_s': round(self.cpu, 6),
+            'peak_rss_mb': None if self.peak_rss_mb is None else round(self.peak_rss_mb, 1),
+            'counts': self.counts,
+            'timers_s': {name: round(seconds, 6) for name, seconds in self.timers.items()},
+        }
+
+
+class Metrics:
+    """
+    Collects the spans of one proof and reports them.
+
+    When disabled, `span` returns a shared no-op span and nothing is measured or stored.
+    """
+
+    def __init__(self, enabled: bool = False, profile_mode: Optional[str] = None):
+        """
+        Args:
+            enabled: Record spans
+            profile_mode: 'cprofile' or 'tracemalloc' to profile the block wrapped by `profile`
+        """
+        self.enabled = enabled
+        self.profile_mode = profile_mode
+        self.spans: List[Span] = []
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._totals: Optional[Dict[str, Any]] = None
+        self._tracemalloc_peak_mb: Optional[float] = None
+
+    def span(self, name: str) -> Any:
+        """
+        Measure a stage of the proof.
+
+        Args:
+            name: Stage name used in the report
+
+        Returns:
+            Span or NullSpan: Context manager yielding the span, to add counts and timers to
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name)
+
+    @contextmanager
+    def profile(self, output_dir: str) -> Generator[None, None, None]:
+        """
+        Profile a block with cProfile or tracemalloc, as set by `profile_mode`.
+
+        cProfile only sees the calling thread, so work on the prelude threads is not included.
+        The dump is written to `output_dir` when the block exits, even if it raised.
+
+        Args:
+            output_dir: Directory the profile dump is written to
+        """
+        if self.profile_mode == 'cprofile':
+            import cProfile
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(output_dir, CPROFILE_FILENAME))
+                logging.info(f"Wrote cProfile stats to {os.path.join(output_dir, CPROFILE_FILENAME)}")
+        elif self.profile_mode == 'tracemalloc':
+            import tracemalloc
+
+            tracemalloc.start()
+            try:
+                yield
+            finally:
+                snapshot = tracemalloc.take_snapshot()
+                self._tracemalloc_peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                tracemalloc.stop()
+                with open(os.path.join(output_dir, TRACEMALLOC_FILENAME), 'w') as f:
+                    f.write(f"Peak traced memory: {self._tracemalloc_peak_mb:.1f} MB\n")
+                    for stat in snapshot.statistics('lineno')[:TRACEMALLOC_TOP_LINES]:
+                        f.write(f"{stat}\n")
+                logging.info(f"Wrote tracemalloc stats to {os.path.join(output_dir, TRACEMALLOC_FILENAME)}")
+        else:
+            yield
+
+    def stop(self) -> None:
+        """Fix the totals of the proof, so reports made later show the same numbers"""
+        self._totals = self._measure_totals()
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Build the performance report of the proof.
+
+        Returns:
+            Dict[str, Any]: Totals of the whole proof (up to `stop` if it was called) and the
+            spans in the order they ended
+        """
+        total = self._totals or self._measure_totals()
+        if self._tracemalloc_peak_mb is not None:
+            total = {**total, 'tracemalloc_peak_mb': round(self._tracemalloc_peak_mb, 1)}
+        return {'total': total, 'spans': [span.to_dict() for span in self.spans]}
+
+    def _measure_totals(self) -> Dict[str, Any]:
+        rss = peak_rss_mb()
+        return {
+            'wall_s': round(time.perf_counter() - self._start, 6),
+            'cpu_s': round(time.process_time() - self._cpu_start, 6),
+            'peak_rss_mb': None if rss is None else round(rss, 1),
+        }
+
+    def log_report(self) -> None:
+        """Log the performance report as a table"""
+        if not self.enabled:
+            return
+        report = self.report()
+        lines = ["Performance report:", "-" * 96,
+                 f"{'Stage':<24} | {'Wall s':>8} | {'CPU s':>8} | {'RSS MB':>8} | Counts", "-" * 96]
+        for span in report['spans']:
+            details = {**span['counts'], **{f"{name}_s": seconds for name, seconds in span['timers_s'].items()}}
+            rss = '' if span['peak_rss_mb'] is None else f"{span['peak_rss_mb']:.1f}"
+            lines.append(f"{span['name']:<24} | {span['wall_s']:>8.3f} | {span['cpu_s']:>8.3f} | {rss:>8} | "
+                         + ", ".join(f"{name}={value}" for name, value in details.items()))
+        total = report['total']
+        rss = '' if total['peak_rss_mb'] is None else f"{total['peak_rss_mb']:.1f}"
+        lines += ["-" * 96, f"{'Total':<24} | {total['wall_s']:>8.3f} | {total['cpu_s']:>8.3f} | {rss:>8} |"]
+        logging.info("\n".join(lines))
+
+    def write(self, output_dir: str) -> None:
+        """Write the performance report to metrics.json in the output directory"""
+        if not self.enabled:
+            return
+        with open(os.path.join(output_dir, METRICS_FILENAME), 'w') as f:
+            json.dump(self.report(), f, indent=2)
@@ -0,0 +1,209 @@
+"""Schema migrations for databases created by earlier versions"""
+import io
+import logging
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from my_proof.utils.cells import cell_keys
+from my_proof.config import settings
+from my_proof.models.db import CoordinateCells, coordinate_cells_seq
+from my_proof.utils.db import CoordinateShards, create_cell_partitions, pack_copy_binary, unpack_copy_binary
+
+BACKFILL_BATCH_SIZE = 100000  # Coordinates updated per transaction
+
+# Cells of the unsharded storage after a watermark, per COORDINATE_STORAGE
+SHARD_BACKFILL_QUERIES = {
+    'rows': "SELECT id, cell, contributor_id::int8 FROM coordinates WHERE id > %s AND cell IS NOT NULL ORDER BY id LIMIT %s",
+    'cells': "SELECT seq, cell, contributor_id::int8 FROM coordinate_cells WHERE seq > %s ORDER BY seq LIMIT %s",
+}
+
+def migrate_cell_keys(engine: Engine, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Add and backfill coordinates.cell, then move the uniqueness constraint onto it.
+
+    Rows are processed in id order, one transaction per batch, so the backfill can be stopped and
+    rerun. When several existing rows fall into the same cell only the lowest id gets the key,
+    the others keep a NULL cell: they are redundant for uniqueness and NULLs never conflict.
+    Run this before deploying code that inserts on the cell key. If CELL_RESOLUTION_BITS is
+    changed later, the cell column has to be cleared and backfilled again.
+
+    Args:
+        engine: Engine connected to the database to migrate
+        batch_size: Rows read and updated per transaction
+
+    Returns:
+        int: Number of rows that were assigned a cell key
+    """
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE coordinates ADD COLUMN IF NOT EXISTS cell bigint"))
+        # Plain index so the NOT EXISTS probe below is an index lookup until the constraint exists
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_coordinates_cell_backfill ON coordinates (cell)"))
+
+    last_id = 0
+    assigned = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text("SELECT id, latitude, longitude FROM coordinates WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {'last_id': last_id, 'limit': batch_size}
+            ).fetchall()
+            if not rows:
+                break
+
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            keys = cell_keys(np.array([(row[1], row[2]) for row in rows], dtype=np.float64))
+            # Rows are in id order, so the first index of each key is its lowest id
+            _, first = np.unique(keys, return_index=True)
+
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS cell_backfill "
+                    "(id int8 NOT NULL, cell int8 NOT NULL) ON COMMIT DROP"
+                )
+                cursor.copy_expert(
+                    "COPY cell_backfill (id, cell) FROM STDIN WITH (FORMAT binary)",
+                    io.BytesIO(pack_copy_binary(ids[first], keys[first]))
+                )
+                cursor.execute(
+                    "UPDATE coordinates c SET cell = b.cell FROM cell_backfill b "
+                    "WHERE c.id = b.id AND c.cell IS NULL "
+                    "AND NOT EXISTS (SELECT 1 FROM coordinates o WHERE o.cell = b.cell)"
+                )
+                assigned += cursor.rowcount
+            finally:
+                cursor.close()
+
+            last_id = int(ids[-1])
+            logging.info(f"Backfilled cell keys up to coordinate {last_id} ({assigned} assigned)")
+
+    with engine.begin() as conn:
+        if not conn.execute(text("SELECT 1 FROM pg_constraint WHERE conname = 'uix_cell'")).first():
+            conn.execute(text("ALTER TABLE coordinates ADD CONSTRAINT uix_cell UNIQUE (cell)"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_coordinates_cell_backfill"))
+        conn.execute(text("ALTER TABLE coordinates DROP CONSTRAINT IF EXISTS uix_lat_lng"))
+
+    logging.info(f"Cell key migration complete, {assigned} coordinates assigned a cell")
+    return assigned
+
+def migrate_to_cell_storage(engine: Engine, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Copy the cells of the coordinates table into the packed, partitioned coordinate_cells table.
+
+    Rows are copied in coordinates id order, one transaction per id range, and conflicts are
+    skipped, so the copy can be stopped and rerun. Copy while proofs still write to
+    coordinates, then set COORDINATE_STORAGE=cells and run this once more to pick up the rows
+    inserted in between. The coordinates table can then be dropped, and a coordinate filter
+    snapshot has to be rebuilt since its watermark refers to coordinates ids.
+
+    Args:
+        engine: Engine connected to the database to migrate (cell keys must be backfilled)
+        batch_size: Coordinates ids copied per transaction
+
+    Returns:
+        int: Number of cells copied
+    """
+    coordinate_cells_seq.create(engine, checkfirst=True)
+    CoordinateCells.__table__.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        create_cell_partitions(conn, settings.COORDINATE_PARTITIONS)
+        max_id = conn.execute(text("SELECT coalesce(max(id), 0) FROM coordinates")).scalar()
+
+    copied = 0
+    for start in range(0, max_id, batch_size):
+        with engine.begin() as conn:
+            copied += conn.execute(
+                text(
+                    "INSERT INTO coordinate_cells (cell, contributor_id) "
+                    "SELECT cell, contributor_id FROM coordinates "
+                    "WHERE id > :start AND id <= :end AND cell IS NOT NULL ORDER BY id "
+                    "ON CONFLICT (cell) DO NOTHING"
+                ),
+                {'start': start, 'end': start + batch_size}
+            ).rowcount
+        logging.info(f"Copied cells up to coordinate {min(start + batch_size, max_id)} ({copied} copied)")
+
+    logging.info(f"Cell storage migration complete, {copied} cells copied")
+    return copied
+
+def _read_cell_batch(cursor, query: str, watermark: int, batch_size: int):
+    """Read (watermark, cell, contributor_id) columns of a batch with a binary COPY"""
+    buffer = io.BytesIO()
+    cursor.copy_expert(f"COPY ({cursor.mogrify(query, (watermark, batch_size)).decode()}) TO STDOUT WITH (FORMAT binary)", buffer)
+    return unpack_copy_binary(buffer.getvalue(), 'i8', 'i8', 'i8')
+
+def migrate_to_shards(engine: Engine, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Backfill the coordinate shards from the unsharded storage, then move misplaced cells between shards.
+
+    The cells of the main database's coordinate storage are copied to their shard, and every
+    shard is then read in seq order and the cells that now route elsewhere, e.g. after shards
+    were added to COORDINATE_SHARD_URLS, are copied to their shard and deleted. Each batch is
+    committed on its own and stored cells are skipped, so the migration can be stopped and
+    rerun. Proofs route to the new shards right away: until a cell has been moved, a proof can
+    count it as new once more.
+
+    Args:
+        engine: Engine connected to the main database, whose coordinates are copied
+        batch_size: Cells read per transaction
+
+    Returns:
+        int: Number of cells copied or moved to a shard
+    """
+    if not settings.COORDINATE_SHARD_URLS:
+        raise ValueError("COORDINATE_SHARD_URLS is not set")
+    shards = CoordinateShards(settings.COORDINATE_SHARD_URLS)
+
+    moved = 0
+    last = 0
+    while True:
+        with engine.begin() as conn:
+            cursor = conn.connection.cursor()
+            try:
+                positions, cells, contributor_ids = _read_cell_batch(cursor, SHARD_BACKFILL_QUERIES[settings.COORDINATE_STORAGE], last, batch_size)
+            finally:
+                cursor.close()
+        if len(cells) == 0:
+            break
+        moved += shards.insert_cells(cells, contributor_ids)[0]
+        last = int(positions[-1])
+        logging.info(f"Backfilled shards up to {last} ({moved} copied)")
+
+    for source, source_engine in enumerate(shards.engines):
+        last = 0
+        while True:
+            with source_engine.begin() as conn:
+                cursor = conn.connection.cursor()
+                try:
+                    seqs, cells, contributor_ids = _read_cell_batch(cursor, SHARD_BACKFILL_QUERIES['cells'], last, batch_size)
+                    if len(cells) == 0:
+                        break
+                    misplaced = shards.route(cells) != source
+                    if misplaced.any():
+                        # Copied before they are deleted, so a cell is never missing from every shard
+                        moved += shards.insert_cells(cells[misplaced], contributor_ids[misplaced])[0]
+                        cursor.execute("DELETE FROM coordinate_cells WHERE cell = ANY(%s)", (cells[misplaced].tolist(),))
+                finally:
+                    cursor.close()
+            last = int(seqs[-1])
+            logging.info(f"Rebalanced shard {source} up to seq {last} ({int(misplaced.sum())} moved)")
+
+    logging.info(f"Shard migration complete, {moved} cells copied or moved")
+    return moved
+
+MIGRATIONS = {
+    'cell-keys': migrate_cell_keys,
+    'cell-storage': migrate_to_cell_storage,
+    'shards': migrate_to_shards,
+}
+
+# python -m my_proof.utils.migrations [cell-keys|cell-storage|shards]
+if __name__ == "__main__":
+    import sys
+
+    from my_proof.utils.db import db
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    MIGRATIONS[sys.argv[1] if len(sys.argv) > 1 else 'cell-keys'](db.engine)
@@ -0,0 +1,106 @@
+"""Pooled HTTP connections and expiring caches shared by the Google and RPC clients"""
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Mapping, Optional, Tuple
+
+from my_proof.config import settings
+
+if TYPE_CHECKING:
+    import requests
+
+HTTP_POOL_SIZE = 10  # Keep-alive connections kept open per host
+
+_session: Optional['requests.Session'] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+
+def http_session() -> 'requests.Session':
+    """
+    The requests session of this process.
+
+    Connections are kept alive and reused across calls, proofs and jobs, so a lookup after the
+    first one to a host skips the TCP and TLS handshakes. A forked child gets its own session
+    instead of sharing the parent's sockets.
+
+    Returns:
+        requests.Session: Session with a connection pool of HTTP_POOL_SIZE per host
+    """
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+
+class TTLCache:
+    """
+    Thread-safe cache whose entries expire a fixed time after they are stored.
+
+    Past `max_entries`, expired entries are dropped first, then the oldest ones.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: int = 100000):
+        """
+        Args:
+            ttl: Seconds an entry is served, defaults to settings.NETWORK_CACHE_TTL (0 disables the cache)
+            max_entries: Number of entries kept
+        """
+        self.ttl = settings.NETWORK_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached value of a key, None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove a key and return its cached value, None if missing or expired"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.update({key: value})
+
+    def update(self, values: Mapping[Hashable, Any]) -> None:
+        """Store several values with the same expiry"""
+        if self.ttl <= 0:
+            return
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in values.items():
+                self._entries.pop(key, None)
+                self._entries[key] = (expires, value)
+            if len(self._entries) > self.max_entries:
+                self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[key]
+        # Entries are kept in insertion order, so the first ones are the oldest
+        for key in list(self._entries)[:max(len(self._entries) - self.max_entries, 0)]:
+            del self._entries[key]
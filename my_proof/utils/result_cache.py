@@ -0,0 +1,164 @@
+"""Content-addressed cache of proof results"""
+import hashlib
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from my_proof.config import Settings
+from my_proof.utils.scoring import SCORING_VERSION
+
+HASH_CHUNK_SIZE = 1 << 20  # Bytes hashed per read
+SCHEMAS_DIR = os.path.join(os.path.dirname(__file__), '..', 'schemas')
+
+# Errors that can go away on a retry, so responses holding them are not cached
+TRANSIENT_ERRORS = {'UNVERIFIED_STORAGE_USER'}
+
+# Errors of the storage account and on-chain lookups, checked again on every cache hit
+LIVE_ERRORS = {'MISSING_STORAGE_TOKEN', 'UNVERIFIED_STORAGE_USER', 'UNVERIFIED_STORAGE_EMAIL', 'DUPLICATE_CONTRIBUTION'}
+
+# Settings that change how the input is parsed, validated, deduplicated or scored
+RESULT_SETTINGS = (
+    'MAX_INPUT_FILE_MB',
+    'MAX_INPUT_TOTAL_MB',
+    'MAX_COMPRESSION_RATIO',
+    'MAX_MEMORY_MB',
+    'COORDINATE_STORAGE',
+    'WRITE_BEHIND',
+    'CELL_RESOLUTION_BITS',
+    'INCREMENTAL_PROOFS',
+    'AUTHENTICITY_SCORING',
+    'SKETCHES_ENABLED',
+    'SKETCH_WINDOW_HOURS',
+    'NEAR_DUPLICATE_JACCARD',
+    'SCHEMA_FAIL_FAST',
+    'SCHEMA_SAMPLE_SIZE',
+    'FAST_SCAN',
+)
+
+
+@lru_cache(maxsize=None)
+def proof_version() -> str:
+    """Version of the proof logic: the scoring version and a digest of the schema files"""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(SCHEMAS_DIR)):
+        digest.update(name.encode() + b'\0')
+        with open(os.path.join(SCHEMAS_DIR, name), 'rb') as f:
+            digest.update(f.read())
+    return f"{SCORING_VERSION}:{digest.hexdigest()[:16]}"
+
+
+def input_digest(input_dir: str) -> str:
+    """
+    Streaming SHA-256 of the files of an input directory, in name order.
+
+    Names and sizes are hashed along with the contents, so moving bytes between files
+    changes the digest.
+
+    Args:
+        input_dir: Directory containing the input files
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(input_dir)):
+        path = os.path.join(input_dir, name)
+        if not os.path.isfile(path):
+            continue
+        digest.update(f"{name}\0{os.path.getsize(path)}\0".encode())
+        with open(path, 'rb') as f:
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def result_cache_key(job_settings: Settings) -> str:
+    """
+    Cache key of a proof: the input digest, the proof version and the job settings that change the result.
+
+    The owner address is part of the key so the result of a file is never handed to another
+    owner. Whether a Google token was given is part of it because a missing token is an error
+    of the result, and so are the RESULT_SETTINGS. The storage account and duplicate checks
+    are not, they are made again for every proof and override the LIVE_ERRORS of a cached result.
+
+    Args:
+        job_settings: Settings of the proof job
+
+    Returns:
+        str: Hex SHA-256 key
+    """
+    parts = [
+        proof_version(),
+        str(job_settings.DLP_ID),
+        str(job_settings.OWNER_ADDRESS or '').lower(),
+        str(bool(job_settings.GOOGLE_TOKEN)),
+        *(f"{name}={getattr(job_settings, name)}" for name in RESULT_SETTINGS),
+        input_digest(job_settings.INPUT_DIR),
+    ]
+    return hashlib.sha256('\0'.join(parts).encode()).hexdigest()
+
+
+def is_cacheable(response: Dict[str, Any]) -> bool:
+    """Whether a proof response can be served again for the same key"""
+    errors = (response.get('attributes') or {}).get('errors') or []
+    return not TRANSIENT_ERRORS.intersection(errors)
+
+
+class DiskResultCache:
+    """
+    Proof responses stored as JSON files in a local directory, with least recently used eviction.
+
+    A hit touches the file, so file modification times order the entries by last use.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        """
+        Args:
+            path: Cache directory, created if missing
+            max_entries: Number of responses kept
+        """
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(path, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached response of a key, None on a miss"""
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'r') as f:
+                response = json.load(f)
+            os.utime(entry_path)
+            return response
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to read cached proof result {key}: {str(e)}")
+            return None
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """Store a response and evict the least recently used entries beyond max_entries"""
+        temp_path = f"{self._entry_path(key)}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(response, f)
+        os.replace(temp_path, self._entry_path(key))
+        self._evict()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def _evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.json'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    continue
+        entries.sort()
+        for _, entry_path in entries[:max(len(entries) - self.max_entries, 0)]:
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
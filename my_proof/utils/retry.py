@@ -0,0 +1,50 @@
+import logging
+import random
+import time
+from typing import Callable, Optional, TypeVar
+
+from my_proof.config import settings
+
+T = TypeVar('T')
+
+def is_transient_http_error(e: Exception) -> bool:
+    """Connection problems, timeouts, rate limiting and server errors are worth retrying"""
+    import requests
+
+    if isinstance(e, requests.HTTPError):
+        return e.response is not None and (e.response.status_code == 429 or e.response.status_code >= 500)
+    return isinstance(e, (requests.ConnectionError, requests.Timeout))
+
+def call_with_retry(
+    fn: Callable[[], T],
+    description: str,
+    is_transient: Callable[[Exception], bool] = lambda e: True,
+    attempts: Optional[int] = None,
+    backoff: Optional[float] = None
+) -> T:
+    """
+    Call a function, retrying transient failures with jittered exponential backoff.
+    
+    Args:
+        fn: The call to make
+        description: Name of the call for log messages
+        is_transient: Whether an exception is worth retrying, others are raised immediately
+        attempts: Total number of attempts, defaults to settings.NETWORK_RETRIES
+        backoff: Delay before the first retry in seconds, doubled on each retry,
+            defaults to settings.NETWORK_BACKOFF
+        
+    Returns:
+        T: The result of the first successful call
+    """
+    attempts = attempts or settings.NETWORK_RETRIES
+    backoff = settings.NETWORK_BACKOFF if backoff is None else backoff
+
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == attempts or not is_transient(e):
+                raise
+            delay = backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            logging.warning(f"{description} failed ({str(e)}), retrying in {delay:.2f}s ({attempt}/{attempts})")
+            time.sleep(delay)
@@ -0,0 +1,85 @@
+"""Coordinate extraction straight from the bytes of a memory-mapped timeline export"""
+import mmap
+import re
+from typing import Optional
+
+import numpy as np
+
+from my_proof.utils.google import CoordinateRuns, unique_coordinates
+from my_proof.utils.timeline import IOS_SCHEMA
+
+SCAN_WINDOW_BYTES = 16 << 20  # Bytes searched at once, extended to the next '}' so no point is cut
+
+_NUMBER = rb'-?\d+(?:\.\d+)?'
+_DEGREE = '°'.encode()
+_ESCAPED_DEGREE = rb'\u00b0'
+_OPTIONAL_DEGREE = rb'(?:' + _DEGREE + rb'|' + re.escape(_ESCAPED_DEGREE) + rb')?'
+
+# Every key the extraction reads, with the value format it expects. A key whose value has
+# another format matches with an empty group, which sends the file to the full parser.
+IOS_POINT_PATTERN = re.compile(rb'(?:"point"|"placeLocation")\s*:\s*(?:"geo:(' + _NUMBER + rb',' + _NUMBER + rb')")?')
+ANDROID_POINT_PATTERN = re.compile(
+    rb'(?:"point"|"latLng")\s*:\s*(?:"(' + _NUMBER + _OPTIONAL_DEGREE + rb',\s*' + _NUMBER + _OPTIONAL_DEGREE + rb')")?'
+)
+
+# Android segments must come first, and end where the next top-level section starts
+ANDROID_SEGMENTS_START = re.compile(rb'\s*\{\s*"semanticSegments"\s*:\s*\[')
+ANDROID_SEGMENTS_END = re.compile(rb'"(?:rawSignals|userLocationProfile)"\s*:')
+
+
+def scan_coordinates(path: str, schema_type: str) -> Optional[np.ndarray]:
+    """
+    Extract the coordinates of a timeline export by scanning its bytes for the point keys.
+
+    The file is memory-mapped and searched with a regex one window at a time, so no segment
+    is decoded and memory stays bounded by the points of one window. The keys are those read
+    by segment_points: `point` and `placeLocation` for iOS, `point` and `latLng` within the
+    segments for Android.
+
+    Args:
+        path: Path of a plain JSON export
+        schema_type: The schema type ('google-timeline-ios.json' or 'google-timeline-android.json')
+
+    Returns:
+        Optional[np.ndarray]: (N, 2) float64 array of unique (latitude, longitude) rows, None if
+        the file doesn't look like a regular export and needs the full parser
+    """
+    with open(path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            return None
+
+    with mapped:
+        if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+        if schema_type == IOS_SCHEMA:
+            pattern, start, end = IOS_POINT_PATTERN, 0, len(mapped)
+        else:
+            segments_start = ANDROID_SEGMENTS_START.match(mapped)
+            if segments_start is None:
+                return None
+            segments_end = ANDROID_SEGMENTS_END.search(mapped, segments_start.end())
+            pattern, start, end = ANDROID_POINT_PATTERN, segments_start.end(), segments_end.start() if segments_end else len(mapped)
+
+        runs = CoordinateRuns()
+        while start < end:
+            window_end = mapped.find(b'}', min(start + SCAN_WINDOW_BYTES, end), end)
+            window_end = end if window_end < 0 else window_end + 1
+            points = pattern.findall(mapped, start, window_end)
+            start = window_end
+            if not points:
+                continue
+            if b'' in points:
+                return None
+            text = b','.join(points)
+            if schema_type != IOS_SCHEMA:
+                text = text.replace(_DEGREE, b'').replace(_ESCAPED_DEGREE, b'')
+            coordinates = np.fromstring(text, dtype=np.float64, sep=',')
+            if coordinates.size != 2 * len(points):
+                return None
+            runs.add(unique_coordinates(coordinates.reshape(-1, 2)))
+
+    return runs.result()
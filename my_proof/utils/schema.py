@@ -1,40 +1,186 @@
 import json
 import os
 import logging
-from typing import Dict, Any, Tuple
+import random
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 
-import jsonschema
+from my_proof.config import settings
+from my_proof.utils.timeline import TimelineReader, ANDROID_SCHEMA, IOS_SCHEMA, SEGMENTS_KEY
+
+if TYPE_CHECKING:
+    import jsonschema
+
+MAX_REPORTED_ERRORS = 20  # Errors kept when not failing fast
+
+
+@lru_cache(maxsize=None)
+def load_schema(schema_type: str) -> Dict[str, Any]:
+    """Load a timeline schema from the schemas directory, once per process"""
+    schema_path = os.path.join(os.path.dirname(__file__), '..', 'schemas', schema_type)
+    with open(schema_path, 'r') as f:
+        return json.load(f)
+
+@lru_cache(maxsize=None)
+def get_validator(schema_type: str, key: Optional[str] = None, item: bool = False) -> 'jsonschema.protocols.Validator':
+    """
+    Get the compiled validator for a schema or one of its sub-schemas, once per process.
+
+    Args:
+        schema_type: The schema file name
+        key: Top-level property whose sub-schema to use, None for the whole document
+        item: Use the array item sub-schema instead
+
+    Returns:
+        jsonschema.protocols.Validator: Validator for the requested (sub-)schema
+    """
+    import jsonschema
+
+    schema = load_schema(schema_type)
+    validator_class = jsonschema.validators.validator_for(schema)
+    if key is None and not item:
+        validator_class.check_schema(schema)
+
+    subschema = schema if key is None else schema.get('properties', {}).get(key, {})
+    if item:
+        subschema = subschema.get('items', {})
+    return validator_class(subschema)
+
+def warm_validators() -> None:
+    """Compile the validators of both schemas and of their segment items ahead of the first file"""
+    for schema_type, segments_key in ((IOS_SCHEMA, None), (ANDROID_SCHEMA, SEGMENTS_KEY)):
+        get_validator(schema_type)
+        get_validator(schema_type, segments_key, True)
 
 def validate_schema(input_data: Dict[str, Any]) -> Tuple[str, bool]:
     """
     Validate input data against the google-timeline schema using jsonschema.
-    
+
     Args:
         input_data: The JSON data to validate
-        
+
     Returns:
         tuple[str, bool]: A tuple containing (schema_type, is_valid)
         where schema_type is either 'ios' or 'android'
         and is_valid indicates if the schema validation passed
     """
+    import jsonschema
+
     try:
         schema_type = 'google-timeline-android.json'
         # iPhones only give the semanticSegments array
         if isinstance(input_data, list):
             schema_type = 'google-timeline-ios.json'
-        
-        # Load the schema
-        schema_path = os.path.join(os.path.dirname(__file__), '..', 'schemas', schema_type)
-        with open(schema_path, 'r') as f:
-            schema = json.load(f)
-            
-        # Validate against schema
-        jsonschema.validate(instance=input_data, schema=schema)
+
+        # Validate against the compiled schema
+        get_validator(schema_type).validate(input_data)
         return schema_type, True
-        
+
     except jsonschema.exceptions.ValidationError as e:
         logging.error(f"Schema validation error: {str(e)}")
         return schema_type, False
     except Exception as e:
         logging.error(f"Schema validation failed: {str(e)}")
         return schema_type, False
+
+
+class StreamValidator:
+    """
+    Validates a streamed timeline export value by value.
+
+    Every event from a TimelineReader is checked against the matching compiled sub-schema (the
+    array item schema for streamed array elements), so the full document never has to be held in
+    memory. In fail-fast mode validation stops at the first error. In sampled mode only a uniform
+    random sample of `sample_size` elements per array is validated, chosen by reservoir sampling
+    so the number of elements does not need to be known up front.
+    """
+
+    def __init__(self, schema_type: str, fail_fast: Optional[bool] = None, sample_size: Optional[int] = None):
+        self.schema_type = schema_type
+        self.fail_fast = settings.SCHEMA_FAIL_FAST if fail_fast is None else fail_fast
+        self.sample_size = settings.SCHEMA_SAMPLE_SIZE if sample_size is None else sample_size
+        self.errors: List[str] = []
+        self._seen: Dict[Optional[str], int] = {}
+        self._samples: Dict[Optional[str], List[Any]] = {}
+        self._random = random.Random()
+        get_validator(schema_type)  # Checks the schema itself once
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    def validate(self, event: str, key: Optional[str], value: Any) -> bool:
+        """
+        Validate a single reader event.
+
+        Args:
+            event: 'item' for an element of a streamed array, 'value' for a complete value
+            key: Top-level object key the value belongs to, None for the top level
+            value: The decoded JSON value
+
+        Returns:
+            bool: False if validation should stop (fail-fast mode and the value is invalid)
+        """
+        if event == 'item' and self.sample_size:
+            self._sample(key, value)
+            return True
+        self._check(get_validator(self.schema_type, key, event == 'item'), value)
+        return not (self.fail_fast and self.errors)
+
+    def finish(self, reader: TimelineReader) -> bool:
+        """
+        Validate the sampled elements and the document-level constraints once all events are read.
+
+        Args:
+            reader: The reader whose events were validated
+
+        Returns:
+            bool: True if the document matches the schema
+        """
+        for key, samples in self._samples.items():
+            validator = get_validator(self.schema_type, key, True)
+            for value in samples:
+                if not self._check(validator, value) and self.fail_fast:
+                    return False
+        self._samples = {}
+
+        if self.schema_type != IOS_SCHEMA:
+            # Streamed arrays were only checked element by element, so confirm they may be arrays
+            for key in reader.array_keys:
+                self._check(get_validator(self.schema_type, key), [])
+            missing = set(load_schema(self.schema_type).get('required', [])) - set(reader.keys)
+            if missing:
+                self._record(f"Missing required properties: {sorted(missing)}")
+        return self.valid
+
+    def _sample(self, key: Optional[str], value: Any) -> None:
+        seen = self._seen.get(key, 0)
+        self._seen[key] = seen + 1
+        samples = self._samples.setdefault(key, [])
+        if seen < self.sample_size:
+            samples.append(value)
+        else:
+            slot = self._random.randrange(seen + 1)
+            if slot < self.sample_size:
+                samples[slot] = value
+
+    def _check(self, validator: 'jsonschema.protocols.Validator', value: Any) -> bool:
+        if self.fail_fast:
+            # Only compute the first error rather than every error in the value
+            error = next(validator.iter_errors(value), None)
+            if error is not None:
+                self._record(error.message)
+            return error is None
+        valid = True
+        for error in validator.iter_errors(value):
+            self._record(error.message)
+            valid = False
+        return valid
+
+    def _record(self, message: str) -> None:
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            logging.error(f"Schema validation error: {message}")
+            self.errors.append(message)
+        elif len(self.errors) == MAX_REPORTED_ERRORS:
+            logging.error("Too many schema validation errors, not reporting any more")
+            self.errors.append("...")
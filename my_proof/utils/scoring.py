@@ -1,8 +1,13 @@
 import math
 
+SCORING_VERSION = 3  # Bump whenever a change to the proof logic changes results, invalidating cached results
 MIN_COORDINATES = 100  # Minimum required coordinates
 MAX_QUALITY_COORDINATES = 100000  # Number of coordinates for max score
 MIN_QUALITY_SCORE = 0.01  # Score for minimum coordinates
+MIN_AUTHENTICITY_INTERVALS = 100  # Moves needed before a track can lose authenticity
+MAX_TELEPORT_RATIO = 0.05  # Share of teleporting moves at which authenticity reaches 0
+MAX_DUPLICATE_TIMESTAMP_RATIO = 0.05  # Share of conflicting equal timestamps at which authenticity reaches 0
+REGULAR_INTERVAL_SHARE = 0.95  # Share of identical sampling intervals above which a track looks generated
 
 def calculate_quality_score(unique_coordinates: int) -> float:
     """
@@ -27,6 +32,37 @@ def calculate_quality_score(unique_coordinates: int) -> float:
     
     return min(1.0, max(0.0, quality_score))
 
+def calculate_authenticity_score(
+    intervals: int,
+    teleport_ratio: float,
+    duplicate_timestamp_ratio: float,
+    regular_interval_share: float
+) -> float:
+    """
+    Calculate the authenticity score of a track from its movement statistics.
+    
+    Each sign of a fabricated or edited track scales the score down: teleporting moves and
+    points at the same time in different places up to their maximum ratio, and sampling
+    intervals that are too regular beyond REGULAR_INTERVAL_SHARE. Tracks too short to judge
+    keep full authenticity.
+    
+    Args:
+        intervals: Number of moves between consecutive points
+        teleport_ratio: Share of moves faster than any vehicle
+        duplicate_timestamp_ratio: Share of moves with no time between distinct places
+        regular_interval_share: Share of sampling intervals equal to the most common one
+        
+    Returns:
+        float: Authenticity score between 0 and 1
+    """
+    if intervals < MIN_AUTHENTICITY_INTERVALS:
+        return 1.0
+
+    teleport_factor = 1.0 - min(1.0, teleport_ratio / MAX_TELEPORT_RATIO)
+    duplicate_factor = 1.0 - min(1.0, duplicate_timestamp_ratio / MAX_DUPLICATE_TIMESTAMP_RATIO)
+    regularity_factor = 1.0 - max(0.0, (regular_interval_share - REGULAR_INTERVAL_SHARE) / (1.0 - REGULAR_INTERVAL_SHARE))
+    return min(1.0, max(0.0, teleport_factor * duplicate_factor * regularity_factor))
+
 def test_scores():
     """Print quality scores for different coordinate counts."""
     test_values = [100, 1000, 5000, 10000, 50000, 100000, 1000000]
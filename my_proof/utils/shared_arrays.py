@@ -0,0 +1,49 @@
+"""NumPy arrays handed between processes through shared memory instead of a pickled copy"""
+from multiprocessing import shared_memory
+from typing import Tuple
+
+import numpy as np
+
+# Name, shape and dtype of an array in shared memory, small enough to send through a pipe
+SharedArray = Tuple[str, Tuple[int, ...], str]
+
+
+def share_array(array: np.ndarray) -> SharedArray:
+    """
+    Copy an array into a new shared memory block.
+
+    The block outlives this process's handle. Whoever receives the handle owns the block
+    and must free it with `take_array`.
+
+    Args:
+        array: Array to share
+
+    Returns:
+        SharedArray: Handle of the block
+    """
+    # Zero-sized blocks aren't allowed
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    try:
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        return block.name, array.shape, array.dtype.str
+    finally:
+        block.close()
+
+
+def take_array(handle: SharedArray) -> np.ndarray:
+    """
+    Copy an array out of shared memory and free the block.
+
+    Args:
+        handle: Handle returned by `share_array`
+
+    Returns:
+        np.ndarray: The array
+    """
+    name, shape, dtype = handle
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return np.ndarray(shape, dtype=dtype, buffer=block.buf).copy()
+    finally:
+        block.close()
+        block.unlink()
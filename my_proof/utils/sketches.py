@@ -0,0 +1,178 @@
+"""HyperLogLog and MinHash sketches of the coordinate cells of a contribution"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+from my_proof.config import settings
+from my_proof.utils.cells import cell_keys, mix_keys
+
+HLL_PRECISION = 14  # 2^14 registers, about 0.8% standard error
+MINHASH_BINS = 256  # One-permutation MinHash bins, about 6% standard error of the Jaccard index
+MINHASH_BAND_ROWS = 8  # Bins per LSH band, pairs above a Jaccard index of about 0.65 share a band
+REGION_BITS = 3  # Bits per axis of the regions of the aggregates, 64 regions of 22.5 x 45 degrees
+SKETCH_CHUNK_ROWS = 1 << 20  # Coordinates hashed at once
+
+_MINHASH_SALT = np.uint64(0x5851F42D4C957F2D)  # Makes the MinHash values independent of the HLL hashes
+_EMPTY_BIN = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+class HyperLogLog:
+    """
+    Cardinality sketch of a set of cell keys.
+
+    A key's hash picks one of 2^precision registers with its top bits, and the register keeps
+    the highest rank (position of the first set bit) of the next 32 bits seen. Registers of two
+    sketches merge with a maximum, giving the sketch of the union.
+    """
+
+    def __init__(self, registers: np.ndarray = None, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'HyperLogLog':
+        registers = np.frombuffer(data, dtype=np.uint8).copy()
+        return cls(registers, int(len(registers)).bit_length() - 1)
+
+    def to_bytes(self) -> bytes:
+        return self.registers.tobytes()
+
+    def add(self, keys: np.ndarray) -> None:
+        """Add an array of int64 cell keys"""
+        if len(keys) == 0:
+            return
+        hashed = mix_keys(np.asarray(keys, dtype=np.int64))
+        index = (hashed >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = ((hashed >> np.uint64(32 - self.precision)) & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        # frexp is exact below 2^53: rest is in [2^(e-1), 2^e), so it has 32 - e leading zeros
+        rank = np.where(rest > 0, 33 - np.frexp(rest)[1], 33).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """Sketch of the union of both sets"""
+        return HyperLogLog(np.maximum(self.registers, other.registers), self.precision)
+
+    def estimate(self) -> float:
+        """Estimated number of distinct keys"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small sets
+            estimate = m * np.log(m / zeros)
+        return float(estimate)
+
+
+class MinHash:
+    """
+    One-permutation MinHash of a set of cell keys, for Jaccard similarity.
+
+    Each key's hash picks a bin with its top bits and the bin keeps the smallest hash seen, so
+    a whole array is sketched with one hash per key. Bins merge with a minimum.
+    """
+
+    def __init__(self, mins: np.ndarray = None, bins: int = MINHASH_BINS):
+        self.mins = np.full(bins, _EMPTY_BIN, dtype=np.uint64) if mins is None else mins
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'MinHash':
+        return cls(np.frombuffer(data, dtype='<u8').astype(np.uint64))
+
+    def to_bytes(self) -> bytes:
+        return self.mins.astype('<u8').tobytes()
+
+    def add(self, keys: np.ndarray) -> None:
+        """Add an array of int64 cell keys"""
+        if len(keys) == 0:
+            return
+        hashed = mix_keys(np.asarray(keys, dtype=np.int64).astype(np.uint64) ^ _MINHASH_SALT)
+        bins = (hashed >> np.uint64(64 - (len(self.mins).bit_length() - 1))).astype(np.int64)
+        np.minimum.at(self.mins, bins, hashed)
+
+    def jaccard(self, other: 'MinHash') -> float:
+        """Estimated Jaccard index of both sets, from the bins that are filled in either"""
+        filled = (self.mins != _EMPTY_BIN) | (other.mins != _EMPTY_BIN)
+        if not filled.any():
+            return 0.0
+        return float(np.count_nonzero((self.mins == other.mins) & filled)) / float(np.count_nonzero(filled))
+
+    def band_hashes(self, rows: int = MINHASH_BAND_ROWS) -> np.ndarray:
+        """
+        LSH band hashes: one int64 hash per band of `rows` bins, leaving out bands with an
+        empty bin, which every small set would share.
+
+        Returns:
+            np.ndarray: int64 hashes, equal between two sketches only if a whole band is
+        """
+        bands = self.mins.reshape(-1, rows)
+        hashed = np.arange(len(bands), dtype=np.uint64)
+        for column in bands.T:
+            hashed = mix_keys(hashed ^ column)
+        return hashed[(bands != _EMPTY_BIN).all(axis=1)].astype(np.int64)
+
+
+class ContributionSketch:
+    """The HyperLogLog and MinHash of a contribution's cells, plus a HyperLogLog per region"""
+
+    def __init__(self):
+        self.hll = HyperLogLog()
+        self.minhash = MinHash()
+        self.regions: Dict[int, HyperLogLog] = {}
+
+    @classmethod
+    def from_coordinates(cls, coordinates: np.ndarray) -> 'ContributionSketch':
+        """
+        Sketch coordinates, a chunk at a time so memory-mapped coordinates stay on disk.
+
+        Args:
+            coordinates: (N, 2) array of (latitude, longitude) rows
+
+        Returns:
+            ContributionSketch: Sketches of the coordinates' cells
+        """
+        sketch = cls()
+        for start in range(0, len(coordinates), SKETCH_CHUNK_ROWS):
+            sketch.add(cell_keys(np.asarray(coordinates[start:start + SKETCH_CHUNK_ROWS])))
+        return sketch
+
+    def add(self, cells: np.ndarray) -> None:
+        """Add an array of int64 cell keys"""
+        self.hll.add(cells)
+        self.minhash.add(cells)
+        regions = region_keys(cells)
+        order = np.argsort(regions, kind='stable')
+        region_ids, starts = np.unique(regions[order], return_index=True)
+        for region, region_cells in zip(region_ids.tolist(), np.split(cells[order], starts[1:])):
+            self.regions.setdefault(region, HyperLogLog()).add(region_cells)
+
+
+def region_keys(cells: np.ndarray) -> np.ndarray:
+    """
+    Region of each cell key: the top REGION_BITS bits per axis of the Z-order key.
+
+    Args:
+        cells: (N,) int64 cell keys
+
+    Returns:
+        np.ndarray: (N,) int64 region numbers in [0, 4^REGION_BITS)
+    """
+    return np.asarray(cells, dtype=np.int64) >> (2 * (settings.CELL_RESOLUTION_BITS - REGION_BITS))
+
+
+def estimate_overlap(part: HyperLogLog, whole: HyperLogLog) -> Tuple[float, float]:
+    """
+    Estimate how many keys of one set are in another, by inclusion-exclusion of the cardinalities.
+
+    The error grows with the size of `whole`, so small sets against large aggregates are rough.
+
+    Args:
+        part: Sketch of the set to check
+        whole: Sketch of the set it is checked against
+
+    Returns:
+        Tuple[float, float]: (estimated keys of `part` in `whole`, estimated keys of `part`)
+    """
+    part_count = part.estimate()
+    shared = part_count + whole.estimate() - part.merge(whole).estimate()
+    return min(max(shared, 0.0), part_count), part_count
@@ -0,0 +1,91 @@
+"""Startup-time profile of the proof container"""
+import importlib
+import sys
+import time
+from typing import Callable, List, Tuple
+
+# Heavy dependencies in the order the proof loads them. Modules imported by an earlier
+# entry are already loaded, so each row shows the time that entry adds on top.
+STARTUP_MODULES = [
+    'my_proof.config',
+    'numpy',
+    'jsonschema',
+    'my_proof.proof',
+    'requests',
+    'sqlalchemy.orm',
+    'my_proof.utils.db',
+    'web3',
+    'my_proof.utils.blockchain',
+]
+
+
+def _init_validators() -> None:
+    from my_proof.utils.schema import warm_validators
+
+    warm_validators()
+
+
+def _init_database() -> None:
+    from my_proof.utils.db import db
+
+    db.init()
+
+
+def _init_blockchain_client() -> None:
+    from my_proof.utils.blockchain import BlockchainClient
+
+    BlockchainClient()
+
+
+STARTUP_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ('schema validators', _init_validators),
+    ('database', _init_database),
+    ('blockchain client', _init_blockchain_client),
+]
+
+
+def profile_startup() -> List[Tuple[str, str, float, str]]:
+    """
+    Time the imports and initialization steps of a proof run.
+
+    Has to run in a fresh interpreter to measure cold imports. A failing step (for example
+    an unreachable database) is reported with its error instead of stopping the profile.
+
+    Returns:
+        List[Tuple[str, str, float, str]]: (kind, name, milliseconds, note) per module and step
+    """
+    results = []
+    for name in STARTUP_MODULES:
+        loaded = len(sys.modules)
+        start = time.perf_counter()
+        importlib.import_module(name)
+        elapsed = (time.perf_counter() - start) * 1000
+        results.append(('import', name, elapsed, f"+{len(sys.modules) - loaded} modules"))
+
+    for name, step in STARTUP_STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+            note = ''
+        except Exception as e:
+            note = f"failed: {str(e).splitlines()[0] if str(e) else type(e).__name__}"
+        results.append(('init', name, (time.perf_counter() - start) * 1000, note))
+    return results
+
+
+def print_startup_profile() -> None:
+    """Print the startup profile as a table."""
+    results = profile_startup()
+
+    print("\nStartup Profile:")
+    print("-" * 78)
+    print(f"{'Kind':<6} | {'Name':<26} | {'ms':>8} | Note")
+    print("-" * 78)
+    for kind, name, elapsed, note in results:
+        print(f"{kind:<6} | {name:<26} | {elapsed:>8.1f} | {note[:40]}")
+    print("-" * 78)
+    print(f"{'Total':<6} | {'':<26} | {sum(row[2] for row in results):>8.1f} |")
+
+# python -m my_proof.utils.startup
+if __name__ == "__main__":
+    print_startup_profile()
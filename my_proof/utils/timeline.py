@@ -0,0 +1,149 @@
+"""Incremental reader for Google Timeline exports"""
+import json
+import re
+from typing import Any, IO, Iterator, List, Optional, Tuple
+
+IOS_SCHEMA = 'google-timeline-ios.json'
+ANDROID_SCHEMA = 'google-timeline-android.json'
+SEGMENTS_KEY = 'semanticSegments'
+
+READ_CHUNK_SIZE = 1 << 20  # Characters read from the file per refill
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+# (event, key, value) where event is 'item' for an element of a streamed array and
+# 'value' for a complete value. key is the top-level object key, or None at the top level.
+TimelineEvent = Tuple[str, Optional[str], Any]
+
+
+class TimelineReader:
+    """
+    Streams a Google Timeline export one value at a time.
+
+    iOS exports are a top-level array of segments, Android exports are an object with the
+    segments under `semanticSegments`. Arrays at the top level (and directly under the top-level
+    object) are yielded element by element, so peak memory is bounded by the largest single
+    element rather than by the size of the file.
+    """
+
+    def __init__(self, f: IO[str], chunk_size: int = READ_CHUNK_SIZE):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self.keys: List[str] = []
+        self.array_keys: List[str] = []
+        # iPhones only give the semanticSegments array
+        self.schema_type = IOS_SCHEMA if self._peek() == '[' else ANDROID_SCHEMA
+
+    def events(self) -> Iterator[TimelineEvent]:
+        """
+        Parse the export incrementally.
+
+        Yields:
+            TimelineEvent: ('item', key, element) for each element of a streamed array and
+            ('value', key, value) for any other value
+        """
+        first = self._peek()
+        if first == '[':
+            yield from self._array_items(None)
+        elif first == '{':
+            self._pos += 1
+            if self._peek() == '}':
+                self._pos += 1
+            else:
+                while True:
+                    key = self._decode_value()
+                    if not isinstance(key, str):
+                        raise ValueError(f"Expected object key at offset {self._pos}")
+                    self._expect(':')
+                    self.keys.append(key)
+                    if self._peek() == '[':
+                        self.array_keys.append(key)
+                        yield from self._array_items(key)
+                    else:
+                        yield 'value', key, self._decode_value()
+                    if self._next_separator('}'):
+                        break
+        else:
+            yield 'value', None, self._decode_value()
+
+        if self._peek():
+            raise ValueError(f"Extra data after JSON document at offset {self._pos}")
+
+    def segments(self) -> Iterator[dict]:
+        """Yield only the timeline segments of the export, skipping everything else."""
+        for event, key, value in self.events():
+            if is_segment_event(event, key):
+                yield value
+
+    def _array_items(self, key: Optional[str]) -> Iterator[TimelineEvent]:
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield 'item', key, self._decode_value()
+            if self._next_separator(']'):
+                return
+
+    def _fill(self, size: int) -> bool:
+        """Drop the consumed part of the buffer and read up to `size` more characters."""
+        if self._eof:
+            return False
+        chunk = self._f.read(size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character, or '' at the end of the input."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill(self._chunk_size):
+                return ''
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self._pos}")
+        self._pos += 1
+
+    def _next_separator(self, closing: str) -> bool:
+        """Consume a ',' or the closing bracket. Returns True if the container was closed."""
+        char = self._peek()
+        if char == closing:
+            self._pos += 1
+            return True
+        self._expect(',')
+        return False
+
+    def _decode_value(self) -> Any:
+        """Decode one JSON value, reading more of the file until it is complete."""
+        self._peek()
+        read_size = self._chunk_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+                # A number at the very end of the buffer may continue in the next chunk
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            if not self._fill(read_size):
+                continue
+            # Grow reads geometrically so very large values are not re-scanned once per chunk
+            read_size = max(read_size, len(self._buf))
+
+
+def is_segment_event(event: str, key: Optional[str]) -> bool:
+    """Whether a reader event carries a timeline segment."""
+    return event == 'item' and key in (None, SEGMENTS_KEY)
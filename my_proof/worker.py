@@ -0,0 +1,240 @@
+"""Long-running proof worker that takes its jobs from the proof_jobs table"""
+import datetime
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import func, select, update
+
+from my_proof.batch import init_worker, load_manifest, run_job
+from my_proof.config import settings
+from my_proof.models.batch import ProofJob
+from my_proof.models.db import ProofJobs
+from my_proof.utils.bloom import refresh_coordinate_filter
+from my_proof.utils.db import db
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.UTC)
+
+
+def enqueue_jobs(jobs: List[ProofJob]) -> List[int]:
+    """
+    Add jobs to the queue.
+
+    Args:
+        jobs: Jobs to run
+
+    Returns:
+        List[int]: IDs of the queued jobs
+    """
+    with db.session() as session:
+        rows = [ProofJobs(status='pending', job=job.model_dump(), attempts=0, created_at=_now()) for job in jobs]
+        session.add_all(rows)
+        session.flush()
+        return [row.id for row in rows]
+
+
+def claim_job() -> Optional[ProofJobs]:
+    """
+    Claim the oldest pending job.
+
+    SKIP LOCKED lets any number of workers poll the same table without claiming a job twice
+    or waiting on each other's row locks.
+
+    Returns:
+        Optional[ProofJobs]: The claimed job, now marked running, None if the queue is empty
+    """
+    with db.session() as session:
+        row = session.execute(
+            select(ProofJobs)
+            .where(ProofJobs.status == 'pending')
+            .order_by(ProofJobs.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if row is None:
+            return None
+        row.status = 'running'
+        row.attempts += 1
+        row.started_at = _now()
+        row.heartbeat_at = row.started_at
+        session.flush()
+        session.expunge(row)
+        return row
+
+
+def finish_job(job_id: int, result: Dict) -> None:
+    """Record the result of a job, marking it done or failed"""
+    with db.session() as session:
+        session.execute(
+            update(ProofJobs)
+            .where(ProofJobs.id == job_id)
+            .values(
+                status='failed' if 'error' in result else 'done',
+                result=result,
+                error=result.get('error'),
+                finished_at=_now(),
+            )
+        )
+
+
+def renew_jobs(job_ids: List[int]) -> None:
+    """Record a heartbeat for running jobs, so they aren't queued again while they run"""
+    if not job_ids:
+        return
+    with db.session() as session:
+        session.execute(
+            update(ProofJobs)
+            .where(ProofJobs.id.in_(job_ids) & (ProofJobs.status == 'running'))
+            .values(heartbeat_at=_now())
+        )
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Queue again the running jobs whose worker died, or fail them once they ran out of attempts.
+
+    A job is abandoned once its worker hasn't renewed it for WORKER_JOB_TIMEOUT seconds, so a
+    long job of a live worker is never run twice. Jobs claimed before heartbeats were recorded
+    fall back to their start time.
+
+    Returns:
+        int: Number of jobs queued again
+    """
+    cutoff = _now() - datetime.timedelta(seconds=settings.WORKER_JOB_TIMEOUT)
+    stale = (ProofJobs.status == 'running') & (func.coalesce(ProofJobs.heartbeat_at, ProofJobs.started_at) < cutoff)
+    with db.session() as session:
+        session.execute(
+            update(ProofJobs)
+            .where(stale & (ProofJobs.attempts >= settings.WORKER_MAX_ATTEMPTS))
+            .values(status='failed', error='Job timed out', finished_at=_now())
+        )
+        requeued = session.execute(
+            update(ProofJobs).where(stale).values(status='pending', started_at=None, heartbeat_at=None)
+        ).rowcount
+    if requeued:
+        logging.warning(f"Queued {requeued} abandoned jobs again")
+    return requeued
+
+
+def release_job(job_id: int) -> None:
+    """Put a claimed job back in the queue without counting the attempt"""
+    with db.session() as session:
+        session.execute(
+            update(ProofJobs)
+            .where(ProofJobs.id == job_id)
+            .values(status='pending', started_at=None, heartbeat_at=None, attempts=ProofJobs.attempts - 1)
+        )
+
+
+def run_worker(concurrency: Optional[int] = None, stop_event: Optional[threading.Event] = None) -> None:
+    """
+    Run proof jobs from the queue until stopped.
+
+    Jobs run in a pool of long-lived processes, each keeping its blockchain client, compiled
+    validators, database engine and caches warm across jobs. A job is only claimed when a
+    process is free, so the queue is the backpressure and other workers can take the rest.
+
+    Args:
+        concurrency: Jobs run at once, defaults to settings.WORKER_CONCURRENCY or the CPU count
+        stop_event: Stops claiming jobs once set, running jobs are finished first
+    """
+    concurrency = concurrency or settings.WORKER_CONCURRENCY or os.cpu_count()
+    stop_event = stop_event or threading.Event()
+    logging.info(f"Proof worker started with {concurrency} processes")
+
+    requeue_stale_jobs()
+    # Built here rather than by the first proof, since a missing snapshot reads every stored cell
+    refresh_coordinate_filter(db.engine)
+    while True:
+        # Spawned rather than forked, so no process inherits the connections of this one
+        with ProcessPoolExecutor(max_workers=concurrency, mp_context=get_context('spawn'), initializer=init_worker) as executor:
+            pool_broken = _serve(executor, concurrency, stop_event)
+        if not pool_broken:
+            break
+        logging.error("A worker process died, restarting the pool")
+
+    logging.info("Proof worker stopped")
+
+
+def _serve(executor: ProcessPoolExecutor, concurrency: int, stop_event: threading.Event) -> bool:
+    """Claim and run jobs on a pool until stopped. Returns True if the pool broke."""
+    running: Dict[Future, int] = {}
+    last_requeue = _now()
+    last_heartbeat = _now()
+    pool_broken = False
+
+    while running or not (stop_event.is_set() or pool_broken):
+        while not (stop_event.is_set() or pool_broken) and len(running) < concurrency:
+            row = claim_job()
+            if row is None:
+                break
+            logging.info(f"Running job {row.id} (attempt {row.attempts})")
+            try:
+                job = ProofJob(**row.job)
+            except ValidationError as e:
+                # Queued before owner addresses were required
+                finish_job(row.id, {'input_dir': row.job.get('input_dir'), 'error': f"Invalid job: {e}"})
+                continue
+            try:
+                running[executor.submit(run_job, job)] = row.id
+            except BrokenProcessPool:
+                release_job(row.id)
+                pool_broken = True
+
+        if running:
+            done, _ = wait(running, timeout=settings.WORKER_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                job_id = running.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    # A process died, e.g. out of memory, taking the pool down with it
+                    result = {'input_dir': None, 'error': f"Worker process failed: {e}"}
+                    pool_broken = True
+                finish_job(job_id, result)
+                logging.info(f"Finished job {job_id}: {'failed' if 'error' in result else 'done'}")
+        elif not pool_broken:
+            stop_event.wait(settings.WORKER_POLL_INTERVAL)
+
+        if (_now() - last_heartbeat).total_seconds() > settings.WORKER_JOB_TIMEOUT / 10:
+            renew_jobs(list(running.values()))
+            last_heartbeat = _now()
+
+        if (_now() - last_requeue).total_seconds() > settings.WORKER_JOB_TIMEOUT / 10:
+            requeue_stale_jobs()
+            last_requeue = _now()
+
+    return pool_broken
+
+
+def main() -> None:
+    if len(sys.argv) == 3 and sys.argv[1] == 'enqueue':
+        job_ids = enqueue_jobs(load_manifest(sys.argv[2]))
+        print(json.dumps(job_ids))
+        return
+    if len(sys.argv) != 1:
+        print("Usage: python -m my_proof.worker [enqueue <manifest.jsonl>]")
+        sys.exit(2)
+
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stop_event.set())
+    run_worker(stop_event=stop_event)
+
+
+# python -m my_proof.worker                          run jobs from the queue
+# python -m my_proof.worker enqueue manifest.jsonl   queue the jobs of a manifest
+if __name__ == "__main__":
+    main()
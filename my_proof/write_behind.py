@@ -0,0 +1,85 @@
+"""Background drainer of the coordinate_writes queue filled by proofs made with WRITE_BEHIND"""
+import logging
+import signal
+import sys
+import threading
+from typing import Optional
+
+from my_proof.config import settings
+from my_proof.utils.db import db
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+
+def drain_once() -> Optional[int]:
+    """
+    Insert one queued contribution's coordinates.
+
+    Returns:
+        Optional[int]: Number of coordinates inserted, 0 if the insert failed, None if no
+        queued write is left to drain
+    """
+    with db.session() as session:
+        drained = db.drain_coordinate_write(session)
+    if drained is None:
+        return None
+    write_id, inserted, skipped, error = drained
+    if error is not None:
+        # Counted in coordinate_write_failures, the next poll drains the other writes first
+        logging.error(f"Coordinate write {write_id} failed, it is retried up to {settings.WRITE_BEHIND_MAX_ATTEMPTS} times")
+        return 0
+    logging.info(f"Drained coordinate write {write_id}: {inserted} inserted, {skipped} already stored")
+    return inserted
+
+
+def run_drainer(stop_event: Optional[threading.Event] = None, until_empty: bool = False) -> int:
+    """
+    Insert queued coordinates, oldest first, until stopped.
+
+    Each queued contribution is inserted and removed from the queue in one transaction, so
+    the drainer can be stopped at any time and any number of drainers can run at once. A
+    write whose insert fails is retried after the others, up to WRITE_BEHIND_MAX_ATTEMPTS times.
+
+    Args:
+        stop_event: Stops draining once set, the running insert is finished first
+        until_empty: Return once no queued write is left to drain instead of waiting for more writes,
+            or once the database can't be reached
+
+    Returns:
+        int: Number of coordinates inserted
+    """
+    stop_event = stop_event or threading.Event()
+    logging.info("Write-behind drainer started")
+    total = 0
+    while not stop_event.is_set():
+        try:
+            inserted = drain_once()
+        except Exception as e:
+            # No write could be claimed, e.g. the database is unreachable
+            logging.error(f"Failed to drain coordinate writes: {str(e)}")
+            inserted = None
+        if inserted is None:
+            if until_empty:
+                break
+            stop_event.wait(settings.WRITE_BEHIND_POLL_INTERVAL)
+        else:
+            total += inserted
+    logging.info(f"Write-behind drainer stopped, {total} coordinates inserted")
+    return total
+
+
+def main() -> None:
+    if sys.argv[1:] not in ([], ['--until-empty']):
+        print("Usage: python -m my_proof.write_behind [--until-empty]")
+        sys.exit(2)
+
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stop_event.set())
+    run_drainer(stop_event, until_empty=sys.argv[1:] == ['--until-empty'])
+
+
+# python -m my_proof.write_behind                 drain the queue continuously
+# python -m my_proof.write_behind --until-empty   drain what is queued, then exit
+if __name__ == "__main__":
+    main()
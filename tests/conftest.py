@@ -0,0 +1,109 @@
+import os
+import random
+import re
+
+import pytest
+
+# Settings are read on import and require a database URL, the tests that need a database are
+# skipped unless TEST_POSTGRES_URL is set
+os.environ.setdefault('POSTGRES_URL', os.environ.get('TEST_POSTGRES_URL', 'postgresql://localhost/knowhere_test'))
+
+BASELINE_POINT_PATTERN = r'geo:(-?\d+\.\d+),(-?\d+\.\d+)'
+
+
+def baseline_extract_coordinates(timeline_data, schema_type):
+    """The coordinate extraction before the bulk parsing, one regex or float() call per point"""
+    coordinates = set()
+    if schema_type == 'google-timeline-ios.json':
+        for entry in timeline_data:
+            for path in entry.get('timelinePath', []):
+                if 'point' in path:
+                    match = re.match(BASELINE_POINT_PATTERN, path['point'])
+                    if match:
+                        coordinates.add((float(match.group(1)), float(match.group(2))))
+            if 'visit' in entry and 'topCandidate' in entry['visit']:
+                place_loc = entry['visit']['topCandidate'].get('placeLocation')
+                if place_loc:
+                    match = re.match(BASELINE_POINT_PATTERN, place_loc)
+                    if match:
+                        coordinates.add((float(match.group(1)), float(match.group(2))))
+    else:
+        def parse(point):
+            lat, lng = map(float, point.replace('°', '').replace(' ', '').split(','))
+            return lat, lng
+
+        for segment in timeline_data['semanticSegments']:
+            for path in segment.get('timelinePath', []):
+                if 'point' in path:
+                    coordinates.add(parse(path['point']))
+            if 'visit' in segment and 'topCandidate' in segment['visit']:
+                place_loc = segment['visit']['topCandidate'].get('placeLocation', {}).get('latLng')
+                if place_loc:
+                    coordinates.add(parse(place_loc))
+            for point in ['start', 'end']:
+                if 'latLng' in segment.get('activity', {}).get(point, {}):
+                    coordinates.add(parse(segment['activity'][point]['latLng']))
+    return coordinates
+
+
+def make_ios_timeline(segments, seed=0):
+    """An iOS export: a top-level array of timelinePath and visit entries"""
+    rng = random.Random(seed)
+    point = lambda: 'geo:%.6f,%.6f' % (rng.uniform(-80, 80), rng.uniform(-170, 170))
+    timeline = []
+    for i in range(segments):
+        entry = {'startTime': '2024-01-01T10:00:00.000-08:00', 'endTime': '2024-01-01T11:00:00.000-08:00'}
+        if i % 2:
+            entry['visit'] = {
+                'hierarchyLevel': '0',
+                'probability': '0.9',
+                'topCandidate': {'probability': '0.5', 'semanticType': 'Home', 'placeID': 'x', 'placeLocation': point()},
+            }
+        else:
+            entry['timelinePath'] = [{'point': point(), 'durationMinutesOffsetFromStartTime': str(k)} for k in range(5)]
+        timeline.append(entry)
+    return timeline
+
+
+def make_android_timeline(segments, seed=0):
+    """An Android export: semanticSegments with timelinePath, visit and activity segments"""
+    rng = random.Random(seed)
+    point = lambda: '%.7f°, %.7f°' % (rng.uniform(-80, 80), rng.uniform(-170, 170))
+    timeline = []
+    for i in range(segments):
+        segment = {'startTime': '2024-01-01T10:00:00.000-08:00', 'endTime': '2024-01-01T11:00:00.000-08:00'}
+        if i % 3 == 0:
+            segment['timelinePath'] = [{'point': point(), 'time': f'2024-01-01T10:0{k}:00.000-08:00'} for k in range(5)]
+        elif i % 3 == 1:
+            segment['visit'] = {'probability': 0.5, 'topCandidate': {'placeId': 'a', 'probability': 0.4, 'placeLocation': {'latLng': point()}}}
+        else:
+            segment['activity'] = {'start': {'latLng': point()}, 'end': {'latLng': point()}, 'distanceMeters': 10.0}
+        timeline.append(segment)
+    return {
+        'semanticSegments': timeline,
+        'rawSignals': [{'position': {'LatLng': point()}}],
+        'userLocationProfile': {'frequentPlaces': [{'placeId': 'a', 'placeLocation': point()}]},
+    }
+
+
+@pytest.fixture
+def ios_timeline():
+    return make_ios_timeline(200)
+
+
+@pytest.fixture
+def android_timeline():
+    return make_android_timeline(200)
+
+
+@pytest.fixture
+def postgres_url():
+    url = os.environ.get('TEST_POSTGRES_URL')
+    if not url:
+        pytest.skip('TEST_POSTGRES_URL is not set')
+    return url
+
+
+@pytest.fixture
+def baseline_extract():
+    return baseline_extract_coordinates
@@ -0,0 +1,34 @@
+from my_proof.utils.authenticity import TrackCollector, TrackStats
+
+IOS = 'google-timeline-ios.json'
+ANDROID = 'google-timeline-android.json'
+
+
+def collect(schema_type, segments, batch_size=1000):
+    stats = TrackStats()
+    collector = TrackCollector(schema_type, stats, batch_size)
+    for segment in segments:
+        collector.add_segment(segment)
+    collector.finish()
+    return stats
+
+
+def test_collector_counts_streamed_points(ios_timeline, android_timeline):
+    assert collect(IOS, ios_timeline).points == 100 * 5 + 100
+    assert collect(ANDROID, android_timeline['semanticSegments']).points == 67 * 5 + 67 + 66 * 2
+
+
+def test_collector_keeps_valid_points_of_a_malformed_batch(android_timeline):
+    segments = android_timeline['semanticSegments']
+    expected = collect(ANDROID, segments).points
+    segments[0]['timelinePath'][0]['point'] = 'not a point'
+    segments[3]['timelinePath'][1]['point'] = '12.5°'
+    assert collect(ANDROID, segments).points == expected - 2
+
+
+def test_collector_skips_unmatched_ios_points(ios_timeline):
+    expected = collect(IOS, ios_timeline).points
+    ios_timeline[0]['timelinePath'][0]['point'] = 'geo:nowhere'
+    ios_timeline[2]['timelinePath'][0]['durationMinutesOffsetFromStartTime'] = 'soon'
+    stats = collect(IOS, ios_timeline)
+    assert stats.points == expected - 2
@@ -0,0 +1,32 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from my_proof.batch import load_manifest
+
+OWNER = '0xAbC0000000000000000000000000000000000001'
+
+
+def write_manifest(tmp_path, jobs):
+    path = tmp_path / 'manifest.jsonl'
+    path.write_text(''.join(json.dumps(job) + '\n' for job in jobs))
+    return str(path)
+
+
+def test_load_manifest(tmp_path):
+    jobs = load_manifest(write_manifest(tmp_path, [
+        {'input_dir': 'in/1', 'output_dir': 'out/1', 'owner_address': OWNER, 'file_id': 1},
+        {'input_dir': 'in/2', 'output_dir': 'out/2', 'owner_address': OWNER, 'google_token': 'token'},
+    ]))
+    assert [job.settings_overrides()['INPUT_DIR'] for job in jobs] == ['in/1', 'in/2']
+    assert jobs[1].settings_overrides()['OWNER_ADDRESS'] == OWNER
+
+
+@pytest.mark.parametrize('owner', [None, '', '0x123'])
+def test_load_manifest_requires_an_owner(tmp_path, owner):
+    job = {'input_dir': 'in', 'output_dir': 'out'}
+    if owner is not None:
+        job['owner_address'] = owner
+    with pytest.raises(ValidationError):
+        load_manifest(write_manifest(tmp_path, [job]))
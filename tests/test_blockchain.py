@@ -0,0 +1,83 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from eth_abi import encode
+
+from my_proof.config import settings
+from my_proof.utils import blockchain
+from my_proof.utils.blockchain import BlockchainClient, cache_contributor_file_counts
+
+FAILING_OWNER = '0x' + '0' * 36 + 'dead'
+
+
+class StubRpcHandler(BaseHTTPRequestHandler):
+    """Answers contributorInfo eth_calls with a file count equal to the last byte of the address"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.batches.append(len(request) if isinstance(request, list) else None)
+        if isinstance(request, list):
+            body = [self.answer(call) for call in request]
+        else:
+            body = self.answer(request)
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def answer(self, call):
+        if call['method'] != 'eth_call':
+            return {'jsonrpc': '2.0', 'id': call['id'], 'result': '0x5a2'}
+        owner = '0x' + call['params'][0]['data'][-40:]
+        if owner == FAILING_OWNER:
+            return {'jsonrpc': '2.0', 'id': call['id'], 'error': {'code': -32000, 'message': 'execution reverted'}}
+        result = encode(['(address,uint256)'], [(owner, int(owner[-2:], 16))])
+        return {'jsonrpc': '2.0', 'id': call['id'], 'result': '0x' + result.hex()}
+
+
+@pytest.fixture
+def rpc_server(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubRpcHandler)
+    server.batches = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(settings, 'RPC_URL', f'http://127.0.0.1:{server.server_port}')
+    monkeypatch.setattr(settings, 'RPC_BATCH_SIZE', 3)
+    blockchain._file_count_cache.clear()
+    yield server
+    server.shutdown()
+    blockchain._file_count_cache.clear()
+
+
+def owner(i):
+    return '0x' + '%040x' % i
+
+
+def test_file_counts_are_read_in_batches(rpc_server):
+    owners = [owner(i) for i in range(1, 8)] + [FAILING_OWNER]
+    file_counts = BlockchainClient().get_contributor_file_counts(owners + [owners[0]])
+    # Repeated owners are asked once and the failed call is left out
+    assert file_counts == {owner(i): i for i in range(1, 8)}
+    assert rpc_server.batches == [3, 3, 2]
+
+
+def test_file_count_of_one_owner(rpc_server):
+    client = BlockchainClient()
+    assert client.get_contributor_file_count(owner(5)) == 5
+    assert client.get_contributor_file_count(FAILING_OWNER) == 0
+
+
+def test_prefetched_file_count_is_used_once(rpc_server):
+    cache_contributor_file_counts({owner(0xab).replace('ab', 'AB'): 99})
+    client = BlockchainClient()
+    assert client.get_contributor_file_count(owner(0xab)) == 99
+    assert rpc_server.batches == []
+    # The next proof of the owner reads the count again
+    assert client.get_contributor_file_count(owner(0xab)) == 0xab
+    assert rpc_server.batches == [1]
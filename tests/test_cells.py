@@ -0,0 +1,49 @@
+import numpy as np
+
+from my_proof.utils.cells import cell_centers, cell_keys, cell_shards
+
+
+def random_coordinates(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack((rng.uniform(-90, 90, n), rng.uniform(-180, 180, n)))
+
+
+def test_cell_keys_are_grid_cells():
+    keys = cell_keys(np.array([[37.4219551, -122.0840575], [37.4219552, -122.0840576], [37.4219551, -122.08]]), bits=24)
+    assert keys.dtype == np.int64
+    assert keys[0] == keys[1]
+    assert keys[0] != keys[2]
+    assert (cell_keys(random_coordinates(1000), bits=24) < 2 ** 48).all()
+
+
+def test_cell_keys_share_prefixes_nearby():
+    # Z-order keys: points in the same 1/8 x 1/8 region share their top 6 bits
+    keys = cell_keys(np.array([[10.0, 10.0], [10.1, 10.1], [-60.0, -150.0]]), bits=24)
+    regions = keys >> (48 - 6)
+    assert regions[0] == regions[1] != regions[2]
+
+
+def test_cell_centers_invert_cell_keys():
+    coordinates = random_coordinates(1000)
+    keys = cell_keys(coordinates, bits=24)
+    centers = cell_centers(keys, bits=24)
+    # Within half a cell of the original point
+    assert (np.abs(centers[:, 0] - coordinates[:, 0]) <= 180.0 / 2 ** 25).all()
+    assert (np.abs(centers[:, 1] - coordinates[:, 1]) <= 360.0 / 2 ** 25).all()
+    np.testing.assert_array_equal(cell_keys(centers, bits=24), keys)
+
+
+def test_cell_keys_edges():
+    keys = cell_keys(np.array([[-90.0, -180.0], [90.0, 180.0]]), bits=24)
+    assert keys[0] == 0
+    assert keys[1] == 2 ** 48 - 1
+
+
+def test_cell_shards_move_keys_to_new_shard_only():
+    keys = cell_keys(random_coordinates(20000), bits=24)
+    four = cell_shards(keys, 4)
+    five = cell_shards(keys, 5)
+    assert set(np.unique(four)) == {0, 1, 2, 3}
+    moved = four != five
+    assert (five[moved] == 4).all()
+    assert abs(moved.mean() - 1 / 5) < 0.02
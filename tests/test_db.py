@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from my_proof.utils.cells import cell_keys
+from my_proof.utils.db import Database, add_new_columns, copy_merge_cells, copy_probe_cells, database_url, pack_copy_binary, unpack_copy_binary
+
+
+def test_copy_binary_round_trip():
+    cells = np.array([0, 1, -1, 2 ** 62], dtype=np.int64)
+    latitudes = np.array([0.0, -90.0, 45.123456789, np.pi])
+    data = pack_copy_binary(cells, latitudes)
+    assert data.startswith(b'PGCOPY\n\xff\r\n\x00')
+    assert data.endswith(b'\xff\xff')
+    unpacked_cells, unpacked_latitudes = unpack_copy_binary(data, 'i8', 'f8')
+    np.testing.assert_array_equal(unpacked_cells, cells)
+    np.testing.assert_array_equal(unpacked_latitudes, latitudes)
+
+
+def test_copy_binary_empty():
+    cells, = unpack_copy_binary(pack_copy_binary(np.empty(0, dtype=np.int64)), 'i8')
+    assert len(cells) == 0
+
+
+def test_unpack_copy_binary_rejects_nulls():
+    data = bytearray(pack_copy_binary(np.array([7], dtype=np.int64)))
+    # A field length of -1 is a NULL
+    data[19 + 2:19 + 6] = (-1).to_bytes(4, 'big', signed=True)
+    with pytest.raises(ValueError):
+        unpack_copy_binary(bytes(data), 'i8')
+
+
+class RecordingConnection:
+    """Records the DDL it is given, with no constraints in the catalog"""
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement):
+        self.statements.append(str(statement))
+        return self
+
+    def first(self):
+        return None
+
+
+@pytest.mark.parametrize('stored_version, columns', [
+    (None, ['cell', 'uix_cell', 'heartbeat_at']),
+    (5, ['heartbeat_at']),
+    (6, []),
+])
+def test_add_new_columns_of_later_versions(stored_version, columns):
+    connection = RecordingConnection()
+    add_new_columns(connection, stored_version)
+    altered = [statement for statement in connection.statements if statement.startswith('ALTER TABLE') and 'ADD' in statement]
+    assert len(altered) == len(columns)
+    assert all(column in statement for column, statement in zip(columns, altered))
+
+
+@pytest.fixture
+def session(postgres_url):
+    """A session whose coordinate tables are temporary and rolled back after the test"""
+    engine = create_engine(database_url(postgres_url))
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        # Temporary tables shadow any real ones of the same name
+        connection.execute(text(
+            "CREATE TEMP TABLE coordinates (id serial PRIMARY KEY, longitude float8 NOT NULL, "
+            "latitude float8 NOT NULL, cell int8 UNIQUE, contributor_id int4 NOT NULL, created_at timestamp)"
+        ))
+        connection.execute(text("CREATE TEMP TABLE coordinate_cells (cell int8 PRIMARY KEY, contributor_id int8 NOT NULL)"))
+        yield Session(bind=connection)
+        transaction.rollback()
+    engine.dispose()
+
+
+def test_copy_insert_coordinates_counts(session):
+    database = Database()
+    coordinates = np.array([[1.0, 2.0], [1.0, 2.0], [3.0, 4.0], [5.0, 6.0]])
+    # The repeated point shares its cell with the first, so only three rows are inserted
+    assert database.copy_insert_coordinates(session, coordinates, 1, chunk_size=2) == (3, 1)
+    assert database.copy_insert_coordinates(session, np.array([[3.0, 4.0], [7.0, 8.0]]), 2) == (1, 1)
+    stored = session.execute(text("SELECT cell FROM coordinates ORDER BY cell")).scalars().all()
+    assert stored == sorted(cell_keys(np.array([[1.0, 2.0], [3.0, 4.0], [5.0, 6.0], [7.0, 8.0]])).tolist())
+
+
+def test_copy_merge_cells_counts(session):
+    cursor = session.connection().connection.cursor()
+    cells = np.array([10, 11, 11, 12], dtype=np.int64)
+    assert copy_merge_cells(cursor, cells, np.ones(len(cells), dtype=np.int64), chunk_size=3) == 3
+    assert copy_merge_cells(cursor, np.array([12, 13], dtype=np.int64), np.full(2, 2, dtype=np.int64), chunk_size=3) == 1
+    stored = session.execute(text("SELECT cell, contributor_id FROM coordinate_cells ORDER BY cell")).all()
+    assert [tuple(row) for row in stored] == [(10, 1), (11, 1), (12, 1), (13, 2)]
+
+
+def test_copy_probe_cells(session):
+    cursor = session.connection().connection.cursor()
+    copy_merge_cells(cursor, np.array([10, 13], dtype=np.int64), np.ones(2, dtype=np.int64), chunk_size=3)
+    new = copy_probe_cells(cursor, np.array([9, 10, 13, 14], dtype=np.int64), 'coordinate_cells', chunk_size=2)
+    np.testing.assert_array_equal(new, [True, False, False, True])
@@ -0,0 +1,69 @@
+import copy
+import datetime
+
+import numpy as np
+
+from my_proof.utils.fingerprint import ContributorFingerprint, segment_hash
+
+
+def segment(day, place='geo:1.5,2.5'):
+    return {
+        'startTime': f'2024-01-{day:02d}T10:00:00.000-08:00',
+        'endTime': f'2024-01-{day:02d}T11:00:00.000-08:00',
+        'visit': {'topCandidate': {'placeLocation': place}},
+    }
+
+
+def first_upload(segments):
+    fingerprint = ContributorFingerprint()
+    assert all(fingerprint.is_new(s) for s in segments)
+    return fingerprint.merge()
+
+
+def test_segment_hash_ignores_key_order():
+    reordered = dict(reversed(list(segment(1).items())))
+    assert segment_hash(reordered) == segment_hash(segment(1))
+    assert segment_hash(segment(1, 'geo:1.5,2.6')) != segment_hash(segment(1))
+
+
+def test_first_upload_records_everything():
+    stored = first_upload([segment(1), segment(2)])
+    assert len(stored.hashes) == 2
+    assert (np.diff(stored.hashes.astype(np.float64)) > 0).all()
+    assert stored.watermark == datetime.datetime(2024, 1, 2, 11, tzinfo=datetime.timezone(datetime.timedelta(hours=-8)))
+
+
+def test_repeat_upload_only_processes_new_segments():
+    stored = first_upload([segment(1), segment(2)])
+    fingerprint = ContributorFingerprint.from_bytes(stored.watermark, stored.to_bytes())
+    # Unchanged, revised before the watermark, and after the watermark
+    new = [fingerprint.is_new(s) for s in [segment(1), segment(2, 'geo:3.5,4.5'), segment(3)]]
+    assert new == [False, True, True]
+    assert fingerprint.summary()['known_segments'] == 1
+    assert fingerprint.summary()['new_segments'] == 2
+
+    merged = fingerprint.merge()
+    assert len(merged.hashes) == 4
+    assert merged.watermark > stored.watermark
+
+
+def test_segments_without_times_are_always_new():
+    stored = first_upload([{'visit': {}}])
+    fingerprint = ContributorFingerprint.from_bytes(stored.watermark, stored.to_bytes())
+    assert fingerprint.is_new({'visit': {}})
+
+
+def test_recorded_copies_merge_into_the_saved_fingerprint():
+    stored = first_upload([segment(1)])
+    fingerprint = ContributorFingerprint.from_bytes(stored.watermark, stored.to_bytes())
+    worker_copy = copy.deepcopy(fingerprint)
+    assert not worker_copy.is_new(segment(1))
+    assert worker_copy.is_new(segment(5))
+    fingerprint.absorb(worker_copy.recorded())
+    assert fingerprint.known_segments == 1
+    assert fingerprint.new_segments == 1
+
+    concurrent = first_upload([segment(9)])
+    merged = fingerprint.merge(concurrent)
+    assert set(merged.hashes.tolist()) == {segment_hash(segment(day)) for day in (1, 5, 9)}
+    assert merged.watermark == concurrent.watermark
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from my_proof.utils.google import CoordinateRuns, extract_coordinates, parse_points, unique_coordinates
+
+IOS = 'google-timeline-ios.json'
+ANDROID = 'google-timeline-android.json'
+
+
+def as_set(coordinates):
+    return set(map(tuple, np.asarray(coordinates).tolist()))
+
+
+@pytest.mark.parametrize('points, expected', [
+    (['geo:37.421955,-122.084058', 'geo:-1.5,2.25'], [(37.421955, -122.084058), (-1.5, 2.25)]),
+    # The baseline regex needs decimals, so integer points are skipped
+    (['geo:1,2', 'geo:1.5,2.5'], [(1.5, 2.5)]),
+    # and it only matches a prefix, so trailing text is ignored
+    (['geo:1.5,2.5;x', 'geo:3.5,-4.5'], [(1.5, 2.5), (3.5, -4.5)]),
+    (['geo:1.5,2.5,geo:3.5,4.5', 'nogeo'], [(1.5, 2.5)]),
+    ([], []),
+])
+def test_parse_points_ios_matches_regex(points, expected):
+    np.testing.assert_array_equal(parse_points(points, IOS), np.array(expected, dtype=np.float64).reshape(-1, 2))
+
+
+@pytest.mark.parametrize('points, expected', [
+    (['37.4219551°, -122.0840575°', '1,2'], [(37.4219551, -122.0840575), (1.0, 2.0)]),
+    (['1e2, -0.5', 'nan,inf'], [(100.0, -0.5), (np.nan, np.inf)]),
+])
+def test_parse_points_android_matches_float(points, expected):
+    np.testing.assert_array_equal(parse_points(points, ANDROID), np.array(expected, dtype=np.float64))
+
+
+def test_parse_points_android_rejects_shifted_pairs():
+    # Joined, these are two valid pairs, but the first point has three values
+    with pytest.raises(ValueError):
+        parse_points(['1.5,2.5,3.5', '4.5'], ANDROID)
+
+
+def test_extract_coordinates_ios_matches_baseline(ios_timeline, baseline_extract):
+    ios_timeline[0]['timelinePath'][0]['point'] = 'geo:12,34'
+    ios_timeline[1]['visit']['topCandidate']['placeLocation'] = 'geo:1.25,2.5 extra'
+    coordinates = extract_coordinates(ios_timeline, IOS)
+    assert len(coordinates) == len(as_set(coordinates))
+    assert as_set(coordinates) == baseline_extract(ios_timeline, IOS)
+
+
+def test_extract_coordinates_android_matches_baseline(android_timeline, baseline_extract):
+    android_timeline['semanticSegments'][0]['timelinePath'][0]['point'] = '12, 34'
+    coordinates = extract_coordinates(android_timeline, ANDROID)
+    assert len(coordinates) == len(as_set(coordinates))
+    assert as_set(coordinates) == baseline_extract(android_timeline, ANDROID)
+
+
+def test_extract_coordinates_deduplicates(ios_timeline, baseline_extract):
+    coordinates = extract_coordinates(ios_timeline + ios_timeline, IOS)
+    assert len(coordinates) == len(baseline_extract(ios_timeline, IOS))
+    assert len(np.unique(coordinates, axis=0)) == len(coordinates)
+
+
+def test_coordinate_runs_spill_to_the_same_result(tmp_path):
+    rng = np.random.default_rng(0)
+    chunks = [np.round(rng.uniform(-80, 80, (60000, 2)), 1) for _ in range(6)]
+    in_memory = CoordinateRuns()
+    spilled = CoordinateRuns(memory_budget_mb=1, spill_dir=str(tmp_path))
+    for chunk in chunks:
+        in_memory.add(unique_coordinates(chunk))
+        spilled.add(unique_coordinates(chunk))
+    expected = in_memory.result()
+    result = spilled.result()
+    assert isinstance(result, np.memmap) or isinstance(result.base, np.memmap)
+    np.testing.assert_array_equal(result, expected)
+    assert as_set(expected) == as_set(np.concatenate(chunks))
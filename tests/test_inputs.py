@@ -0,0 +1,76 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+from my_proof.utils.inputs import extract_members, list_input_files, prefetch_members
+
+
+@pytest.fixture
+def input_dir(tmp_path, android_timeline):
+    with zipfile.ZipFile(tmp_path / 'export.zip', 'w', zipfile.ZIP_DEFLATED) as archive:
+        for i in range(4):
+            archive.writestr(f'part{i}.json', json.dumps({**android_timeline, 'part': i}))
+        archive.writestr('nested/ignored.json', '{}')
+    (tmp_path / 'plain.json').write_text('[]')
+    return tmp_path
+
+
+def read_all(input_files):
+    contents = {}
+    for input_file in input_files:
+        with input_file.open() as f:
+            contents[input_file.name] = f.read()
+    return contents
+
+
+def test_list_input_files_reads_root_members(input_dir):
+    names = sorted(input_file.name for input_file in list_input_files(str(input_dir)))
+    assert names == ['export.zip:part0.json', 'export.zip:part1.json', 'export.zip:part2.json', 'export.zip:part3.json', 'plain.json']
+
+
+@pytest.mark.parametrize('workers', [1, 2, 8])
+def test_prefetched_members_match_streamed_members(input_dir, workers):
+    input_files = list_input_files(str(input_dir))
+    streamed = read_all(input_files)
+    prefetched = read_all(prefetch_members(input_files, workers))
+    assert prefetched == streamed
+    assert json.loads(prefetched['export.zip:part2.json'])['part'] == 2
+    assert all(input_file.decompressed is None for input_file in input_files)
+
+
+def test_stopping_early_drops_prefetched_members(input_dir):
+    input_files = sorted(list_input_files(str(input_dir)), key=lambda input_file: input_file.name)
+    prefetched = prefetch_members(input_files, 2)
+    with next(prefetched).open() as f:
+        f.read(10)
+    assert input_files[1].decompressed is not None
+    prefetched.close()
+    assert all(input_file.decompressed is None for input_file in input_files)
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_extracted_members_match_streamed_members(input_dir, tmp_path, monkeypatch, workers):
+    monkeypatch.setattr('my_proof.utils.inputs.settings.SPILL_DIR', str(tmp_path))
+    input_files = list_input_files(str(input_dir))
+    streamed = read_all(input_files)
+    extracted = list(extract_members(input_files, workers))
+    paths = [input_file.extracted_path for input_file in extracted if input_file.member is not None]
+    assert all(paths) == bool(workers)
+    assert read_all(extracted) == streamed
+    for input_file in input_files:
+        input_file.remove_extracted()
+    assert not any(path and os.path.exists(path) for path in paths)
+
+
+def test_stopping_early_hands_over_extracted_members(input_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr('my_proof.utils.inputs.settings.SPILL_DIR', str(tmp_path))
+    input_files = sorted(list_input_files(str(input_dir)), key=lambda input_file: input_file.name)
+    extracted = extract_members(input_files, 2)
+    next(extracted)
+    extracted.close()
+    assert all(input_file.extracted_path for input_file in input_files[:2])
+    for input_file in input_files:
+        input_file.remove_extracted()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.json') and name != 'plain.json']
@@ -0,0 +1,96 @@
+import io
+import json
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from my_proof.config import settings
+from my_proof.models.proof_response import ProofResponse
+from my_proof.proof import Proof, _release_parse_results
+from my_proof.utils import bloom
+from my_proof.utils.bloom import BloomFilter
+from my_proof.utils.db import db
+from my_proof.utils.fingerprint import ContributorFingerprint
+from my_proof.utils.shared_arrays import share_array
+
+
+@pytest.fixture
+def proof():
+    return Proof(settings)
+
+
+def test_cached_result_gets_the_live_errors(proof):
+    cached = ProofResponse(dlp_id=16, valid=True, score=0.8)
+    duplicate = proof.apply_live_errors(cached, [], existing_file_count=1)
+    assert not duplicate.valid
+    assert duplicate.attributes['errors'] == ['DUPLICATE_CONTRIBUTION']
+    assert duplicate.score == 0.8
+    assert proof.apply_live_errors(cached, [], existing_file_count=0) == cached
+
+
+def test_cached_live_errors_are_replaced(proof):
+    cached = ProofResponse(dlp_id=16, valid=False, attributes={'errors': ['DUPLICATE_CONTRIBUTION', 'NOT_ENOUGH_DATA']})
+    response = proof.apply_live_errors(cached, ['UNVERIFIED_STORAGE_EMAIL'], existing_file_count=0)
+    assert response.attributes['errors'] == ['UNVERIFIED_STORAGE_EMAIL', 'NOT_ENOUGH_DATA']
+    assert not response.valid
+
+
+def test_cached_result_is_scored_as_a_repeat(proof):
+    cached = ProofResponse(dlp_id=16, valid=True, score=0.9, quality=0.8, uniqueness=1.0, authenticity=0.5,
+                           attributes={'coordinates': 500, 'unique_coordinates': 500})
+    repeat = proof.rescore_repeat(cached)
+    assert repeat.uniqueness == 0.0
+    assert repeat.score == pytest.approx(0.005 * 0.8)
+    assert repeat.attributes == {'coordinates': 500, 'unique_coordinates': 0}
+    assert cached.uniqueness == 1.0
+    scored = Proof(settings.model_copy(update={'AUTHENTICITY_SCORING': True})).rescore_repeat(cached)
+    assert scored.score == pytest.approx(0.005 * 0.8 * 0.5)
+
+
+def test_write_behind_queues_one_point_per_cell(monkeypatch):
+    queued = []
+    monkeypatch.setattr(db, 'probe_new_coordinates', lambda session, coordinates: coordinates[:, 0] > 2)
+    monkeypatch.setattr(db, 'enqueue_coordinate_write', lambda session, coordinates, contributor_id: queued.append(coordinates))
+    coordinates = np.array([[1.0, 2.0], [1.0000001, 2.0000001], [5.0, 6.0], [5.0, 6.0000001], [7.0, 8.0]])
+    proof = Proof(settings.model_copy(update={'WRITE_BEHIND': True}))
+    assert proof.insert_coordinate_chunk(None, coordinates, 1) == (2, 3)
+    np.testing.assert_array_equal(queued[0], [[5.0, 6.0], [7.0, 8.0]])
+
+
+def test_unread_parse_results_free_their_shared_memory():
+    done, failed, pending = Future(), Future(), Future()
+    handle = share_array(np.ones((3, 2)))
+    done.set_result(('google-timeline-ios.json', True, handle, None, None, []))
+    failed.set_exception(ValueError('invalid'))
+    _release_parse_results([done, failed, pending])
+    assert pending.cancelled()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=handle[0])
+
+
+def test_fingerprint_is_waited_for_at_the_first_segment(proof, ios_timeline, baseline_extract):
+    recorded = ContributorFingerprint()
+    assert all(recorded.is_new(segment) for segment in ios_timeline[:100])
+    stored = recorded.merge()
+    fingerprint_future = Future()
+    threading.Timer(0.05, fingerprint_future.set_result, [ContributorFingerprint.from_bytes(stored.watermark, stored.to_bytes())]).start()
+    schema_type, schema_matches, coordinates = proof.process_file(io.StringIO(json.dumps(ios_timeline)), fingerprint_future=fingerprint_future)
+    assert schema_matches
+    assert {(lat, lng) for lat, lng in coordinates.tolist()} == baseline_extract(ios_timeline[100:], schema_type)
+
+
+def test_coordinate_filter_is_only_built_outside_proofs(tmp_path, monkeypatch):
+    path = tmp_path / 'coordinates.bloom'
+    monkeypatch.setattr(bloom, '_coordinate_filter', None)
+    monkeypatch.setattr(bloom.settings, 'BLOOM_FILTER_PATH', str(path))
+    monkeypatch.setattr(BloomFilter, 'refresh', lambda self, engine: 0)
+    assert bloom.get_coordinate_filter(None) is None
+    assert not path.exists()
+    built = bloom.refresh_coordinate_filter(None)
+    assert built.path == str(path) and path.exists()
+    assert [p.name for p in tmp_path.iterdir()] == ['coordinates.bloom']
+    monkeypatch.setattr(bloom, '_coordinate_filter', None)
+    assert bloom.get_coordinate_filter(None).watermark == built.watermark
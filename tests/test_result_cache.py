@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from my_proof.config import settings
+from my_proof.utils.result_cache import DiskResultCache, is_cacheable, result_cache_key
+
+
+@pytest.fixture
+def job_settings(tmp_path):
+    (tmp_path / 'timeline.json').write_text('[]')
+    return settings.model_copy(update={
+        'INPUT_DIR': str(tmp_path),
+        'OWNER_ADDRESS': '0xAbC0000000000000000000000000000000000001',
+        'GOOGLE_TOKEN': 'token',
+        'FILE_ID': 1,
+    })
+
+
+def test_result_cache_key_is_stable(job_settings):
+    key = result_cache_key(job_settings)
+    assert len(key) == 64
+    assert result_cache_key(job_settings) == key
+    # A new upload of the same content hits, the duplicate check is made again on a hit
+    assert result_cache_key(job_settings.model_copy(update={'FILE_ID': 2})) == key
+    assert result_cache_key(job_settings.model_copy(update={'GOOGLE_TOKEN': 'other'})) == key
+    assert result_cache_key(job_settings.model_copy(update={'OWNER_ADDRESS': job_settings.OWNER_ADDRESS.lower()})) == key
+
+
+@pytest.mark.parametrize('update', [
+    {'OWNER_ADDRESS': '0xabc0000000000000000000000000000000000002'},
+    {'DLP_ID': 17},
+    {'GOOGLE_TOKEN': None},
+    {'FAST_SCAN': True},
+    {'SCHEMA_SAMPLE_SIZE': 100},
+    {'INCREMENTAL_PROOFS': True},
+    {'CELL_RESOLUTION_BITS': 20},
+    {'COORDINATE_STORAGE': 'cells'},
+    {'MAX_MEMORY_MB': 64},
+    {'AUTHENTICITY_SCORING': True},
+])
+def test_result_cache_key_changes_with_settings(job_settings, update):
+    assert result_cache_key(job_settings.model_copy(update=update)) != result_cache_key(job_settings)
+
+
+def test_result_cache_key_changes_with_input(job_settings, tmp_path):
+    key = result_cache_key(job_settings)
+    (tmp_path / 'timeline.json').write_text('[ ]')
+    assert result_cache_key(job_settings) != key
+    (tmp_path / 'timeline.json').write_text('[]')
+    assert result_cache_key(job_settings) == key
+    (tmp_path / 'other.json').write_text('[]')
+    assert result_cache_key(job_settings) != key
+
+
+def test_is_cacheable():
+    assert is_cacheable({'valid': True, 'attributes': {}})
+    assert is_cacheable({'valid': False, 'attributes': {'errors': ['DUPLICATE_CONTRIBUTION']}})
+    assert not is_cacheable({'valid': False, 'attributes': {'errors': ['UNVERIFIED_STORAGE_USER']}})
+
+
+def test_disk_result_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskResultCache(str(tmp_path / 'cache'), max_entries=2)
+    cache.put('a', {'score': 1})
+    cache.put('b', {'score': 2})
+    # Entries are ordered by modification time, set apart explicitly for coarse file system clocks
+    os.utime(tmp_path / 'cache' / 'a.json', (1, 1))
+    os.utime(tmp_path / 'cache' / 'b.json', (2, 2))
+    assert cache.get('a') == {'score': 1}
+    cache.put('c', {'score': 3})
+    assert cache.get('b') is None
+    assert cache.get('a') == {'score': 1}
+    assert cache.get('c') == {'score': 3}
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from my_proof.utils.scanner import scan_coordinates
+
+IOS = 'google-timeline-ios.json'
+ANDROID = 'google-timeline-android.json'
+
+
+def write(tmp_path, data, ensure_ascii=True):
+    path = tmp_path / 'export.json'
+    path.write_text(json.dumps(data, ensure_ascii=ensure_ascii), encoding='utf-8')
+    return str(path)
+
+
+def as_set(coordinates):
+    return {(lat, lng) for lat, lng in coordinates.tolist()}
+
+
+def test_scan_ios_matches_baseline(tmp_path, ios_timeline, baseline_extract):
+    coordinates = scan_coordinates(write(tmp_path, ios_timeline), IOS)
+    assert as_set(coordinates) == baseline_extract(ios_timeline, IOS)
+
+
+@pytest.mark.parametrize('ensure_ascii', [True, False])
+def test_scan_android_matches_baseline(tmp_path, android_timeline, baseline_extract, ensure_ascii):
+    coordinates = scan_coordinates(write(tmp_path, android_timeline, ensure_ascii), ANDROID)
+    assert as_set(coordinates) == baseline_extract(android_timeline, ANDROID)
+
+
+def test_scan_falls_back_on_unexpected_values(tmp_path, ios_timeline):
+    ios_timeline[0]['timelinePath'][0]['point'] = {'lat': 1.0, 'lng': 2.0}
+    assert scan_coordinates(write(tmp_path, ios_timeline), IOS) is None
+
+
+def test_scan_empty_file(tmp_path):
+    path = tmp_path / 'empty.json'
+    path.write_bytes(b'')
+    assert scan_coordinates(str(path), IOS) is None
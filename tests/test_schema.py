@@ -0,0 +1,57 @@
+import io
+import json
+
+import pytest
+
+from my_proof.utils.schema import StreamValidator, get_validator, validate_schema
+from my_proof.utils.timeline import ANDROID_SCHEMA, IOS_SCHEMA, TimelineReader
+
+
+def stream_validate(timeline, **kwargs):
+    reader = TimelineReader(io.StringIO(json.dumps(timeline)))
+    validator = StreamValidator(reader.schema_type, **kwargs)
+    for event, key, value in reader.events():
+        if not validator.validate(event, key, value):
+            return validator, False
+    return validator, validator.finish(reader)
+
+
+def break_segments(timeline, count):
+    segments = timeline['semanticSegments'] if isinstance(timeline, dict) else timeline
+    for segment in segments[:count]:
+        segment['startTime'] = 12
+    return timeline
+
+
+def test_validators_are_compiled_once():
+    assert get_validator(IOS_SCHEMA) is get_validator(IOS_SCHEMA)
+    assert get_validator(ANDROID_SCHEMA, 'semanticSegments', True) is get_validator(ANDROID_SCHEMA, 'semanticSegments', True)
+
+
+@pytest.mark.parametrize('fail_fast', [True, False])
+def test_stream_validation_matches_whole_document(ios_timeline, android_timeline, fail_fast):
+    for timeline in (ios_timeline, android_timeline):
+        assert validate_schema(timeline)[1]
+        assert stream_validate(timeline, fail_fast=fail_fast, sample_size=0)[1]
+        broken = break_segments(timeline, 3)
+        assert not validate_schema(broken)[1]
+        assert not stream_validate(broken, fail_fast=fail_fast, sample_size=0)[1]
+
+
+def test_fail_fast_stops_at_the_first_error(ios_timeline):
+    broken = break_segments(ios_timeline, 5)
+    assert len(stream_validate(broken, fail_fast=True, sample_size=0)[0].errors) == 1
+    assert len(stream_validate(broken, fail_fast=False, sample_size=0)[0].errors) == 5
+
+
+def test_android_missing_segments_is_invalid(android_timeline):
+    del android_timeline['semanticSegments']
+    validator, valid = stream_validate(android_timeline, fail_fast=False, sample_size=0)
+    assert not valid
+    assert any('semanticSegments' in error for error in validator.errors)
+
+
+def test_sampled_validation(ios_timeline):
+    # A sample as large as the array checks every element
+    assert not stream_validate(break_segments(ios_timeline, 1), fail_fast=True, sample_size=len(ios_timeline))[1]
+    assert stream_validate(ios_timeline, fail_fast=True, sample_size=10)[1]
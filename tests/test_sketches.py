@@ -0,0 +1,52 @@
+import numpy as np
+
+from my_proof.utils.sketches import ContributionSketch, HyperLogLog, MinHash, estimate_overlap
+
+
+def keys(start, stop):
+    return np.arange(start, stop, dtype=np.int64) * 7919
+
+
+def test_hyperloglog_estimates_distinct_keys():
+    for count in (100, 10000, 200000):
+        sketch = HyperLogLog()
+        sketch.add(keys(0, count))
+        sketch.add(keys(0, count // 2))
+        assert abs(sketch.estimate() - count) / count < 0.03
+
+
+def test_hyperloglog_merge_is_union():
+    a, b = HyperLogLog(), HyperLogLog()
+    a.add(keys(0, 60000))
+    b.add(keys(40000, 100000))
+    union = HyperLogLog.from_bytes(a.merge(b).to_bytes())
+    assert abs(union.estimate() - 100000) / 100000 < 0.03
+    shared, total = estimate_overlap(a, b)
+    assert abs(shared - 20000) / 60000 < 0.05
+    assert abs(total - 60000) / 60000 < 0.03
+
+
+def test_minhash_jaccard():
+    a, b = MinHash(), MinHash()
+    a.add(keys(0, 30000))
+    b.add(keys(10000, 40000))
+    assert abs(MinHash.from_bytes(a.to_bytes()).jaccard(b) - 0.5) < 0.1
+    assert a.jaccard(a) == 1.0
+    assert MinHash().jaccard(MinHash()) == 0.0
+
+
+def test_minhash_bands_match_for_near_duplicates():
+    a, b, c = MinHash(), MinHash(), MinHash()
+    a.add(keys(0, 30000))
+    b.add(keys(300, 30300))
+    c.add(keys(100000, 130000))
+    assert set(a.band_hashes().tolist()) & set(b.band_hashes().tolist())
+    assert not set(a.band_hashes().tolist()) & set(c.band_hashes().tolist())
+
+
+def test_contribution_sketch_regions_add_up():
+    rng = np.random.default_rng(0)
+    coordinates = np.column_stack((rng.uniform(-80, 80, 20000), rng.uniform(-170, 170, 20000)))
+    sketch = ContributionSketch.from_coordinates(coordinates)
+    assert abs(sketch.hll.estimate() - 20000) / 20000 < 0.03
+    assert abs(sum(region.estimate() for region in sketch.regions.values()) - 20000) / 20000 < 0.05
@@ -0,0 +1,55 @@
+import io
+import json
+
+import pytest
+
+from my_proof.utils.google import CoordinateCollector, extract_coordinates
+from my_proof.utils.timeline import ANDROID_SCHEMA, IOS_SCHEMA, TimelineReader, is_segment_event
+
+
+def read(data, chunk_size=64):
+    return TimelineReader(io.StringIO(json.dumps(data, ensure_ascii=False, indent=1)), chunk_size=chunk_size)
+
+
+def stream_coordinates(reader):
+    collector = CoordinateCollector(reader.schema_type, batch_size=50)
+    for segment in reader.segments():
+        collector.add_segment(segment)
+    return set(map(tuple, collector.result().tolist()))
+
+
+def test_reader_streams_ios_segments(ios_timeline):
+    reader = read(ios_timeline)
+    assert reader.schema_type == IOS_SCHEMA
+    assert list(reader.segments()) == ios_timeline
+
+
+def test_reader_streams_android_sections(android_timeline):
+    reader = read(android_timeline)
+    assert reader.schema_type == ANDROID_SCHEMA
+    events = list(reader.events())
+    assert [value for event, key, value in events if is_segment_event(event, key)] == android_timeline['semanticSegments']
+    assert ('item', 'rawSignals', android_timeline['rawSignals'][0]) in events
+    assert ('value', 'userLocationProfile', android_timeline['userLocationProfile']) in events
+    assert reader.keys == ['semanticSegments', 'rawSignals', 'userLocationProfile']
+    assert reader.array_keys == ['semanticSegments', 'rawSignals']
+
+
+@pytest.mark.parametrize('text', ['[]', '{}', '{"semanticSegments": []}'])
+def test_reader_empty_exports(text):
+    assert list(TimelineReader(io.StringIO(text)).segments()) == []
+
+
+@pytest.mark.parametrize('text', ['[{"a": 1},', '[{"a": 1}] []', '{"semanticSegments": [1] 2}'])
+def test_reader_rejects_malformed_json(text):
+    with pytest.raises(ValueError):
+        list(TimelineReader(io.StringIO(text), chunk_size=4).events())
+
+
+def test_streamed_coordinates_match_baseline(ios_timeline, android_timeline, baseline_extract):
+    for timeline, schema_type in ((ios_timeline, IOS_SCHEMA), (android_timeline, ANDROID_SCHEMA)):
+        expected = baseline_extract(timeline, schema_type)
+        assert stream_coordinates(read(timeline)) == expected
+        coordinates = extract_coordinates(timeline, schema_type)
+        assert coordinates.shape == (len(expected), 2)
+        assert set(map(tuple, coordinates.tolist())) == expected
@@ -0,0 +1,20 @@
+import contextlib
+
+from my_proof import write_behind
+
+
+def test_drainer_keeps_draining_past_failed_writes(monkeypatch):
+    drains = iter([(1, 0, 0, 'insert failed'), (2, 5, 1, None), (1, 0, 0, 'insert failed'), (3, 2, 0, None), None])
+    monkeypatch.setattr(write_behind.db, 'session', contextlib.nullcontext)
+    monkeypatch.setattr(write_behind.db, 'drain_coordinate_write', lambda session: next(drains))
+    assert write_behind.run_drainer(until_empty=True) == 7
+    assert next(drains, 'drained') == 'drained'
+
+
+def test_drainer_stops_when_database_is_unreachable(monkeypatch):
+    def unreachable(session):
+        raise ConnectionError('could not connect')
+
+    monkeypatch.setattr(write_behind.db, 'session', contextlib.nullcontext)
+    monkeypatch.setattr(write_behind.db, 'drain_coordinate_write', unreachable)
+    assert write_behind.run_drainer(until_empty=True) == 0